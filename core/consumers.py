@@ -0,0 +1,42 @@
+import logging
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from core.utils.live_events import cross_process_push_available, machine_group
+from core.utils.utils import get_user_machines
+
+LOG = logging.getLogger(__name__)
+
+
+class LiveUpdatesConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes machine state changes and opened, updated or closed downtimes
+    of the user's machines. Pages patch themselves instead of polling,
+    unless the first ("hello") message says push is not available.
+    """
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if not user or not user.is_authenticated:
+            await self.close()
+            return
+
+        self.groups_joined = [machine_group(machine_id) for machine_id in await self.get_machine_ids(user)]
+        for group in self.groups_joined:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept()
+        # Tells the page whether events will arrive or it still has to poll
+        await self.send_json({"event": "hello", "push": cross_process_push_available()})
+        LOG.debug("Live updates connected: user=%s machines=%d", user.pk, len(self.groups_joined))
+
+    async def disconnect(self, code):
+        for group in getattr(self, "groups_joined", []):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def live_event(self, event):
+        await self.send_json(event["payload"])
+
+    @database_sync_to_async
+    def get_machine_ids(self, user):
+        return list(get_user_machines(user).values_list("id", flat=True))
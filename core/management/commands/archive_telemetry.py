@@ -0,0 +1,142 @@
+import logging
+from datetime import datetime
+
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min
+
+from core.models import Machine, ProcessorCursor, ProcessedNPT
+from core.utils.archive import ARCHIVE_CURSOR, ARCHIVE_SOURCES, archive_path, machine_archive_cursor, month_range
+
+LOG = logging.getLogger(__name__)
+
+# Archived ids deleted per statement
+DELETE_BATCH_SIZE = 5000
+
+# Raw logs may only leave the DB once the processors have consumed them
+PROCESSOR_CURSORS = {
+    "rotation": "rotation_status_{id}",
+    "status": "machine_status_{id}",
+}
+
+
+class Command(BaseCommand):
+    help = "Move telemetry older than --before into per-machine monthly Parquet files"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--before", required=True, help="Archive rows older than this date (YYYY-MM-DD).")
+        parser.add_argument("--machine", type=int, help="Archive only one machine.")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be archived.")
+
+    def handle(self, *args, **options):
+        try:
+            before = datetime.strptime(options["before"], "%Y-%m-%d")
+        except ValueError:
+            raise CommandError("--before must be in YYYY-MM-DD format.")
+
+        machine_id = options.get("machine")
+        machines = Machine.objects.filter(id=machine_id) if machine_id else Machine.objects.all()
+        if not machines.exists():
+            self.stdout.write(self.style.ERROR("No machines found."))
+            return
+
+        dry_run = options["dry_run"]
+        for machine in machines:
+            self.stdout.write(f"Archiving telemetry for machine {machine.id} ({machine})...")
+            for kind in ARCHIVE_SOURCES:
+                archived = self.archive_kind(machine, kind, before, dry_run)
+                if archived:
+                    self.stdout.write(f"  {kind}: {archived} rows")
+
+        # Readers only look in the archive before the boundary, so it has to
+        # cover whatever was deleted: the shared one for a full run,
+        # otherwise the machine's own
+        if not dry_run:
+            self.advance_boundary(machine_archive_cursor(machine_id) if machine_id else ARCHIVE_CURSOR, before)
+
+        self.stdout.write(self.style.SUCCESS("Archiving finished."))
+
+    @staticmethod
+    def advance_boundary(measurement, before):
+        cursor, _ = ProcessorCursor.objects.get_or_create(
+            measurement=measurement, defaults={"last_timestamp": None}
+        )
+        if cursor.last_timestamp is None or cursor.last_timestamp < before:
+            cursor.last_timestamp = before
+            cursor.save(update_fields=["last_timestamp", "updated_at"])
+
+    def get_queryset(self, machine, kind, before):
+        model, time_field, _ = ARCHIVE_SOURCES[kind]
+        qs = model.objects.filter(machine=machine)
+
+        if kind == "npt":
+            # Keep open downtimes and the latest one, which process_npt may still update
+            latest = ProcessedNPT.objects.filter(machine=machine).order_by("-off_time").first()
+            qs = qs.filter(on_time__isnull=False, on_time__lt=before)
+            if latest:
+                qs = qs.exclude(pk=latest.pk)
+            return qs
+
+        cursor = ProcessorCursor.objects.filter(
+            measurement=PROCESSOR_CURSORS[kind].format(id=machine.id)
+        ).first()
+        if not cursor or not cursor.last_timestamp:
+            return qs.none()
+        return qs.filter(**{f"{time_field}__lt": min(before, cursor.last_timestamp)})
+
+    def archive_kind(self, machine, kind, before, dry_run):
+        _, time_field, columns = ARCHIVE_SOURCES[kind]
+        qs = self.get_queryset(machine, kind, before)
+        if dry_run:
+            return qs.count()
+
+        bounds = qs.aggregate(first=Min(time_field), last=Max(time_field))
+        if bounds["first"] is None:
+            return 0
+
+        # One bounded query per month partition, written and deleted before
+        # the next, so a machine's history is never loaded at once
+        archived = 0
+        for year, month in month_range(bounds["first"], bounds["last"]):
+            month_start = datetime(year, month, 1)
+            month_end = datetime(year + month // 12, month % 12 + 1, 1)
+            month_qs = qs.filter(**{f"{time_field}__gte": month_start, f"{time_field}__lt": month_end})
+            part = pd.DataFrame.from_records(month_qs.values_list(*columns), columns=columns)
+            if part.empty:
+                continue
+            part[time_field] = pd.to_datetime(part[time_field])
+            self.write_partition(kind, machine.id, year, month, part, qs)
+            archived += len(part)
+        return archived
+
+    @transaction.atomic
+    def write_partition(self, kind, machine_id, year, month, part, qs):
+        path = archive_path(kind, machine_id, year, month)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        archived_ids = [int(pk) for pk in part["id"]]
+
+        # Merge with rows from an earlier run so re-archiving a month is safe
+        if path.exists():
+            part = pd.concat([pd.read_parquet(path), part], ignore_index=True)
+            part = part.drop_duplicates(subset="id", keep="last")
+
+        _, time_field, _ = ARCHIVE_SOURCES[kind]
+        part = part.sort_values(time_field)
+        tmp_path = path.with_suffix(".parquet.tmp")
+        part.to_parquet(tmp_path, engine="pyarrow", compression="zstd", index=False)
+        tmp_path.replace(path)
+
+        # Exactly the rows just written; anything that matched after the read stays
+        deleted = 0
+        for i in range(0, len(archived_ids), DELETE_BATCH_SIZE):
+            deleted += qs.model.objects.filter(pk__in=archived_ids[i:i + DELETE_BATCH_SIZE]).delete()[0]
+        LOG.info(
+            "Archived partition: kind=%s machine=%s month=%04d-%02d rows=%s deleted=%s",
+            kind,
+            machine_id,
+            year,
+            month,
+            len(part),
+            deleted,
+        )
@@ -15,7 +15,8 @@ from typing import Optional, Dict, Any, List
 from django.core.management.base import BaseCommand
 from django.db import transaction
 
-from core.models import NptReason, MachineStatus, RotationStatus, Machine
+from core.models import NptReason, MachineStatus, RotationStatus, Machine, MachineCurrentState
+from core.utils.live_events import publish_machine_event
 
 import paho.mqtt.client as mqtt
 from concurrent.futures import ThreadPoolExecutor
@@ -40,6 +41,9 @@ MC_REFRESH_SEC = 3600
 STATS_INTERVAL_SEC = 5
 BUFFER_DIR = "/home/sazzad/python/npt/mqtt_buffer"
 DB_WORKER_COUNT = 4  # Number of threads for parallel DB inserts
+CURRENT_STATE_FIELDS = [
+    "status", "status_since", "reason_id", "last_count", "last_count_time", "last_message_time",
+]
 
 os.makedirs(BUFFER_DIR, exist_ok=True)
 
@@ -108,6 +112,8 @@ class Ingestor:
         # ---------- STATE-BASED DUPLICATE PREVENTION ----------
         self.last_status: Dict[int, str] = {}     # machine_id -> last status
         self.last_rotation: Dict[int, int] = {}   # machine_id -> last rotation
+        self.current_state: Dict[int, Dict[str, Any]] = {}  # machine_id -> MachineCurrentState fields
+        self.state_dirty: set = set()  # machine_ids whose current state is not written yet
         self.state_lock = threading.Lock()
 
         # MQTT client
@@ -208,6 +214,8 @@ class Ingestor:
 
             last_state = self.last_status.get(machine.id)
             last_btn = self.last_btn.get(machine.id)
+            # Duplicates are not stored but still show the machine is talking
+            self._track_state(machine.id, ts)
 
             if status in ("on", "off"):
                 if last_state == status:
@@ -224,6 +232,12 @@ class Ingestor:
                 else:
                     self.last_btn[machine.id] = btn
 
+            if save_msg:
+                if status in ("on", "off"):
+                    self._track_state(machine.id, ts, status=status, status_since=ts, reason_id=None)
+                else:
+                    self._track_state(machine.id, ts, reason_id=reason_id)
+
         if not save_msg:
             self.stats[f"{status}_dup_state"] += 1
             return
@@ -258,9 +272,11 @@ class Ingestor:
         # Ignore same rotation repeats
         with self.state_lock:
             if self.last_rotation.get(machine.id) == rotation:
+                self._track_state(machine.id, ts)
                 self.stats["rotation_dup_state"] += 1
                 return
             self.last_rotation[machine.id] = rotation
+            self._track_state(machine.id, ts, last_count=rotation, last_count_time=ts)
 
         try:
             self.q_rotation.put_nowait(RotationMsg(machine=machine, rotation=rotation, ts=ts))
@@ -269,6 +285,53 @@ class Ingestor:
             self._append_to_buffer("rotation_overflow", data)
             self.stats["rotation_overflow"] += 1
 
+    # ---------- Current state ----------
+    def _track_state(self, machine_id: int, ts: datetime, **fields):
+        """Update the in-memory current state of a machine. Caller holds state_lock."""
+        state = self.current_state.setdefault(machine_id, dict.fromkeys(CURRENT_STATE_FIELDS))
+        state.update(fields)
+        if state["last_message_time"] is None or ts > state["last_message_time"]:
+            state["last_message_time"] = ts
+        self.state_dirty.add(machine_id)
+
+    def _upsert_current_state(self, machine_ids):
+        """
+        Write the latest known state of the given machines, and of any other
+        machine changed since the last write, in one statement.
+        """
+        with self.state_lock:
+            machine_ids = set(machine_ids) | self.state_dirty
+            self.state_dirty.clear()
+            rows = [
+                MachineCurrentState(machine_id=machine_id, **self.current_state[machine_id])
+                for machine_id in machine_ids
+                if machine_id in self.current_state
+            ]
+        if not rows:
+            return
+        try:
+            MachineCurrentState.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["machine"],
+                update_fields=CURRENT_STATE_FIELDS + ["updated_at"],
+            )
+        except Exception as e:
+            LOG.error("Current state upsert failed: %s", e)
+            with self.state_lock:
+                self.state_dirty |= machine_ids
+
+    def _publish_state(self, machine_ids):
+        """Push the new on/off state of the given machines to live pages."""
+        with self.state_lock:
+            states = {
+                machine_id: {field: self.current_state[machine_id][field] for field in ("status", "status_since", "reason_id")}
+                for machine_id in machine_ids
+                if machine_id in self.current_state
+            }
+        for machine_id, state in states.items():
+            publish_machine_event(machine_id, "state", **state)
+
     # ---------- Buffer ----------
     def _append_to_buffer(self, prefix: str, data: Dict[str, Any]):
         try:
@@ -297,21 +360,39 @@ class Ingestor:
     # ---------- Load last known state from DB ----------
     def load_last_known_state(self):
         try:
-            # Load last status per machine
-            latest_status = (
-                MachineStatus.objects.order_by("machine_id", "-status_time")
-                .distinct("machine_id")
-            )
-            for row in latest_status:
-                self.last_status[row.machine_id] = row.status
-
-            # Load last rotation per machine
-            latest_rotation = (
-                RotationStatus.objects.order_by("machine_id", "-count_time")
-                .distinct("machine_id")
-            )
-            for row in latest_rotation:
-                self.last_rotation[row.machine_id] = row.count
+            # Messages replayed from the buffer are newer, so only fill gaps
+            with self.state_lock:
+                # Current state table holds one row per machine
+                for row in MachineCurrentState.objects.values("machine_id", *CURRENT_STATE_FIELDS):
+                    machine_id = row.pop("machine_id")
+                    state = self.current_state.setdefault(machine_id, row)
+                    for field, value in row.items():
+                        if state[field] is None:
+                            state[field] = value
+                    if row["status"]:
+                        self.last_status.setdefault(machine_id, row["status"])
+                    if row["last_count"] is not None:
+                        self.last_rotation.setdefault(machine_id, row["last_count"])
+
+                # Fall back to history for machines without a current state row yet
+                latest_status = (
+                    MachineStatus.objects.filter(status__in=["on", "off"])
+                    .exclude(machine_id__in=list(self.last_status))
+                    .order_by("machine_id", "-status_time")
+                    .distinct("machine_id")
+                )
+                for row in latest_status:
+                    self.last_status[row.machine_id] = row.status
+                    self._track_state(row.machine_id, row.status_time, status=row.status, status_since=row.status_time)
+
+                latest_rotation = (
+                    RotationStatus.objects.exclude(machine_id__in=list(self.last_rotation))
+                    .order_by("machine_id", "-count_time")
+                    .distinct("machine_id")
+                )
+                for row in latest_rotation:
+                    self.last_rotation[row.machine_id] = row.count
+                    self._track_state(row.machine_id, row.count_time, last_count=row.count, last_count_time=row.count_time)
 
             LOG.info(
                 "Loaded last known state: %d statuses, %d rotations",
@@ -338,6 +419,7 @@ class Ingestor:
         try:
             RotationStatus.objects.bulk_create(batch, ignore_conflicts=True)
             self.stats["rotation_flushed"] += len(batch)
+            self._upsert_current_state({row.machine_id for row in batch})
         except Exception as e:
             LOG.error("Rotation flush failed: %s", e)
             for msg in batch:
@@ -364,11 +446,17 @@ class Ingestor:
 
             if batch:
                 self.db_executor.submit(self._flush_status_batch, batch)
+            elif self.state_dirty:
+                # Only duplicates arrived; still write their last_message_time
+                self.db_executor.submit(self._upsert_current_state, set())
 
     def _flush_status_batch(self, batch: List[MachineStatus]):
         try:
             MachineStatus.objects.bulk_create(batch, ignore_conflicts=True)
             self.stats["status_flushed"] += len(batch)
+            machine_ids = {row.machine_id for row in batch}
+            self._upsert_current_state(machine_ids)
+            self._publish_state(machine_ids)
         except Exception as e:
             LOG.error("Status flush failed: %s", e)
             for msg in batch:
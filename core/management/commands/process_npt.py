@@ -4,6 +4,9 @@ from django.db import transaction
 from django.utils import timezone
 
 from core.models import MachineStatus, ProcessedNPT, Machine, ProcessorCursor
+from core.utils.live_events import publish_machine_event_on_commit
+from core.utils.report_cache import bump_data_version_on_commit
+from core.utils.rolls import recompute_rolls
 
 LOG = logging.getLogger(__name__)
 
@@ -13,8 +16,17 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("--machine", type=int, help="Process only one machine.")
+        parser.add_argument(
+            "--backfill",
+            action="store_true",
+            help="Store duration_seconds for closed downtimes that are missing it.",
+        )
 
     def handle(self, *args, **options):
+        if options.get("backfill"):
+            updated = ProcessedNPT.objects.fill_durations()
+            self.stdout.write(self.style.SUCCESS(f"Backfilled duration for {updated} downtimes."))
+
         machine_id = options.get("machine")
         machines = Machine.objects.filter(id=machine_id) if machine_id else Machine.objects.all()
         if not machines.exists():
@@ -49,28 +61,40 @@ class Command(BaseCommand):
         except ProcessedNPT.DoesNotExist:
             open_off = None
             reason = None
+        # A reason pressed during the still open downtime in this run
+        reason_pressed = False
+        # off_time of every downtime written and start of every roll recomputed,
+        # so only the cached reports they land in are invalidated
+        npt_written = []
+        rolls_written = []
 
         for log in logs:
             if log.status == "off":
                 open_off = log.status_time
                 reason = None
+                reason_pressed = False
 
             elif log.status == "btn":
                 if open_off:
                     # During downtime: always use as reason
                     reason = log.reason
+                    reason_pressed = True
                 else:
                     # After downtime: only use if previous downtime has no reason
                     last_downtime = ProcessedNPT.objects.filter(machine=machine).order_by("-off_time").first()
                     if last_downtime and not last_downtime.reason:
                         last_downtime.reason = log.reason
-                        last_downtime.save(update_fields=["reason"])
+                        last_downtime.save(update_fields=["reason", "updated_at"])
+                        npt_written.append(last_downtime.off_time)
                         LOG.info(
                             "Updated previous downtime reason: machine=%s off=%s reason=%s",
                             machine.id,
                             last_downtime.off_time,
                             log.reason.id,
                         )
+                        publish_machine_event_on_commit(
+                            machine.id, "downtime_updated", off_time=last_downtime.off_time, reason_id=log.reason.id
+                        )
 
             elif log.status == "on":
                 if open_off:
@@ -78,7 +102,11 @@ class Command(BaseCommand):
                     ProcessedNPT.objects.update_or_create(
                         machine=machine,
                         off_time=open_off,
-                        defaults={"on_time": log.status_time, "reason": reason},
+                        defaults={
+                            "on_time": log.status_time,
+                            "reason": reason,
+                            "duration_seconds": (log.status_time - open_off).total_seconds(),
+                        },
                     )
                     LOG.info(
                         "Processed downtime: machine=%s off=%s on=%s reason=%s",
@@ -87,18 +115,30 @@ class Command(BaseCommand):
                         log.status_time,
                         reason.id if reason else None,
                     )
+                    npt_written.append(open_off)
+                    # Rolls built before this downtime was known keep stale NPT otherwise
+                    if recompute_rolls(machine.id, open_off, log.status_time):
+                        rolls_written.append(open_off)
+                    publish_machine_event_on_commit(
+                        machine.id,
+                        "downtime_closed",
+                        off_time=open_off,
+                        on_time=log.status_time,
+                        reason_id=reason.id if reason else None,
+                    )
                     open_off = None
                     reason = None
+                    reason_pressed = False
 
             # Advance cursor every log
             cursor.last_timestamp = log.status_time
 
         # If downtime still open, create/update without on_time
         if open_off:
-            ProcessedNPT.objects.update_or_create(
+            _, created = ProcessedNPT.objects.update_or_create(
                 machine=machine,
                 off_time=open_off,
-                defaults={"on_time": None, "reason": reason},
+                defaults={"on_time": None, "reason": reason, "duration_seconds": None},
             )
             LOG.info(
                 "Open downtime active: machine=%s off=%s reason=%s",
@@ -106,5 +146,22 @@ class Command(BaseCommand):
                 open_off,
                 reason.id if reason else None,
             )
+            # Later runs only refresh the open row; announce it once
+            if created:
+                npt_written.append(open_off)
+                if recompute_rolls(machine.id, open_off):
+                    rolls_written.append(open_off)
+                publish_machine_event_on_commit(
+                    machine.id, "downtime_opened", off_time=open_off, reason_id=reason.id if reason else None
+                )
+            elif reason_pressed:
+                npt_written.append(open_off)
+                publish_machine_event_on_commit(
+                    machine.id, "downtime_updated", off_time=open_off, reason_id=reason.id if reason else None
+                )
 
         cursor.save(update_fields=["last_timestamp", "updated_at"])
+        if npt_written:
+            bump_data_version_on_commit(machine.id, ("machine_status",), min(npt_written), cursor.last_timestamp)
+        if rolls_written:
+            bump_data_version_on_commit(machine.id, ("rotation_status",), min(rolls_written), cursor.last_timestamp)
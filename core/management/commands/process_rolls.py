@@ -0,0 +1,107 @@
+import logging
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import RotationStatus, Machine, ProcessorCursor, Roll
+from core.utils.report_cache import bump_data_version_on_commit
+from core.utils.rolls import get_machine_npt_index, update_roll_metrics
+
+LOG = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Extend Roll records incrementally from new RotationStatus logs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--machine", type=int, help="Process only one machine.")
+
+    def handle(self, *args, **options):
+        machine_id = options.get("machine")
+        machines = Machine.objects.filter(id=machine_id) if machine_id else Machine.objects.all()
+        if not machines.exists():
+            self.stdout.write(self.style.ERROR("No machines found."))
+            return
+
+        for machine in machines:
+            self.stdout.write(f"Processing rolls for machine {machine.id} ({machine})...")
+            self.process_machine(machine)
+
+    @transaction.atomic
+    def process_machine(self, machine):
+        measurement = f"rotation_status_{machine.id}"
+        cursor, _ = ProcessorCursor.objects.get_or_create(
+            measurement=measurement, defaults={"last_timestamp": None}
+        )
+
+        qs = RotationStatus.objects.filter(machine=machine)
+        if cursor.last_timestamp:
+            qs = qs.filter(count_time__gt=cursor.last_timestamp)
+
+        logs = list(qs.order_by("count_time").values_list("count_time", "count"))
+        if not logs:
+            LOG.debug("No new rotations for machine=%s", machine.id)
+            return
+
+        # Continue the roll that was still running at the end of the last run
+        roll = Roll.objects.filter(machine=machine, is_closed=False).order_by("-start_time").first()
+        touched = []
+
+        # One NPT fetch covering every roll touched in this run; ongoing NPT
+        # lasts until the last log
+        window_start = roll.start_time if roll else logs[0][0]
+        window_end = logs[-1][0]
+        npt_index = get_machine_npt_index(machine.id, window_start, window_end)
+
+        # Rotations counted during a downtime do not start or extend a roll
+        in_npt = npt_index.contains([count_time for count_time, _ in logs], machine.id)
+
+        for (count_time, count), skipped in zip(logs, in_npt):
+            # Advance cursor every log
+            cursor.last_timestamp = count_time
+            if skipped:
+                continue
+
+            if roll is None:
+                roll = Roll(
+                    machine=machine,
+                    start_time=count_time,
+                    end_time=count_time,
+                    start_count=count,
+                    end_count=count,
+                )
+            elif count < roll.end_count:
+                # Counter went down: the previous roll was cut
+                roll.is_closed = True
+                touched.append(roll)
+                roll = Roll(
+                    machine=machine,
+                    start_time=count_time,
+                    end_time=count_time,
+                    start_count=count,
+                    end_count=count,
+                )
+            else:
+                roll.end_time = count_time
+                roll.end_count = count
+
+        if roll is not None:
+            touched.append(roll)
+
+        update_roll_metrics(touched, npt_index)
+        for item in touched:
+            item.save()
+            LOG.info(
+                "Processed roll: machine=%s start=%s end=%s count=%s closed=%s",
+                machine.id,
+                item.start_time,
+                item.end_time,
+                item.count,
+                item.is_closed,
+            )
+
+        cursor.save(update_fields=["last_timestamp", "updated_at"])
+        if touched:
+            # Rotations only feed the roll reports; NPT-only reports keep their keys
+            bump_data_version_on_commit(
+                machine.id, ("rotation_status",), min(item.start_time for item in touched), cursor.last_timestamp
+            )
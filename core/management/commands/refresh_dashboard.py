@@ -0,0 +1,46 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from frontend.utils.function_dashboard_helper import DASHBOARD_REFRESH_SECONDS, refresh_dashboard_frames
+
+LOG = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the shared dashboard frames into the cache every tick. "
+        "Needs a cache shared with the web workers (REDIS_URL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=DASHBOARD_REFRESH_SECONDS,
+            help="Seconds between refreshes.",
+        )
+        parser.add_argument("--once", action="store_true", help="Refresh once and exit.")
+
+    def handle(self, *args, **options):
+        interval = options["interval"]
+        # Outlive a missed tick so viewers never fall back to building inline
+        timeout = interval * 3
+
+        while True:
+            started = time.monotonic()
+            try:
+                frames = refresh_dashboard_frames(timeout=timeout)
+                LOG.info(
+                    "Refreshed dashboard frames: npt=%d rotations=%d in %.2fs",
+                    len(frames["npt_df"]),
+                    len(frames["rot_df"]),
+                    time.monotonic() - started,
+                )
+            except Exception as e:
+                LOG.error("Dashboard refresh failed: %s", e)
+
+            if options["once"]:
+                return
+            time.sleep(max(0, interval - (time.monotonic() - started)))
@@ -0,0 +1,223 @@
+import logging
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min, Q
+
+from core.models import Machine, MachineStatus, ProcessedNPT, ProcessorCursor, ReportSnapshot, Roll, RotationStatus
+from core.utils.archive import archived_npt_records, read_archive
+from core.utils.rolls import block_counts, clip_roll_to_window, load_rotation_arrays, shift_blocks
+from core.utils.sweep import NptIntervalIndex
+from library.models import Shift
+
+LOG = logging.getLogger(__name__)
+
+# Days computed per fetch; the rotation logs of a chunk are held in memory
+CHUNK_DAYS = 7
+
+# Shift-wise roll counter layouts, see get_rotation_report_rows
+BLOCK_LAYOUTS = (4, 6)
+# Longest shift still split into 4 blocks
+FOUR_BLOCK_MAX_SECONDS = 8 * 3600 + 60
+
+
+class Command(BaseCommand):
+    help = "Materialise per-day and per-shift NPT and roll metrics of closed days into ReportSnapshot"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--machine", type=int, help="Snapshot only one machine.")
+        parser.add_argument("--from", dest="date_from", help="First date (YYYY-MM-DD). Defaults to the day after the last snapshot.")
+        parser.add_argument("--to", dest="date_to", help="Last date (YYYY-MM-DD). Defaults to the last closed day.")
+        parser.add_argument("--rebuild", action="store_true", help="Replace existing snapshots in the range.")
+
+    def handle(self, *args, **options):
+        try:
+            date_from = datetime.strptime(options["date_from"], "%Y-%m-%d").date() if options.get("date_from") else None
+            date_to = datetime.strptime(options["date_to"], "%Y-%m-%d").date() if options.get("date_to") else None
+        except ValueError:
+            raise CommandError("Dates must be in YYYY-MM-DD format.")
+
+        machine_id = options.get("machine")
+        machines = Machine.objects.filter(id=machine_id) if machine_id else Machine.objects.all()
+        if not machines.exists():
+            self.stdout.write(self.style.ERROR("No machines found."))
+            return
+
+        # No request here, so skip the company-scoped manager
+        shifts = list(Shift.all_objects.filter(is_deleted=False))
+
+        for machine in machines:
+            self.stdout.write(f"Snapshotting machine {machine.id} ({machine})...")
+            count = self.snapshot_machine(machine, shifts, date_from, date_to, options.get("rebuild"))
+            self.stdout.write(f"  {count} days")
+
+    def snapshot_machine(self, machine, shifts, date_from, date_to, rebuild=False):
+        last_closed = self.get_last_closed_date(machine, shifts)
+        date_from = date_from or self.get_start_date(machine)
+        date_to = min(date_to, last_closed) if date_to else last_closed
+        if date_from is None or date_from > date_to:
+            return 0
+
+        days = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+        for i in range(0, len(days), CHUNK_DAYS):
+            chunk = days[i:i + CHUNK_DAYS]
+            snapshots = self.build_snapshots(machine, shifts, chunk)
+            with transaction.atomic():
+                if rebuild:
+                    ReportSnapshot.objects.filter(machine=machine, date__range=(chunk[0], chunk[-1])).delete()
+                # Existing snapshots are immutable unless rebuilt
+                ReportSnapshot.objects.bulk_create(snapshots, ignore_conflicts=True)
+
+        LOG.info("Snapshotted reports: machine=%s from=%s to=%s", machine.id, date_from, date_to)
+        return len(days)
+
+    @staticmethod
+    def get_last_closed_date(machine, shifts):
+        """
+        Last day whose day and shift windows all end before the first status
+        or rotation log that process_npt or process_rolls has not handled
+        yet, i.e. whose NPT and rolls can no longer change. Machines with
+        nothing pending (including idle ones) are closed up to now.
+        """
+        pending = []
+        for measurement, model, time_field in (
+            ("machine_status", MachineStatus, "status_time"),
+            ("rotation_status", RotationStatus, "count_time"),
+        ):
+            cursor = ProcessorCursor.objects.filter(
+                measurement=f"{measurement}_{machine.id}"
+            ).values_list("last_timestamp", flat=True).first()
+            logs = model.objects.filter(machine=machine)
+            if cursor:
+                logs = logs.filter(**{f"{time_field}__gt": cursor})
+            pending.append(logs.aggregate(first=Min(time_field))["first"])
+        closed_until = min([first for first in pending if first] or [datetime.now()])
+
+        # Overnight shifts of a day end on the next one
+        day = closed_until.date()
+        spill = max(
+            [timedelta(days=1)] + [shift.get_window(day)[1] - datetime.combine(day, time.min) for shift in shifts]
+        )
+        return min((closed_until - spill).date(), date.today() - timedelta(days=1))
+
+    @staticmethod
+    def get_start_date(machine):
+        """
+        Day after the last snapshot, otherwise the first day with downtime or
+        the day the machine was added, whichever is earlier. Idle days get
+        zero-valued snapshots, so reports never compute them live.
+        """
+        last = ReportSnapshot.objects.filter(machine=machine, shift__isnull=True).aggregate(last=Max("date"))["last"]
+        if last:
+            return last + timedelta(days=1)
+
+        first_dates = [
+            ProcessedNPT.objects.filter(machine=machine).aggregate(first=Min("off_time"))["first"],
+            machine.created_at,
+        ]
+        first_dates = [d.date() for d in first_dates if d]
+        return min(first_dates) if first_dates else None
+
+    @staticmethod
+    def build_snapshots(machine, shifts, days):
+        """Unsaved ReportSnapshot rows for the whole day and each shift of every day."""
+        windows = {None: [(datetime.combine(d, time.min), datetime.combine(d, time.min) + timedelta(days=1)) for d in days]}
+        for shift in shifts:
+            windows[shift.id] = [shift.get_window(d) for d in days]
+        start = min(w[0][0] for w in windows.values())
+        end = max(w[-1][1] for w in windows.values())
+
+        # One NPT fetch for the whole chunk; older rows may be archived.
+        # Open rows superseded by a later downtime are skipped, as in the reports
+        npts = list(
+            ProcessedNPT.objects.filter(machine=machine).skip_null_on_time_except_last().filter(
+                Q(on_time__gt=start) | Q(on_time__isnull=True), off_time__lt=end
+            ).values_list("off_time", "on_time")
+        )
+        npts += [(r.off_time, r.on_time) for r in archived_npt_records([machine.id], start - timedelta(days=1), end)]
+        npt_index = NptIntervalIndex({machine.id: npts}, end)
+        off_times = sorted(off_time for off_time, _ in npts)
+
+        rotation_qs = RotationStatus.objects.filter(machine=machine)
+        rotations = load_rotation_arrays(
+            rotation_qs.filter(count_time__gte=start, count_time__lt=end),
+            read_archive("rotation", [machine.id], start, end),
+        )
+        rolls = list(Roll.objects.filter(machine=machine, start_time__lt=end, end_time__gte=start).order_by("start_time"))
+
+        snapshots = []
+        for shift_id, shift_windows in windows.items():
+            window_starts = [window_start for window_start, _ in shift_windows]
+            window_ends = [window_end for _, window_end in shift_windows]
+            overlaps = npt_index.overlap_many(window_starts, window_ends, machine.id)
+            blocks = Command.get_block_rotations(rotations, shift_windows, shift_id is not None)
+
+            for i, (day, (window_start, window_end), npt_seconds) in enumerate(zip(days, shift_windows, overlaps)):
+                # Downtimes and rolls are counted in the window they start in
+                events = bisect_left(off_times, window_end) - bisect_left(off_times, window_start)
+                snapshot = ReportSnapshot(
+                    machine=machine,
+                    date=day,
+                    shift_id=shift_id,
+                    npt_seconds=float(npt_seconds),
+                    npt_events=events,
+                    rolls=sum(window_start <= roll.start_time < window_end for roll in rolls),
+                    rotation_records=blocks["records"][i],
+                    block_rotations={layout: totals[i] for layout, totals in blocks["layouts"].items()},
+                )
+
+                # Windows are half-open; clip_roll_to_window takes inclusive bounds
+                last_instant = window_end - timedelta(microseconds=1)
+                for roll in rolls:
+                    if roll.start_time > last_instant or roll.end_time < window_start:
+                        continue
+                    clipped = clip_roll_to_window(roll, rotation_qs, npt_index, window_start, last_instant)
+                    if clipped is None:
+                        continue
+                    snapshot.rotations += clipped["total_count"]
+                    snapshot.roll_minutes += clipped["duration_minutes"]
+                    snapshot.roll_npt_minutes += clipped["npt_minutes"]
+                    snapshot.productive_minutes += clipped["productive_minutes"]
+                snapshots.append(snapshot)
+        return snapshots
+
+    @staticmethod
+    def get_block_rotations(rotations, windows, per_block):
+        """
+        Rotation records of every window and, for shift windows, the
+        reset-aware count of each 2-hour block in every layout that applies.
+
+        Returns:
+            dict with "records" (one int per window) and "layouts" mapping
+            "4"/"6" to a list of block counts per window
+        """
+        starts = np.array([window_start for window_start, _ in windows], dtype="datetime64[us]")
+        ends = np.array([window_end for _, window_end in windows], dtype="datetime64[us]")
+        _, records = block_counts(rotations, starts, ends)
+        result = {"records": [int(n) for n in records], "layouts": {}}
+        if not per_block:
+            return result
+
+        # 6 blocks are only used when every shift is longer than 8 hours
+        longest = max((window_end - window_start).total_seconds() for window_start, window_end in windows)
+        for num_blocks in BLOCK_LAYOUTS:
+            if num_blocks > 4 and longest <= FOUR_BLOCK_MAX_SECONDS:
+                continue
+            bounds = [
+                (max(block_start, window_start), min(block_end, window_end))
+                for window_start, window_end in windows
+                for block_start, block_end in shift_blocks(window_start, window_end, num_blocks)
+            ]
+            totals, _ = block_counts(
+                rotations,
+                np.array([block_start for block_start, _ in bounds], dtype="datetime64[us]"),
+                np.array([block_end for _, block_end in bounds], dtype="datetime64[us]"),
+            )
+            result["layouts"][str(num_blocks)] = [
+                [int(total) for total in totals[i:i + num_blocks]] for i in range(0, len(totals), num_blocks)
+            ]
+        return result
@@ -16,6 +16,7 @@ from datetime import datetime
 from core.fields import MACAddressField
 
 from core.managers import UserManager
+from core.querysets import ProcessedNPTQuerySet
 User = settings.AUTH_USER_MODEL
 
 ACTION_TYPES = [
@@ -403,6 +404,8 @@ class RotationStatus(models.Model):
         ]
         indexes = [
             models.Index(fields=["machine", "count_time"]),
+            # Keyset pagination of the rotation log
+            models.Index(fields=["count_time", "id"]),
         ]
         ordering = ["-count_time"]
 
@@ -425,6 +428,12 @@ class ProcessedNPT(models.Model):
     )
     off_time = models.DateTimeField()
     on_time = models.DateTimeField(null=True, blank=True)
+    # Filled by process_npt when the downtime closes; null while open
+    duration_seconds = models.FloatField(null=True, blank=True)
+    # Set on every save, so live views can fetch only the rows that changed
+    updated_at = models.DateTimeField(auto_now=True, null=True, db_index=True)
+
+    objects = ProcessedNPTQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Processed NPT"
@@ -432,6 +441,10 @@ class ProcessedNPT(models.Model):
         constraints = [
             models.UniqueConstraint(fields=["machine", "off_time"], name="unique_machine_off_time")
         ]
+        indexes = [
+            # Keyset pagination of the NPT log
+            models.Index(fields=["off_time", "id"]),
+        ]
 
     def get_duration(self):
         """
@@ -459,3 +472,141 @@ class ProcessorCursor(models.Model):
     def __str__(self):
         return f"{self.measurement} → {self.last_timestamp}"
 
+
+class Roll(models.Model):
+    """
+    A fabric roll, i.e. the span between two rotation counter resets.
+    Built incrementally from RotationStatus by the process_rolls command.
+    """
+    machine = models.ForeignKey(
+        Machine,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="rolls"
+    )
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    start_count = models.IntegerField()
+    end_count = models.IntegerField()
+    count = models.IntegerField(default=0)
+    productive_minutes = models.FloatField(default=0)
+    npt_minutes = models.FloatField(default=0)
+    is_closed = models.BooleanField(default=False)
+
+    class Meta:
+        verbose_name = "Roll"
+        verbose_name_plural = "Rolls"
+        constraints = [
+            models.UniqueConstraint(fields=["machine", "start_time"], name="unique_machine_roll_start_time")
+        ]
+        indexes = [
+            models.Index(fields=["machine", "start_time"]),
+            models.Index(fields=["machine", "end_time"]),
+        ]
+        ordering = ["-start_time"]
+
+    @property
+    def duration_minutes(self):
+        return (self.end_time - self.start_time).total_seconds() / 60
+
+    @property
+    def avg_rpm(self):
+        """Average RPM over the productive time of the roll."""
+        if self.productive_minutes > 0 and self.count > 0:
+            return self.count / self.productive_minutes
+        return 0
+
+    def __str__(self):
+        return f"{self.machine} - {self.count} @ {self.start_time}"
+
+class MachineCurrentState(models.Model):
+    """
+    What each machine is doing right now, one row per machine.
+    Upserted by the mqtt_ingestor flush workers so live views do not have
+    to derive it from history.
+    """
+    machine = models.OneToOneField(
+        Machine,
+        on_delete=models.CASCADE,
+        related_name="current_state"
+    )
+    status = models.CharField(max_length=10, choices=MachineStatus.STATUS_CHOICES[:2], null=True, blank=True)
+    status_since = models.DateTimeField(null=True, blank=True)
+    reason = models.ForeignKey(
+        NptReason,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    last_count = models.IntegerField(null=True, blank=True)
+    last_count_time = models.DateTimeField(null=True, blank=True)
+    last_message_time = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Machine Current State"
+        verbose_name_plural = "Machine Current State"
+
+    def __str__(self):
+        return f"{self.machine} - {self.status} since {self.status_since}"
+
+
+class ReportSnapshot(models.Model):
+    """
+    Frozen NPT and roll metrics of one machine for one closed day, either
+    for the whole calendar day (shift is null) or for one shift starting
+    on that day. Written by the snapshot_reports command once the
+    processors have moved past the day, so reports only compute today live.
+
+    Roll metrics are those of the rolls clipped to the window, like the
+    rotation counter clips them to its range; rolls are counted in the
+    window they start in. block_rotations holds the shift-wise roll counter
+    blocks of shift rows, keyed by the number of blocks ("4" or "6").
+    """
+    machine = models.ForeignKey(
+        Machine,
+        on_delete=models.CASCADE,
+        related_name="report_snapshots"
+    )
+    date = models.DateField()
+    shift = models.ForeignKey(
+        "library.Shift",
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="report_snapshots"
+    )
+    npt_seconds = models.FloatField(default=0)
+    npt_events = models.IntegerField(default=0)
+    rolls = models.IntegerField(default=0)
+    rotations = models.IntegerField(default=0)
+    roll_minutes = models.FloatField(default=0)
+    roll_npt_minutes = models.FloatField(default=0)
+    productive_minutes = models.FloatField(default=0)
+    rotation_records = models.IntegerField(default=0)
+    block_rotations = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Report Snapshot"
+        verbose_name_plural = "Report Snapshots"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["machine", "date", "shift"],
+                condition=Q(shift__isnull=False),
+                name="unique_machine_date_shift_snapshot"
+            ),
+            models.UniqueConstraint(
+                fields=["machine", "date"],
+                condition=Q(shift__isnull=True),
+                name="unique_machine_date_snapshot"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["machine", "date"]),
+        ]
+        ordering = ["-date"]
+
+    def __str__(self):
+        return f"{self.machine} @ {self.date} ({self.shift or 'day'})"
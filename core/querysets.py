@@ -1,5 +1,9 @@
 # ocmscore/querysets.py
+from datetime import datetime
+
 from django.db import models
+from django.db.models import Avg, Count, Exists, ExpressionWrapper, F, OuterRef, Q, Sum, Value
+from django.db.models.functions import Coalesce, Extract
 from django.utils import timezone
 from .signals import post_soft_delete, post_hard_delete, post_restore
 
@@ -30,3 +34,59 @@ class SoftDeleteQuerySet(models.QuerySet):
         for obj in self:
             post_restore.send(sender=obj.__class__, instance=obj, user=user)
         return count
+
+
+class ProcessedNPTQuerySet(models.QuerySet):
+    @staticmethod
+    def _elapsed_seconds(end):
+        return Extract(
+            ExpressionWrapper(end - F('off_time'), output_field=models.DurationField()),
+            'epoch',
+            output_field=models.FloatField(),
+        )
+
+    def with_effective_duration(self, now=None):
+        """
+        Annotate `effective_duration` in seconds. Closed downtimes use the
+        stored duration, open ones run until `now` (naive, like off_time).
+        """
+        now = now or datetime.now()
+        running_until = Coalesce('on_time', Value(now, output_field=models.DateTimeField()))
+        return self.annotate(
+            effective_duration=Coalesce(
+                'duration_seconds',
+                self._elapsed_seconds(running_until),
+                output_field=models.FloatField(),
+            )
+        )
+
+    def duration_totals(self, *fields, now=None):
+        """
+        One grouped aggregate per combination of `fields`
+        (e.g. 'machine__mc_no', 'reason__name', 'off_time__date').
+        """
+        return (
+            self.with_effective_duration(now)
+            .order_by()
+            .values(*fields)
+            .annotate(
+                events=Count('id'),
+                total_seconds=Sum('effective_duration'),
+                avg_seconds=Avg('effective_duration'),
+            )
+        )
+
+    def skip_null_on_time_except_last(self):
+        """
+        Drop open downtimes (null on_time) except the latest row of each
+        machine within this queryset, as a single statement.
+        """
+        later = self.filter(machine_id=OuterRef('machine_id'), off_time__gt=OuterRef('off_time'))
+        return self.filter(Q(on_time__isnull=False) | ~Exists(later))
+
+    def fill_durations(self):
+        """Store duration_seconds for closed rows that are missing it."""
+        return self.filter(on_time__isnull=False, duration_seconds__isnull=True).update(
+            duration_seconds=self._elapsed_seconds(F('on_time')),
+            updated_at=datetime.now(),
+        )
@@ -1,3 +1,465 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+import tempfile
+from unittest.mock import patch
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.models import Block, Building, Company, Floor, Machine, ProcessedNPT, ProcessorCursor, ReportSnapshot, Roll, RotationStatus
+from core.utils.archive import archive_path, archived_npt_records, read_archive
+from core.utils.report_cache import (
+    CLOSED_RANGE_TIMEOUT,
+    LIVE_BUCKET_SECONDS,
+    bump_data_version,
+    cached_report,
+    live_range_end,
+    remember_cached_range,
+    report_cache_key,
+)
+from core.utils.rolls import block_counts
+from core.utils.sweep import NptIntervalIndex
+from core.utils.utils import decode_cursor, encode_cursor, keyset_frame_page, keyset_page
+from library.models import Shift
+
+KEYS = ("count_time", "id")
+
+
+def at(hour, minute=0, second=0, day=1):
+    """Naive datetime on 2025-01-<day>."""
+    return datetime(2025, 1, day, hour, minute, second)
+
+
+def make_machine(mc_no):
+    company, _ = Company.objects.get_or_create(name="Test Company")
+    building, _ = Building.objects.get_or_create(name="Building", company=company)
+    floor, _ = Floor.objects.get_or_create(name="Floor", building=building)
+    block, _ = Block.objects.get_or_create(name="Block", floor=floor)
+    return Machine.objects.create(mc_no=mc_no, block=block)
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip_keeps_microseconds(self):
+        row = {"count_time": datetime(2025, 1, 31, 23, 59, 59, 123456), "id": 42}
+        self.assertEqual(decode_cursor(encode_cursor(row, KEYS)), (row["count_time"], 42))
+
+    def test_malformed_cursor_raises_value_error(self):
+        for cursor in ("not a cursor", encode_cursor({"a": 1}, ["a"]), encode_cursor({"a": "x", "b": 1}, ["a", "b"])):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+
+class KeysetPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        start = datetime(2025, 1, 1, 10)
+        # Two rows share a timestamp, so paging has to fall back to the id
+        times = [start, start + timedelta(minutes=1), start + timedelta(minutes=1), start + timedelta(minutes=2), start + timedelta(minutes=3)]
+        for count, count_time in enumerate(times):
+            RotationStatus.objects.create(machine=None, count=count, count_time=count_time)
+
+    def walk(self, per_page, descending):
+        """Ids of every page, following cursors like the log endpoints do."""
+        queryset = RotationStatus.objects.values("id", "count_time")
+        ids, after, pages = [], None, 0
+        while True:
+            rows, has_more = keyset_page(queryset, KEYS, after, per_page, descending)
+            ids += [row["id"] for row in rows]
+            pages += 1
+            if not has_more:
+                return ids, pages
+            after = decode_cursor(encode_cursor(rows[-1], KEYS))
+
+    def expected(self, descending):
+        order = ("-count_time", "-id") if descending else ("count_time", "id")
+        return list(RotationStatus.objects.order_by(*order).values_list("id", flat=True))
+
+    def test_pages_cover_every_row_once_descending(self):
+        ids, pages = self.walk(2, descending=True)
+        self.assertEqual(ids, self.expected(descending=True))
+        self.assertEqual(pages, 3)
+
+    def test_pages_cover_every_row_once_ascending(self):
+        ids, _ = self.walk(2, descending=False)
+        self.assertEqual(ids, self.expected(descending=False))
+
+    def test_last_full_page_has_no_more(self):
+        rows, has_more = keyset_page(RotationStatus.objects.values("id", "count_time"), KEYS, per_page=5)
+        self.assertEqual(len(rows), 5)
+        self.assertFalse(has_more)
+
+    def test_empty_queryset(self):
+        self.assertEqual(keyset_page(RotationStatus.objects.none().values("id", "count_time"), KEYS), ([], False))
+
+    def test_frame_page_matches_queryset_page(self):
+        queryset = RotationStatus.objects.values("id", "count_time")
+        df = pd.DataFrame.from_records(list(queryset))
+        rows, _ = keyset_page(queryset, KEYS, per_page=2)
+        after = decode_cursor(encode_cursor(rows[-1], KEYS))
+
+        live, live_more = keyset_page(queryset, KEYS, after, per_page=2)
+        frame, frame_more = keyset_frame_page(df, KEYS, after, per_page=2)
+        self.assertEqual([row["id"] for row in frame], [row["id"] for row in live])
+        self.assertEqual(frame_more, live_more)
+
+
+class NptIntervalIndexTests(SimpleTestCase):
+    def setUp(self):
+        # Machine 1: two overlapping downtimes merging into 10:00-11:00 and
+        # one still open from 12:00, which lasts until 13:00
+        self.index = NptIntervalIndex(
+            {
+                1: [(at(10), at(10, 30)), (at(10, 20), at(11)), (at(12), None)],
+                2: [(at(10), at(10, 10))],
+            },
+            until=at(13),
+        )
+
+    def test_overlap_covers_whole_intervals(self):
+        self.assertEqual(self.index.overlap(at(9), at(14), 1), 7200)
+
+    def test_overlap_trims_intervals_at_window_edges(self):
+        self.assertEqual(self.index.overlap(at(10, 30), at(12, 30), 1), 3600)
+        self.assertEqual(self.index.overlap(at(10, 15), at(10, 45), 1), 1800)
+
+    def test_window_touching_intervals_has_no_overlap(self):
+        self.assertEqual(self.index.overlap(at(11), at(12), 1), 0)
+
+    def test_open_downtime_lasts_until(self):
+        self.assertEqual(self.index.overlap(at(12), at(14), 1), 3600)
+
+    def test_overlap_many_per_window(self):
+        seconds = self.index.overlap_many([at(9), at(11), at(12, 30)], [at(10, 30), at(12), at(13)], 1)
+        np.testing.assert_array_equal(seconds, [1800, 0, 1800])
+
+    def test_overlap_of_all_and_unknown_machines(self):
+        self.assertEqual(self.index.overlap(at(9), at(14)), 7200 + 600)
+        self.assertEqual(self.index.overlap(at(9), at(14), 99), 0)
+        self.assertEqual(NptIntervalIndex({}, at(13)).overlap(at(9), at(14)), 0)
+
+    def test_contains_uses_half_open_intervals(self):
+        times = [at(9, 59), at(10), at(10, 59, 59), at(11), at(12, 30), at(13)]
+        np.testing.assert_array_equal(
+            self.index.contains(times, 1), [False, True, True, False, True, False]
+        )
+
+    def test_contains_unknown_machine_and_empty_input(self):
+        np.testing.assert_array_equal(self.index.contains([at(10)], 99), [False])
+        self.assertEqual(len(self.index.contains([], 1)), 0)
+
+    def test_outside_keeps_rows_out_of_downtime_in_order(self):
+        rows = [
+            {"machine": 1, "time": at(10, 15)},
+            {"machine": 2, "time": at(10, 15)},
+            {"machine": 1, "time": at(11, 30)},
+            {"machine": 2, "time": at(10, 5)},
+        ]
+        self.assertEqual(self.index.outside(rows, "machine", "time"), [rows[1], rows[2]])
+        self.assertEqual(self.index.outside([], "machine", "time"), [])
+
+
+class BlockCountsTests(SimpleTestCase):
+    def rotations(self, machines, times, counts):
+        return {
+            "machine": np.array(machines, dtype=np.int64),
+            "time": np.array(times, dtype="datetime64[us]"),
+            "count": np.array(counts, dtype=np.int64),
+        }
+
+    def blocks(self, *bounds):
+        return (
+            np.array([start for start, _ in bounds], dtype="datetime64[us]"),
+            np.array([end for _, end in bounds], dtype="datetime64[us]"),
+        )
+
+    def test_counts_per_machine_and_block(self):
+        rotations = self.rotations(
+            [1, 1, 1, 1, 2, 2],
+            [at(10), at(10, 30), at(11, 10), at(11, 20), at(10, 5), at(10, 50)],
+            [100, 110, 115, 118, 50, 60],
+        )
+        totals, rows = block_counts(rotations, *self.blocks((at(10), at(11)), (at(11), at(12))))
+        np.testing.assert_array_equal(totals, [11 + 11, 4])
+        np.testing.assert_array_equal(rows, [4, 2])
+
+    def test_counter_reset_starts_a_new_segment(self):
+        rotations = self.rotations([1, 1, 1, 1], [at(10), at(10, 10), at(10, 20), at(10, 30)], [10, 20, 3, 7])
+        totals, _ = block_counts(rotations, *self.blocks((at(10), at(11))))
+        np.testing.assert_array_equal(totals, [11 + 5])
+
+    def test_records_outside_blocks_are_dropped(self):
+        # Before the first block, in the gap between blocks and on an end bound
+        rotations = self.rotations(
+            [1, 1, 1, 1, 1],
+            [at(9), at(10, 30), at(11, 30), at(12, 30), at(13)],
+            [1, 2, 3, 4, 5],
+        )
+        totals, rows = block_counts(rotations, *self.blocks((at(10), at(11)), (at(12), at(13))))
+        np.testing.assert_array_equal(totals, [1, 1])
+        np.testing.assert_array_equal(rows, [1, 1])
+
+    def test_empty_input(self):
+        totals, rows = block_counts(self.rotations([], [], []), *self.blocks((at(10), at(11)), (at(11), at(12))))
+        np.testing.assert_array_equal(totals, [0, 0])
+        np.testing.assert_array_equal(rows, [0, 0])
+
+
+class ProcessRollsTests(TestCase):
+    def setUp(self):
+        self.machine = make_machine("MC-1")
+
+    def log(self, *rotations):
+        for count_time, count in rotations:
+            RotationStatus.objects.create(machine=self.machine, count=count, count_time=count_time)
+
+    def process(self):
+        call_command("process_rolls", machine=self.machine.id, stdout=StringIO())
+        return list(Roll.objects.filter(machine=self.machine).order_by("start_time"))
+
+    def test_counter_reset_closes_the_roll(self):
+        self.log((at(10), 1), (at(10, 30), 31), (at(11), 2), (at(11, 10), 12))
+        first, second = self.process()
+        self.assertTrue(first.is_closed)
+        self.assertEqual((first.start_time, first.end_time, first.count), (at(10), at(10, 30), 31))
+        self.assertFalse(second.is_closed)
+        self.assertEqual(second.count, 11)
+
+    def test_next_run_extends_the_open_roll(self):
+        self.log((at(10), 1), (at(10, 30), 31))
+        self.process()
+        self.log((at(11), 61))
+        (roll,) = self.process()
+        self.assertEqual((roll.end_time, roll.count, roll.productive_minutes), (at(11), 61, 60))
+
+    def test_rotations_during_downtime_are_skipped(self):
+        ProcessedNPT.objects.create(machine=self.machine, off_time=at(10, 20), on_time=at(10, 40))
+        self.log((at(10), 1), (at(10, 30), 31), (at(11), 61))
+        (roll,) = self.process()
+        self.assertEqual(roll.count, 61)
+        self.assertEqual(roll.npt_minutes, 20)
+        self.assertEqual(roll.productive_minutes, 40)
+
+    def test_superseded_open_downtime_is_not_ongoing(self):
+        # The 10:10 row was never closed; the 10:20-10:40 downtime replaced it
+        ProcessedNPT.objects.create(machine=self.machine, off_time=at(10, 10), on_time=None)
+        ProcessedNPT.objects.create(machine=self.machine, off_time=at(10, 20), on_time=at(10, 40))
+        self.log((at(10), 1), (at(10, 50), 51), (at(11), 61))
+        (roll,) = self.process()
+        self.assertEqual((roll.end_time, roll.count), (at(11), 61))
+        self.assertEqual(roll.npt_minutes, 20)
+
+    def test_ongoing_downtime_lasts_until_the_last_log(self):
+        ProcessedNPT.objects.create(machine=self.machine, off_time=at(10, 30), on_time=None)
+        self.log((at(10), 1), (at(10, 20), 21), (at(11), 61))
+        (roll,) = self.process()
+        self.assertEqual(roll.end_time, at(10, 20))
+        cursor = ProcessorCursor.objects.get(measurement=f"rotation_status_{self.machine.id}")
+        self.assertEqual(cursor.last_timestamp, at(11))
+
+
+class SnapshotReportsTests(TestCase):
+    def setUp(self):
+        self.machine = make_machine("MC-1")
+        self.shift = Shift.all_objects.create(
+            name="A", start_time=time(6), end_time=time(14), company=self.machine.block.floor.building.company
+        )
+        # A roll from 06:00 to 09:00, then a counter reset and one across midnight
+        for count_time, count in [
+            (at(6), 1), (at(7), 61), (at(9), 181), (at(23), 5), (at(23, 30), 35), (at(0, 30, day=2), 95),
+        ]:
+            RotationStatus.objects.create(machine=self.machine, count=count, count_time=count_time)
+        # The 12:00 row was never closed; the 13:00-13:30 downtime replaced it
+        ProcessedNPT.objects.create(machine=self.machine, off_time=at(12), on_time=None)
+        ProcessedNPT.objects.create(machine=self.machine, off_time=at(13), on_time=at(13, 30))
+        call_command("process_rolls", machine=self.machine.id, stdout=StringIO())
+        call_command(
+            "snapshot_reports", machine=self.machine.id, date_from="2025-01-01", date_to="2025-01-02", stdout=StringIO()
+        )
+
+    def snapshot(self, day, shift=None):
+        return ReportSnapshot.objects.get(machine=self.machine, date=date(2025, 1, day), shift=shift)
+
+    def test_superseded_open_downtime_is_skipped(self):
+        self.assertEqual(self.snapshot(1).npt_seconds, 1800)
+        self.assertEqual(self.snapshot(1).npt_events, 1)
+        self.assertEqual(self.snapshot(1, self.shift).npt_seconds, 1800)
+        self.assertEqual(self.snapshot(2).npt_seconds, 0)
+
+    def test_rolls_are_clipped_to_the_day(self):
+        day = self.snapshot(1)
+        self.assertEqual((day.rolls, day.rotations, day.roll_minutes, day.productive_minutes), (2, 181 + 31, 210, 210))
+        next_day = self.snapshot(2)
+        self.assertEqual((next_day.rolls, next_day.rotations, next_day.roll_minutes), (0, 1, 0))
+
+    def test_shift_blocks(self):
+        shift = self.snapshot(1, self.shift)
+        self.assertEqual(shift.rotation_records, 3)
+        # An 8 hour shift is only split into 4 blocks
+        self.assertEqual(shift.block_rotations, {"4": [61, 1, 0, 0]})
+        self.assertEqual(self.snapshot(1).block_rotations, {})
+
+    def test_existing_snapshots_are_kept_unless_rebuilt(self):
+        ReportSnapshot.objects.filter(machine=self.machine).update(rotations=0)
+        options = {"machine": self.machine.id, "date_from": "2025-01-01", "date_to": "2025-01-02", "stdout": StringIO()}
+        call_command("snapshot_reports", **options)
+        self.assertEqual(self.snapshot(1).rotations, 0)
+        call_command("snapshot_reports", rebuild=True, **options)
+        self.assertEqual(self.snapshot(1).rotations, 212)
+
+
+class ReportCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.machine = make_machine("MC-1")
+        self.ids = [self.machine.id]
+        self.now = live_range_end(datetime.now()) + timedelta(seconds=10)
+
+    def key(self, range_end, sources=("machine_status",), filters=None):
+        return report_cache_key("report", self.ids, filters or {"to": range_end}, range_end, sources)
+
+    def test_closed_range_is_not_versioned(self):
+        for source in ("machine_status", "rotation_status"):
+            ProcessorCursor.objects.create(measurement=f"{source}_{self.machine.id}", last_timestamp=at(0, day=3))
+        key, timeout, closed = self.key(at(0, day=2))
+        self.assertTrue(closed)
+        self.assertEqual(timeout, CLOSED_RANGE_TIMEOUT)
+        remember_cached_range(self.ids, ("machine_status",), at(0), at(0, day=2))
+        bump_data_version(self.machine.id, ("machine_status",), at(6), at(7))
+        self.assertEqual(self.key(at(0, day=2))[0], key)
+
+    def test_open_range_ends_share_the_bucket_key(self):
+        with patch("time.time", return_value=self.now.timestamp()):
+            key, timeout, closed = self.key(self.now.replace(microsecond=123456))
+            self.assertFalse(closed)
+            self.assertEqual(timeout, LIVE_BUCKET_SECONDS)
+            self.assertEqual(self.key(self.now + timedelta(seconds=20, microseconds=654321))[0], key)
+
+    def test_only_writes_inside_a_cached_range_bump(self):
+        sources = ("machine_status",)
+        with patch("time.time", return_value=self.now.timestamp()):
+            key = self.key(self.now)[0]
+            remember_cached_range(self.ids, sources, self.now - timedelta(hours=1), self.now)
+            bump_data_version(self.machine.id, sources, self.now - timedelta(days=2), self.now - timedelta(days=1))
+            self.assertEqual(self.key(self.now)[0], key)
+            bump_data_version(self.machine.id, sources, self.now - timedelta(minutes=10), self.now)
+            self.assertNotEqual(self.key(self.now)[0], key)
+
+    def test_rotation_writes_leave_npt_reports_alone(self):
+        both = ("machine_status", "rotation_status")
+        with patch("time.time", return_value=self.now.timestamp()):
+            npt_key, rotation_key = self.key(self.now)[0], self.key(self.now, both)[0]
+            remember_cached_range(self.ids, both, self.now - timedelta(hours=1), self.now)
+            bump_data_version(self.machine.id, ("rotation_status",), self.now - timedelta(minutes=10), self.now)
+            self.assertEqual(self.key(self.now)[0], npt_key)
+            self.assertNotEqual(self.key(self.now, both)[0], rotation_key)
+
+    def test_cached_report_builds_once_per_key(self):
+        builds = []
+        machines = Machine.objects.filter(id=self.machine.id)
+        with patch("time.time", return_value=self.now.timestamp()):
+            for _ in range(2):
+                cached_report("report", machines, {"to": self.now}, self.now, lambda: builds.append(1) or len(builds))
+            self.assertEqual(len(builds), 1)
+            bump_data_version(self.machine.id, ("machine_status",), self.now - timedelta(minutes=1), self.now)
+            self.assertEqual(
+                cached_report("report", machines, {"to": self.now}, self.now, lambda: builds.append(1) or len(builds)), 2
+            )
+
+
+class SkipNullOnTimeTests(TestCase):
+    def setUp(self):
+        self.m1, self.m2 = make_machine("MC-1"), make_machine("MC-2")
+        for machine, off_time, on_time in [
+            (self.m1, at(6), at(7)),
+            (self.m1, at(8), None),  # superseded by the 09:00 downtime
+            (self.m1, at(9), at(9, 30)),
+            (self.m1, at(10), None),
+            (self.m2, at(5), None),
+            (self.m2, at(4), at(4, 30)),
+        ]:
+            ProcessedNPT.objects.create(machine=machine, off_time=off_time, on_time=on_time)
+
+    def off_times(self, queryset):
+        return sorted(queryset.skip_null_on_time_except_last().values_list("machine__mc_no", "off_time"))
+
+    def test_only_the_latest_open_row_of_each_machine_is_kept(self):
+        self.assertEqual(
+            self.off_times(ProcessedNPT.objects.all()),
+            [("MC-1", at(6)), ("MC-1", at(9)), ("MC-1", at(10)), ("MC-2", at(4)), ("MC-2", at(5))],
+        )
+
+    def test_superseded_open_row_is_dropped_when_a_closed_row_follows(self):
+        ProcessedNPT.objects.filter(machine=self.m1, off_time=at(10)).delete()
+        self.assertEqual(self.off_times(ProcessedNPT.objects.filter(machine=self.m1)), [("MC-1", at(6)), ("MC-1", at(9))])
+
+    def test_latest_row_is_taken_within_the_queryset(self):
+        # Rows outside the queryset do not supersede the ones inside it
+        self.assertEqual(
+            self.off_times(ProcessedNPT.objects.filter(machine=self.m1, off_time__lt=at(9))),
+            [("MC-1", at(6)), ("MC-1", at(8))],
+        )
+
+
+class ArchiveTelemetryTests(TestCase):
+    def setUp(self):
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        settings_override = override_settings(TELEMETRY_ARCHIVE_DIR=archive_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.machine = make_machine("MC-1")
+        for count, count_time in enumerate([at(6), at(6, day=31), datetime(2025, 2, 10), datetime(2025, 3, 5)]):
+            RotationStatus.objects.create(machine=self.machine, count=count, count_time=count_time)
+        for source in ("rotation_status", "machine_status"):
+            ProcessorCursor.objects.create(measurement=f"{source}_{self.machine.id}", last_timestamp=datetime(2025, 4, 1))
+
+    def archive(self, before="2025-03-01", **options):
+        call_command("archive_telemetry", before=before, machine=self.machine.id, stdout=StringIO(), **options)
+
+    def counts(self, start=None, end=None):
+        return list(read_archive("rotation", [self.machine.id], start, end)["count"])
+
+    def test_rows_are_moved_into_monthly_partitions(self):
+        self.archive()
+        self.assertEqual(list(RotationStatus.objects.values_list("count", flat=True)), [3])
+        self.assertTrue(archive_path("rotation", self.machine.id, 2025, 1).exists())
+        self.assertTrue(archive_path("rotation", self.machine.id, 2025, 2).exists())
+        self.assertEqual(self.counts(), [0, 1, 2])
+        self.assertEqual(self.counts(at(12), datetime(2025, 2, 28)), [1, 2])
+        self.assertEqual(self.counts(date(2025, 1, 31), date(2025, 1, 31)), [1])
+
+    def test_ranges_past_the_boundary_are_not_read(self):
+        self.assertEqual(self.counts(), [])
+        self.archive()
+        self.assertEqual(self.counts(datetime(2025, 3, 1), datetime(2025, 3, 31)), [])
+
+    def test_rearchiving_a_month_merges_with_its_partition(self):
+        self.archive(before="2025-02-01")
+        RotationStatus.objects.create(machine=self.machine, count=10, count_time=at(12, day=31))
+        self.archive()
+        self.assertEqual(self.counts(), [0, 1, 10, 2])
+
+    def test_rows_past_the_processor_cursor_stay(self):
+        ProcessorCursor.objects.filter(measurement=f"rotation_status_{self.machine.id}").update(
+            last_timestamp=datetime(2025, 2, 1)
+        )
+        self.archive()
+        self.assertEqual(list(RotationStatus.objects.order_by("count_time").values_list("count", flat=True)), [2, 3])
+
+    def test_dry_run_keeps_everything(self):
+        self.archive(dry_run=True)
+        self.assertEqual(RotationStatus.objects.count(), 4)
+        self.assertEqual(self.counts(), [])
+
+    def test_open_and_latest_downtimes_stay(self):
+        ProcessedNPT.objects.create(machine=self.machine, off_time=at(6), on_time=at(7))
+        ProcessedNPT.objects.create(machine=self.machine, off_time=at(8), on_time=None)
+        ProcessedNPT.objects.create(machine=self.machine, off_time=at(9), on_time=at(10))
+        self.archive()
+        self.assertEqual(sorted(ProcessedNPT.objects.values_list("off_time", flat=True)), [at(8), at(9)])
+        records = archived_npt_records([self.machine.id], at(0), at(23))
+        self.assertEqual([(r.off_time, r.on_time, r.machine.mc_no) for r in records], [(at(6), at(7), "MC-1")])
@@ -0,0 +1,149 @@
+from datetime import datetime, date, time
+from pathlib import Path
+
+import pandas as pd
+from django.conf import settings
+from django.db.models import Max
+
+from core.models import MachineStatus, RotationStatus, ProcessedNPT, ProcessorCursor, Machine, NptReason
+
+ARCHIVE_CURSOR = "telemetry_archive"
+
+# kind -> (model, partition time field, exported columns)
+ARCHIVE_SOURCES = {
+    "rotation": (
+        RotationStatus,
+        "count_time",
+        ["id", "machine_id", "count", "count_time"],
+    ),
+    "status": (
+        MachineStatus,
+        "status_time",
+        ["id", "machine_id", "status", "reason_id", "status_time"],
+    ),
+    "npt": (
+        ProcessedNPT,
+        "off_time",
+        ["id", "machine_id", "machine__mc_no", "reason_id", "reason__name", "off_time", "on_time", "duration_seconds"],
+    ),
+}
+
+
+def archive_path(kind, machine_id, year, month):
+    """Parquet file holding one machine's rows of one kind for one month."""
+    root = Path(settings.TELEMETRY_ARCHIVE_DIR)
+    return root / kind / f"machine_{machine_id}" / f"{year:04d}-{month:02d}.parquet"
+
+
+def machine_archive_cursor(machine_id):
+    """Boundary measurement of one machine archived on its own (--machine)."""
+    return f"{ARCHIVE_CURSOR}_{machine_id}"
+
+
+def get_archive_boundary():
+    """
+    Latest datetime before which rows of any machine may have been moved to
+    Parquet, or None when nothing was ever archived. Archived rows are
+    deleted from the DB, so readers union both sources.
+    """
+    return ProcessorCursor.objects.filter(measurement__startswith=ARCHIVE_CURSOR).aggregate(
+        boundary=Max("last_timestamp")
+    )["boundary"]
+
+
+def get_archive_boundaries(machine_ids):
+    """
+    Archive boundary of each machine: the later of the one of full runs and
+    the machine's own, as {machine_id: datetime or None}.
+    """
+    cursors = dict(
+        ProcessorCursor.objects.filter(
+            measurement__in=[ARCHIVE_CURSOR, *[machine_archive_cursor(m) for m in machine_ids]]
+        ).values_list("measurement", "last_timestamp")
+    )
+    shared = cursors.get(ARCHIVE_CURSOR)
+    return {
+        machine_id: max(
+            [b for b in (shared, cursors.get(machine_archive_cursor(machine_id))) if b is not None],
+            default=None,
+        )
+        for machine_id in machine_ids
+    }
+
+
+def _as_datetime(value, end=False):
+    if isinstance(value, datetime) or value is None:
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, time.max if end else time.min)
+    return value
+
+
+def month_range(start, end):
+    """(year, month) of every month partition from start to end, inclusive."""
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield year, month
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+
+
+def read_archive(kind, machine_ids, start, end):
+    """
+    Return archived rows of ``kind`` for the given machines whose partition
+    time falls in [start, end] as a DataFrame. Empty when the range does not
+    reach back past the archive boundary.
+    """
+    model, time_field, columns = ARCHIVE_SOURCES[kind]
+    start = _as_datetime(start)
+    end = _as_datetime(end, end=True)
+
+    frames = []
+    for machine_id, boundary in get_archive_boundaries(list(machine_ids)).items():
+        if boundary is None or (start is not None and start >= boundary):
+            continue
+        machine_end = min(end, boundary) if end else boundary
+        machine_dir = Path(settings.TELEMETRY_ARCHIVE_DIR) / kind / f"machine_{machine_id}"
+        if not machine_dir.is_dir():
+            continue
+        if start is None:
+            paths = sorted(machine_dir.glob("*.parquet"))
+        else:
+            paths = [archive_path(kind, machine_id, y, m) for y, m in month_range(start, machine_end)]
+        for path in paths:
+            if path.exists():
+                df = pd.read_parquet(path)
+                mask = df[time_field] <= machine_end
+                if start is not None:
+                    mask &= df[time_field] >= start
+                frames.append(df[mask])
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True).sort_values(time_field).reset_index(drop=True)
+
+
+def archived_npt_records(machine_ids, start, end):
+    """
+    Archived ProcessedNPT rows as unsaved model instances, so report code
+    iterating querysets can simply chain them after the live rows.
+    """
+    df = read_archive("npt", machine_ids, start, end)
+    records = []
+    for row in df.itertuples(index=False):
+        machine = Machine(id=row.machine_id, mc_no=row.machine__mc_no)
+        reason = None
+        if pd.notna(row.reason_id):
+            reason = NptReason(id=int(row.reason_id), name=row.reason__name)
+        records.append(
+            ProcessedNPT(
+                id=row.id,
+                machine=machine,
+                reason=reason,
+                off_time=row.off_time.to_pydatetime(),
+                on_time=row.on_time.to_pydatetime() if pd.notna(row.on_time) else None,
+                duration_seconds=row.duration_seconds if pd.notna(row.duration_seconds) else None,
+            )
+        )
+    return records
@@ -0,0 +1,50 @@
+import json
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+LOG = logging.getLogger(__name__)
+
+MACHINE_GROUP = "live.machine.{machine_id}"
+
+
+def machine_group(machine_id):
+    """Channel layer group of a machine; every live page of a user joins those of its machines."""
+    return MACHINE_GROUP.format(machine_id=machine_id)
+
+
+def cross_process_push_available():
+    """
+    Whether events published by the ingestor and processors can reach the
+    sockets. The in-memory layer only reaches sockets of its own process.
+    """
+    channel_layer = get_channel_layer()
+    return channel_layer is not None and not isinstance(channel_layer, InMemoryChannelLayer)
+
+
+def publish_machine_event(machine_id, event, **data):
+    """
+    Push a live event of one machine to the pages subscribed to it.
+
+    Publishing is best effort: a missing or unreachable channel layer is
+    logged and never breaks the caller, pages then keep polling.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    # Round-trip through JSON so datetimes reach the browser as strings
+    payload = json.loads(json.dumps({"event": event, "machine_id": machine_id, **data}, cls=DjangoJSONEncoder))
+    try:
+        async_to_sync(channel_layer.group_send)(
+            machine_group(machine_id), {"type": "live.event", "payload": payload}
+        )
+    except Exception as e:
+        LOG.warning("Live event publish failed: machine=%s event=%s error=%s", machine_id, event, e)
+
+
+def publish_machine_event_on_commit(machine_id, event, **data):
+    """Publish once the writer's transaction commits, so pages refetch the new rows."""
+    transaction.on_commit(lambda: publish_machine_event(machine_id, event, **data))
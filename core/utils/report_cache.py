@@ -0,0 +1,140 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.models import ProcessedNPT, ProcessorCursor
+
+# Bumped per ingestion source ("machine_status", "rotation_status") and machine
+DATA_VERSION_KEY = "report:data_version:{source}:{machine_id}"
+# (start, end) spanned by the open reports cached for a source and machine
+CACHED_RANGE_KEY = "report:cached_range:{source}:{machine_id}"
+# Results for ranges that are still open are reused within this window
+LIVE_BUCKET_SECONDS = 60
+# A reason button pressed after a downtime still edits it, so ranges only
+# count as closed once they ended this long ago
+CLOSED_RANGE_MARGIN = timedelta(days=1)
+# Closed results do not change any more; the timeout only bounds the cache
+CLOSED_RANGE_TIMEOUT = 7 * 24 * 3600
+
+
+def bump_data_version(machine_id, sources, start, end):
+    """
+    Invalidate the cached open reports of this machine reading any of
+    `sources`, if the rows written between start and end fall in the range
+    of one of them. Writes nobody has cached leave every key alone.
+    """
+    for source in sources:
+        cached = cache.get(CACHED_RANGE_KEY.format(source=source, machine_id=machine_id))
+        if cached and start <= cached[1] and end >= cached[0]:
+            cache.set(DATA_VERSION_KEY.format(source=source, machine_id=machine_id), time.time_ns(), None)
+
+
+def bump_data_version_on_commit(machine_id, sources, start, end):
+    """Bump once the processor's transaction commits, so readers see the new rows."""
+    transaction.on_commit(lambda: bump_data_version(machine_id, sources, start, end))
+
+
+def get_data_versions(machine_ids, sources):
+    keys = [
+        DATA_VERSION_KEY.format(source=source, machine_id=machine_id)
+        for source in sources
+        for machine_id in machine_ids
+    ]
+    found = cache.get_many(keys)
+    return [found.get(key, 0) for key in keys]
+
+
+def remember_cached_range(machine_ids, sources, range_start, range_end):
+    """Widen the cached span of every machine and source to cover an open report."""
+    keys = [
+        CACHED_RANGE_KEY.format(source=source, machine_id=machine_id)
+        for source in sources
+        for machine_id in machine_ids
+    ]
+    found = cache.get_many(keys)
+    spans = {}
+    for key in keys:
+        start, end = found.get(key, (range_start, range_end))
+        spans[key] = (min(start, range_start), max(end, range_end))
+    # Open results expire with their bucket, and so does their span
+    cache.set_many(spans, LIVE_BUCKET_SECONDS)
+
+
+def is_closed_range(machine_ids, range_end, sources=("machine_status",)):
+    """
+    True when `range_end` is older than CLOSED_RANGE_MARGIN, every processor
+    cursor of every machine has moved past it and no downtime overlapping
+    the range is still open, i.e. the rows of that range should not change
+    any more.
+    """
+    if not machine_ids or range_end is None or range_end >= datetime.now() - CLOSED_RANGE_MARGIN:
+        return False
+    measurements = [f"{source}_{machine_id}" for source in sources for machine_id in machine_ids]
+    cursors = list(
+        ProcessorCursor.objects.filter(measurement__in=measurements).values_list("last_timestamp", flat=True)
+    )
+    if len(cursors) != len(measurements) or not all(c and c >= range_end for c in cursors):
+        return False
+    # An open downtime keeps growing until it closes, whatever the cursors say
+    return not ProcessedNPT.objects.filter(
+        machine_id__in=machine_ids, on_time__isnull=True, off_time__lte=range_end
+    ).exists()
+
+
+def live_range_end(range_end):
+    """`range_end` rounded down to LIVE_BUCKET_SECONDS, shared by every request in the bucket."""
+    bucket = timedelta(seconds=LIVE_BUCKET_SECONDS)
+    return datetime.min + (range_end - datetime.min) // bucket * bucket
+
+
+def report_cache_key(name, machine_ids, filters, range_end, sources=("machine_status",)):
+    """
+    Cache key and timeout for a report, and whether its range is closed.
+
+    Closed ranges are keyed by name, machines and filters only and kept
+    for CLOSED_RANGE_TIMEOUT. Open ones also include the current time
+    bucket, with the range end rounded to it, and the data versions of
+    their sources, so a write landing in them invalidates the key.
+    """
+    machine_ids = sorted(machine_ids)
+    closed = is_closed_range(machine_ids, range_end, sources)
+    if not closed and range_end is not None:
+        # The live views end their range at now(); share the key within the bucket
+        rounded = live_range_end(range_end)
+        filters = {key: rounded if value == range_end else value for key, value in filters.items()}
+
+    parts = {
+        "report": name,
+        "machines": machine_ids,
+        "filters": sorted((key, str(value)) for key, value in filters.items() if value not in (None, "")),
+    }
+    if not closed:
+        parts["versions"] = get_data_versions(machine_ids, sources)
+        parts["bucket"] = int(time.time() // LIVE_BUCKET_SECONDS)
+
+    digest = hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+    return f"report:{name}:{digest}", CLOSED_RANGE_TIMEOUT if closed else LIVE_BUCKET_SECONDS, closed
+
+
+def cached_report(name, machines, filters, range_end, build, sources=("machine_status",), range_start=None):
+    """
+    Return the cached result of `build()` for this scope and filters,
+    computing and storing it on a miss. `build` must return picklable data.
+
+    `range_start` bounds the writes that invalidate an open result; without
+    it, any write up to `range_end` does.
+    """
+    machine_ids = list(machines.values_list("id", flat=True))
+    key, timeout, closed = report_cache_key(name, machine_ids, filters, range_end, sources)
+    report = cache.get(key)
+    if report is None:
+        if not closed and range_end is not None:
+            # Registered before building, so a write landing meanwhile bumps
+            remember_cached_range(machine_ids, sources, range_start or datetime.min, range_end)
+        report = build()
+        cache.set(key, report, timeout)
+    return report
@@ -0,0 +1,205 @@
+"""
+Roll and rotation metrics shared by process_rolls, which builds the rolls,
+process_npt, which may write a downtime after the rolls it overlaps,
+snapshot_reports and the rotation reports.
+"""
+from datetime import timedelta
+from operator import itemgetter
+
+import numpy as np
+from django.db.models import Q
+
+from core.models import ProcessedNPT, Roll
+from core.utils.sweep import NptIntervalIndex
+
+ROLL_METRIC_FIELDS = ["count", "npt_minutes", "productive_minutes"]
+
+
+def get_machine_npt_index(machine_id, start, end):
+    """
+    NptIntervalIndex of one machine's downtimes touching [start, end], in
+    a single query. Open downtimes last until `end`.
+
+    Open rows left behind by a later downtime are skipped before the
+    window is applied, so a superseded row just before `end` does not
+    count as ongoing.
+    """
+    npts = ProcessedNPT.objects.filter(machine_id=machine_id).skip_null_on_time_except_last().filter(
+        Q(on_time__gt=start) | Q(on_time__isnull=True), off_time__lt=end
+    ).values_list("off_time", "on_time")
+    return NptIntervalIndex({machine_id: list(npts)}, end)
+
+
+def update_roll_metrics(rolls, npt_index):
+    """
+    Fill count, NPT and productive minutes of rolls of one machine from
+    their bounds and the downtime overlapping them. Does not save.
+    """
+    if not rolls:
+        return
+    overlaps = npt_index.overlap_many(
+        [roll.start_time for roll in rolls],
+        [roll.end_time for roll in rolls],
+        rolls[0].machine_id,
+    )
+    for roll, npt_seconds in zip(rolls, overlaps):
+        roll.count = roll.end_count - roll.start_count + 1
+        roll.npt_minutes = round(float(npt_seconds) / 60, 2)
+        roll.productive_minutes = max(0, roll.duration_minutes - roll.npt_minutes)
+
+
+def recompute_rolls(machine_id, start, end=None):
+    """
+    Refresh the metrics of the rolls overlapping a downtime [start, end);
+    end is None while the downtime is still open.
+
+    Returns:
+        Number of rolls updated
+    """
+    rolls = Roll.objects.filter(machine_id=machine_id, end_time__gt=start)
+    if end is not None:
+        rolls = rolls.filter(start_time__lt=end)
+    rolls = list(rolls.order_by("start_time"))
+    if not rolls:
+        return 0
+
+    update_roll_metrics(rolls, get_machine_npt_index(machine_id, rolls[0].start_time, rolls[-1].end_time))
+    Roll.objects.bulk_update(rolls, ROLL_METRIC_FIELDS)
+    return len(rolls)
+
+
+def clip_roll_to_window(roll, rotation_qs, npt_index, window_from, window_to):
+    """
+    Metrics of the part of a Roll inside [window_from, window_to].
+
+    Rolls crossing a window edge are cut at the first and last rotation of
+    rotation_qs inside the window that is not counted during NPT.
+
+    Args:
+        roll: Roll instance
+        rotation_qs: RotationStatus queryset already filtered like the report
+        npt_index: NptIntervalIndex keyed by machine id
+
+    Returns:
+        dict of start_time, end_time, total_count, duration_minutes, npt_minutes
+        and productive_minutes, or None when no rotation of the roll is inside
+    """
+    if roll.start_time >= window_from and roll.end_time <= window_to:
+        return {
+            'start_time': roll.start_time,
+            'end_time': roll.end_time,
+            'total_count': roll.count,
+            'duration_minutes': roll.duration_minutes,
+            'npt_minutes': roll.npt_minutes,
+            'productive_minutes': roll.productive_minutes,
+        }
+
+    logs = list(rotation_qs.filter(
+        machine_id=roll.machine_id,
+        count_time__gte=max(roll.start_time, window_from),
+        count_time__lte=min(roll.end_time, window_to),
+    ).order_by('count_time').values_list('count_time', 'count'))
+    if logs:
+        in_npt = npt_index.contains([count_time for count_time, _ in logs], roll.machine_id)
+        logs = [log for log, skipped in zip(logs, in_npt) if not skipped]
+    if not logs:
+        return None
+
+    (start_time, start_count), (end_time, end_count) = logs[0], logs[-1]
+    duration_minutes = (end_time - start_time).total_seconds() / 60
+    npt_minutes = npt_index.overlap(start_time, end_time, roll.machine_id) / 60
+    return {
+        'start_time': start_time,
+        'end_time': end_time,
+        'total_count': end_count - start_count + 1,
+        'duration_minutes': duration_minutes,
+        'npt_minutes': npt_minutes,
+        'productive_minutes': max(0, duration_minutes - npt_minutes),
+    }
+
+
+def load_rotation_arrays(rotation_qs, archived=None):
+    """
+    Load the machine, time and count columns of a RotationStatus queryset
+    once, sorted by machine then time.
+
+    Args:
+        archived: DataFrame of archived rows to include, see get_archived_rotations
+
+    Returns:
+        Dict of NumPy arrays: 'machine', 'time' (datetime64[us]) and 'count'
+    """
+    rows = list(rotation_qs.order_by('machine_id', 'count_time').values_list('machine_id', 'count_time', 'count'))
+    if archived is not None and not archived.empty:
+        rows += [
+            (int(machine_id), count_time.to_pydatetime(), int(count))
+            for machine_id, count_time, count in archived[['machine_id', 'count_time', 'count']].itertuples(index=False)
+        ]
+        rows.sort(key=itemgetter(0, 1))
+    if not rows:
+        return {
+            'machine': np.empty(0, dtype=np.int64),
+            'time': np.empty(0, dtype='datetime64[us]'),
+            'count': np.empty(0, dtype=np.int64),
+        }
+    machine_ids, times, counts = zip(*rows)
+    return {
+        'machine': np.array(machine_ids, dtype=np.int64),
+        'time': np.array(times, dtype='datetime64[us]'),
+        'count': np.array(counts, dtype=np.int64),
+    }
+
+
+def block_counts(rotations, block_starts, block_ends):
+    """
+    Reset-aware rotation count per block.
+
+    A block is split into segments wherever the machine changes or the
+    counter goes down (roll cut); each segment contributes last - first + 1.
+
+    Args:
+        rotations: dict from load_rotation_arrays
+        block_starts, block_ends: sorted, disjoint block bounds (datetime64)
+
+    Returns:
+        Tuple (totals, rows) of per-block count totals and record counts
+    """
+    n_blocks = len(block_starts)
+    times = rotations['time']
+
+    # Block index of every record; records between blocks are dropped
+    idx = np.searchsorted(block_starts, times, side='right') - 1
+    valid = idx >= 0
+    valid[valid] = times[valid] < block_ends[idx[valid]]
+
+    b = idx[valid]
+    c = rotations['count'][valid]
+    m = rotations['machine'][valid]
+    if len(b) == 0:
+        return np.zeros(n_blocks, dtype=np.int64), np.zeros(n_blocks, dtype=np.int64)
+
+    new_seg = np.r_[True, (b[1:] != b[:-1]) | (m[1:] != m[:-1]) | (c[1:] < c[:-1])]
+    seg_end = np.r_[new_seg[1:], True]
+    seg_counts = c[seg_end] - c[new_seg] + 1
+
+    totals = np.bincount(b[new_seg], weights=seg_counts, minlength=n_blocks).astype(np.int64)
+    rows = np.bincount(b, minlength=n_blocks)
+    return totals, rows
+
+
+def shift_blocks(shift_start, shift_end, num_blocks=4):
+    """
+    Split the shift window [shift_start, shift_end) into 2-hour blocks; the
+    last block runs to the end of the shift.
+
+    Returns:
+        List of (block_start, block_end) datetimes
+    """
+    blocks = []
+    for i in range(num_blocks):
+        block_start = shift_start + timedelta(hours=2 * i)
+        if i > 0 and i == num_blocks - 1:
+            blocks.append((block_start, shift_end))
+        else:
+            blocks.append((block_start, block_start + timedelta(hours=2)))
+    return blocks
@@ -0,0 +1,151 @@
+"""
+Interval sweep over NPT downtimes, shared by the reports and the
+management commands.
+
+NPT intervals are (off_time, on_time) pairs; an open downtime (on_time is
+None) runs until the `until` it is merged or indexed with.
+"""
+from collections import defaultdict
+
+import numpy as np
+
+
+def merge_intervals(intervals, until):
+    """
+    Sort (off_time, on_time) pairs and merge the overlapping ones.
+
+    Returns a list of (start, end) tuples, ordered and disjoint.
+    """
+    merged = []
+    for start, end in sorted((off_time, on_time or until) for off_time, on_time in intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def to_microseconds(values):
+    """Convert a datetime or a sequence of datetimes to int64 microseconds."""
+    return np.asarray(values, dtype='datetime64[us]').astype(np.int64)
+
+
+class NptIntervalIndex:
+    """
+    Per-machine index of merged NPT intervals, built once per request.
+
+    Keeps sorted start and end arrays with a prefix sum of durations, so the
+    NPT overlapping any window [a, b) is answered with two binary searches
+    instead of a query per window.
+    """
+
+    def __init__(self, intervals_by_machine, until):
+        """
+        Args:
+            intervals_by_machine: dict of machine_id -> [(off_time, on_time), ...]
+            until: datetime where open downtimes (on_time is None) end
+        """
+        self.until = until
+        self._machines = {}
+        for machine_id, intervals in intervals_by_machine.items():
+            merged = merge_intervals(intervals, until)
+            starts = to_microseconds([start for start, _ in merged])
+            ends = to_microseconds([end for _, end in merged])
+            prefix = np.concatenate(([0], np.cumsum(ends - starts)))
+            self._machines[machine_id] = (starts, ends, prefix)
+
+    @classmethod
+    def from_queryset(cls, npt_qs, until, key='machine_id', extra=None):
+        """
+        Build the index from a ProcessedNPT queryset in a single query.
+
+        Args:
+            key: field the machines are keyed by (e.g. 'machine__mc_no')
+            extra: more (key, off_time, on_time) rows, e.g. archived ones
+        """
+        intervals = defaultdict(list)
+        for machine, off_time, on_time in npt_qs.values_list(key, 'off_time', 'on_time'):
+            intervals[machine].append((off_time, on_time))
+        for machine, off_time, on_time in extra or []:
+            intervals[machine].append((off_time, on_time))
+        return cls(intervals, until)
+
+    @property
+    def machine_ids(self):
+        return list(self._machines)
+
+    def overlap_many(self, window_starts, window_ends, machine_id=None):
+        """
+        NPT seconds overlapping each window [start, end).
+
+        Args:
+            window_starts, window_ends: sequences of datetimes, same length
+            machine_id: restrict to one machine; None sums every machine
+
+        Returns:
+            NumPy float array of seconds, one per window
+        """
+        a = to_microseconds(window_starts)
+        b = to_microseconds(window_ends)
+        total = np.zeros(len(a), dtype=np.int64)
+
+        if machine_id is None:
+            machines = self._machines.values()
+        elif machine_id in self._machines:
+            machines = [self._machines[machine_id]]
+        else:
+            machines = []
+
+        for starts, ends, prefix in machines:
+            if len(starts) == 0:
+                continue
+            # Intervals i..j-1 are the only ones touching [a, b)
+            i = np.searchsorted(ends, a, side='right')
+            j = np.searchsorted(starts, b, side='left')
+            hit = j > i
+            if not hit.any():
+                continue
+            i, j, wa, wb = i[hit], j[hit], a[hit], b[hit]
+            seconds = prefix[j] - prefix[i]
+            # Trim the parts of the first and last interval outside the window
+            seconds -= np.maximum(0, wa - starts[i])
+            seconds -= np.maximum(0, ends[j - 1] - wb)
+            total[hit] += seconds
+
+        return total / 1e6
+
+    def overlap(self, start, end, machine_id=None):
+        """NPT seconds overlapping the single window [start, end)."""
+        return float(self.overlap_many([start], [end], machine_id)[0])
+
+    def contains(self, times, machine_id):
+        """Boolean array: which of `times` fall inside a downtime of the machine."""
+        t = to_microseconds(times)
+        if machine_id not in self._machines or len(t) == 0:
+            return np.zeros(len(t), dtype=bool)
+        starts, ends, _ = self._machines[machine_id]
+        idx = np.searchsorted(starts, t, side='right') - 1
+        inside = idx >= 0
+        inside[inside] = t[inside] < ends[idx[inside]]
+        return inside
+
+    def outside(self, rows, machine_key, time_key):
+        """
+        The rows whose time is not inside a downtime of their machine, in
+        their original order, with one contains() call per machine.
+
+        Args:
+            rows: list of dicts or tuples
+            machine_key, time_key: key or position of the machine id and time
+        """
+        by_machine = defaultdict(list)
+        for i, row in enumerate(rows):
+            by_machine[row[machine_key]].append(i)
+
+        keep = np.ones(len(rows), dtype=bool)
+        for machine_id, indexes in by_machine.items():
+            keep[indexes] = ~self.contains([rows[i][time_key] for i in indexes], machine_id)
+        return [row for row, kept in zip(rows, keep) if kept]
@@ -11,6 +11,8 @@ from django.db.models import Q, ForeignKey, CharField, ImageField, BooleanField,
 from django.core.files.images import ImageFile
 from datetime import datetime, date, time, timedelta
 from django.conf import settings
+import base64
+import json
 import os
 
 QUOTE_MAP = {i: "_%02X" % i for i in b'":/_#?;@&=+$,"[]<>%\n\\'}
@@ -45,6 +47,80 @@ def paginate_queryset(request, queryset, per_page=10):
         objects = paginator.page(paginator.num_pages)
     return objects, paginator
 
+def encode_cursor(row, keys):
+    """Opaque keyset cursor holding the sort key values of `row` (a values() dict)."""
+    values = [row[key].isoformat() if isinstance(row[key], datetime) else row[key] for key in keys]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor):
+    """
+    Sort key values of a cursor made by encode_cursor, with the leading
+    timestamp parsed back to a datetime. Raises ValueError if it is malformed.
+    """
+    try:
+        timestamp, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+def get_keyset_params(request, per_page=50, max_per_page=500):
+    """
+    Read `cursor`, `per_page` and `order` ('desc' or 'asc') of a keyset
+    paginated request. Raises ValueError for a malformed cursor.
+
+    Returns:
+        (after, per_page, descending)
+    """
+    cursor = request.GET.get('cursor')
+    after = decode_cursor(cursor) if cursor else None
+    try:
+        per_page = min(max(int(request.GET.get('per_page', per_page)), 1), max_per_page)
+    except (TypeError, ValueError):
+        pass
+    return after, per_page, request.GET.get('order', 'desc') != 'asc'
+
+def keyset_frame_page(df, keys, after=None, per_page=50, descending=True):
+    """
+    keyset_page over the rows of a DataFrame, e.g. archived ones, so they
+    can be merged with a page of the live queryset.
+
+    Returns:
+        (rows as dicts, has_more)
+    """
+    time_key, id_key = keys
+    if after is not None:
+        timestamp, pk = after
+        if descending:
+            df = df[(df[time_key] < timestamp) | ((df[time_key] == timestamp) & (df[id_key] < pk))]
+        else:
+            df = df[(df[time_key] > timestamp) | ((df[time_key] == timestamp) & (df[id_key] > pk))]
+    rows = df.sort_values([time_key, id_key], ascending=not descending).head(per_page + 1).to_dict('records')
+    return rows[:per_page], len(rows) > per_page
+
+def keyset_page(queryset, keys, after=None, per_page=50, descending=True):
+    """
+    One page of a values() queryset ordered on a unique (timestamp, id) key,
+    continuing strictly after the `after` key values. Unlike OFFSET paging
+    every page costs the same index range scan however deep it is.
+
+    Returns:
+        (rows, has_more)
+    """
+    time_key, id_key = keys
+    if descending:
+        queryset = queryset.order_by(f'-{time_key}', f'-{id_key}')
+        op = 'lt'
+    else:
+        queryset = queryset.order_by(time_key, id_key)
+        op = 'gt'
+    if after is not None:
+        timestamp, pk = after
+        queryset = queryset.filter(
+            Q(**{f'{time_key}__{op}': timestamp}) | Q(**{time_key: timestamp, f'{id_key}__{op}': pk})
+        )
+    rows = list(queryset[:per_page + 1])
+    return rows[:per_page], len(rows) > per_page
+
 def get_model(app_name, model_name):
     """Retrieve the model class dynamically."""
     return apps.get_model(app_name, model_name)
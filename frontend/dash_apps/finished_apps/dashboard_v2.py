@@ -1,6 +1,6 @@
 # frontend/dash_apps/finished_apps/machine_dashboard.py
-from dash import html, dcc, dash_table
-from dash.dependencies import Input, Output
+from dash import html, dcc, dash_table, no_update
+from dash.dependencies import Input, Output, State
 import dash_bootstrap_components as dbc
 from django_plotly_dash import DjangoDash
 from core.models import ProcessedNPT, RotationStatus, Machine
@@ -13,8 +13,9 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta, date, time
 
-from frontend.utils.function_chart_helper import process_npt_to_hourly
+from frontend.utils.function_chart_helper import process_npt_to_hourly, downsample_min_max
 from frontend.utils.function_filter import skip_null_on_time_except_last
+from frontend.utils.function_dashboard_helper import get_change_marker, get_last_activity, get_inactive_machines_frame, patch_figures, update_npt_frame, update_rotation_trend
 
 app = DjangoDash(
     "MachineDashboard_v2",
@@ -194,7 +195,8 @@ def get_shift_duration_seconds(shift):
 # ---------------------
 # Generate Data (function called inside callback)
 # ---------------------
-def generate_dashboard_data(user=None):
+def get_dashboard_querysets(user=None):
+    """The user's machines with today's NPT and rotation querysets."""
     # Fetch machines user has access to
     if user is None or isinstance(user, AnonymousUser) or not user.is_authenticated:
         machines = Machine.objects.none()
@@ -208,87 +210,27 @@ def generate_dashboard_data(user=None):
     end_of_day = datetime.combine(current_date, time.max)
 
     # Fetch NPT and Rotation data filtered by user's machines and current date
-    npt_qs = ProcessedNPT.objects.select_related('machine', 'reason')\
-        .filter(
-            machine__in=machines,
-            off_time__gte=start_of_day,
-            off_time__lte=end_of_day
-        )
+    npt_qs = ProcessedNPT.objects.filter(
+        machine__in=machines,
+        off_time__gte=start_of_day,
+        off_time__lte=end_of_day
+    )
 
-    rot_qs = RotationStatus.objects.select_related('machine')\
-        .filter(
-            machine__in=machines,
-            count_time__gte=start_of_day,
-            count_time__lte=end_of_day
-        )
-    shifts = Shift.objects.all()
+    rot_qs = RotationStatus.objects.filter(
+        machine__in=machines,
+        count_time__gte=start_of_day,
+        count_time__lte=end_of_day
+    )
 
     # removing null values
     npt_qs = skip_null_on_time_except_last(npt_qs)
+    return machines, npt_qs, rot_qs
 
-    # ---------------------
-    # Prepare DataFrames using the new structure
-    # ---------------------
-    npt_df = pd.DataFrame([{
-        "machine_id": npt.machine.id if npt.machine else None,
-        "machine_label": f"{npt.machine.mc_no}" if npt.machine else "Unknown",
-        "reason": npt.reason.name if npt.reason else "N/A",
-        "off_time": npt.off_time,
-        "on_time": npt.on_time
-    } for npt in npt_qs])
-
-    rot_df = pd.DataFrame([{
-        "machine_id": rot.machine.id if rot.machine else None,
-        "machine_label": f"{rot.machine.mc_no}" if rot.machine else "Unknown",
-        "count": rot.count,
-        "count_time": rot.count_time
-    } for rot in rot_qs])
-
-    # Ensure datetime conversion
-    if not npt_df.empty:
-        npt_df['off_time'] = pd.to_datetime(npt_df['off_time'])
-        npt_df['on_time'] = pd.to_datetime(npt_df['on_time'])
-    if not rot_df.empty:
-        rot_df['count_time'] = pd.to_datetime(rot_df['count_time'])
-
-    # ---------------------
-    # Determine shift
-    # ---------------------
-    # Replace your get_shift function with this simpler version:
-    def get_shift(dt):
-        dt_time = dt.time()
-        
-        for s in shifts:
-            start_time = s.start_time
-            end_time = s.end_time
-            
-            if start_time <= end_time:
-                # Regular shift (same day)
-                if start_time <= dt_time <= end_time:
-                    return s.name
-            else:
-                # Overnight shift
-                if dt_time >= start_time or dt_time <= end_time:
-                    return s.name
-        
-        return "Unknown"
 
+def generate_dashboard_data(machines, npt_df, shifts):
     if not npt_df.empty:
-        npt_df['shift_name'] = npt_df['off_time'].apply(get_shift)
-
-        # ---------------------
-        # Calculate NPT duration in seconds
-        # ---------------------
-        npt_df['npt_time'] = npt_df.apply(
-            lambda row: (row['on_time'] - row['off_time']).total_seconds() 
-            if row['on_time'] is not pd.NaT else (pd.Timestamp.now() - row['off_time']).total_seconds(),
-            axis=1
-        )
-
         npt_df['npt_time_formatted'] = format_seconds_series(npt_df['npt_time'])
     else:
-        npt_df['shift_name'] = []
-        npt_df['npt_time'] = []
         npt_df['npt_time_formatted'] = []
 
     # ---------------------
@@ -307,39 +249,12 @@ def generate_dashboard_data(user=None):
     # Create inactive machines DataFrame
     inactive_machines_df = pd.DataFrame()
     if inactive_machines:
-        inactive_machines_data = []
-        for machine in machines.filter(id__in=inactive_machines):
-            # Find the last activity (most recent on_time) for this machine
-            last_npt = ProcessedNPT.objects.filter(
-                machine=machine,
-                on_time__isnull=False
-            ).order_by('-on_time').first()
-            # print("last Active: ", last_npt, "-->", last_npt.on_time)
-            if last_npt and last_npt.on_time:
-                # Calculate time since last activity
-                time_since_last = pd.Timestamp.now() - pd.Timestamp(last_npt.on_time)
-                days = time_since_last.days
-                hours = time_since_last.seconds // 3600
-                minutes = (time_since_last.seconds % 3600) // 60
-                
-                if days > 0:
-                    last_activity = f"{days}d {hours}h {minutes}m ago"
-                elif hours > 0:
-                    last_activity = f"{hours}h {minutes}m ago"
-                else:
-                    last_activity = f"{minutes}m ago"
-                    
-                last_on_time = last_npt.on_time.strftime('%Y-%m-%d %H:%M:%S')
-            else:
-                last_activity = 'No recorded activity'
-                last_on_time = 'Never'
-            
-            inactive_machines_data.append({
-                'machines': f"{machine.mc_no}",
-                'last_on_time': last_on_time,
-                'last_activity': last_activity
-            })
-        inactive_machines_df = pd.DataFrame(inactive_machines_data)
+        # Last activity of all of them in one grouped query
+        inactive_machines_df = get_inactive_machines_frame(
+            dict(machines.filter(id__in=inactive_machines).values_list('id', 'mc_no')),
+            inactive_machines,
+            get_last_activity(list(inactive_machines)),
+        )
     print(inactive_machines_df)
     rolls_produced_total = (npt_df['reason'] == "Roll Cutting").sum() if not npt_df.empty else 0
     now = datetime.now()
@@ -810,17 +725,6 @@ def generate_dashboard_data(user=None):
             'fig_shiftwise_npt', 'fig_machine_perf', 'fig_shiftwise_trend'
         ]}
 
-    # Hourly Rotation Counter Trend - handle rotation data
-    if not rot_df.empty:
-        figs['fig_hourly_trend_rotation'] = px.line(
-            rot_df,
-            x='count_time', y='count', color='machine_label',
-            title="Hourly Rotation Counter Trend",
-            labels=common_labels
-        )
-    else:
-        figs['fig_hourly_trend_rotation'] = {}
-
     # ---------------------
     # Return
     # ---------------------
@@ -844,100 +748,68 @@ def generate_dashboard_data(user=None):
     }
 
 
+def build_rotation_figure(rot_df, bucket_seconds):
+    """Rotation trend with one line per machine, in label order (see update_rotation_trend)."""
+    # Min/max per bucket keeps resets visible at a fraction of the points
+    return px.line(
+        downsample_min_max(rot_df, 'count_time', 'count', bucket_seconds, by='machine_label'),
+        x='count_time', y='count', color='machine_label',
+        title="Hourly Rotation Counter Trend",
+        labels={"machine_label": "Machine", "count_time": "Hour of Day", "count": "Count"},
+        render_mode='webgl'
+    )
+
+
 # ---------------------
 # Layout
 # ---------------------
+# NPT figures, each drawn in the graph with the same id in dashes
+NPT_FIGURES = [
+    'fig_npt_by_machine',
+    'fig_machine_perf',
+    'fig_npt_by_machine_reason',
+    'fig_hourly_trend',
+    'fig_npt_by_reason_bar',
+    'fig_npt_by_reason_pie',
+    'fig_shiftwise_trend',
+    'fig_npt_by_shift',
+    'fig_shiftwise_npt',
+]
+# Tables, each rendered in the "<id in dashes>-container" div
+TABLES = ['machine_summary_table', 'inactive_machines_table', 'shift_summary_table', 'npt_summary_table']
+
 app.layout = dbc.Container([
     dcc.Interval(id="interval-update", interval=60*1000),  # update every minute
-    html.Div(id="dashboard-content")
-], fluid=True)
-
-# ---------------------
-# Callback to update dashboard
-# ---------------------
-@app.callback(
-    Output("dashboard-content", "children"),
-    [Input("interval-update", "n_intervals")]
-)
-def update_dashboard(n_intervals, callback_context=None, request=None, user=None):
-    # If the user isn't automatically inferred, default to AnonymousUser
-    if not user or not user.is_authenticated:
-        user = AnonymousUser()
-
-    data = generate_dashboard_data(user=user)
-    figs = data["figs"]
-    tables = data["tables"]
-
-    total_npt = data["total_npt"]
-    total_events = data["total_events"]
-    total_avg_event_all_machine = data["total_avg_event_all_machine"]
-    total_avg_npt_all_machine = data["total_avg_npt_all_machine_formatted"]
-    active_machines = data["active_machines"]
-    inactive_machines = data["inactive_machines"]
-    overall_npt_percent = data["overall_npt_percent"]
-    overall_pt_percent = data["overall_pt_percent"]
-    rolls_produced_total = data["rolls_produced_total"]
-
-    return dbc.Container([
-        # Cards Row 1
-        dbc.Row([
-            dbc.Col([
-                info_box(f"{format_seconds(total_npt)}", "Total NPT", "bg-info", "fas fa-clock", '')
-            ], className="col-sm-6 col-md-3 mb-3", width=12),
-            
-            dbc.Col([
-                info_box(str(total_events), "Total Events", "bg-warning", "fas fa-list", '')
-            ], className="col-sm-6 col-md-3 mb-3", width=12),
-            
-            dbc.Col([
-                info_box(str(active_machines), "Active Machines", "bg-primary", "fas fa-cogs", '')
-            ], className="col-sm-6 col-md-3 mb-3", width=12),
-            
-            dbc.Col([
-                info_box(str(inactive_machines), "Inactive Machines", "bg-secondary", "fas fa-power-off", '')
-            ], className="col-sm-6 col-md-3 mb-3", width=12),
-        ], className="g-3 mb-4"),
-        
-        # Cards Row 2
-        dbc.Row([            
-            dbc.Col([
-                info_box(str(total_avg_event_all_machine), "Avg Events for All Machines", "bg-danger", "fas fa-chart-bar", '')
-            ], className="col-sm-6 col-md-3 mb-3", width=12),
-            dbc.Col([
-                info_box(f"{total_avg_npt_all_machine}", "Avg NPT for All Machines", "bg-danger", "fas fa-tachometer-alt", '')
-            ], className="col-sm-6 col-md-3 mb-3", width=12),
-            
-            dbc.Col([
-                info_box(f"{overall_npt_percent}%", "Overall NPT %", "bg-info", "fas fa-exclamation-triangle", '')
-            ], className="col-sm-6 col-md-3 mb-3", width=12),
-            
-            dbc.Col([
-                info_box(f"{rolls_produced_total}", "Rolls Produced", "bg-secondary", "fas fa-industry", '')
-            ], className="col-sm-6 col-md-3 mb-3", width=12),
-        ], className="g-3 mb-4"),
+    # What this browser last received, so unchanged ticks send nothing and
+    # the rest only the changes
+    dcc.Store(id="dashboard-marker"),
+    # Today's NPT rows behind the charts, so a tick only fetches what changed
+    dcc.Store(id="dashboard-frames"),
+    dbc.Container([
+        html.Div(id="dashboard-cards"),
 
         # Charts Row 1 - Machine Charts
         dbc.Row([
             dbc.Col([
                 dbc.Card([
                     dbc.CardBody([
-                        dcc.Graph(figure=figs.get("fig_npt_by_machine", {}), style={"height":"400px"})
+                        dcc.Graph(id="fig-npt-by-machine", figure={}, style={"height":"400px"})
                     ], className="p-0")
                 ], className="shadow-sm border-0 h-100")
             ], width=12, className="col-sm-6 col-lg-4 col-md-6 mb-4"),
-            
+        
             dbc.Col([
                 dbc.Card([
                     dbc.CardBody([
-                        dcc.Graph(figure=figs.get("fig_machine_perf", {}), style={"height":"400px"})
+                        dcc.Graph(id="fig-machine-perf", figure={}, style={"height":"400px"})
                     ], className="p-0")
                 ], className="shadow-sm border-0 h-100")
             ], width=12, className="col-sm-6 col-lg-4 col-md-6 mb-4"),
-            
+        
             dbc.Col([
                 dbc.Card([
                     dbc.CardBody([
-                        dcc.Graph(figure=figs.get("fig_npt_by_machine_reason", {}), style={"height":"400px"})
+                        dcc.Graph(id="fig-npt-by-machine-reason", figure={}, style={"height":"400px"})
                     ], className="p-0")
                 ], className="shadow-sm border-0 h-100")
             ], width=12, className="col-sm-6 col-lg-4 col-md-6 mb-4"),
@@ -948,7 +820,7 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
             dbc.Col([
                 dbc.Card([
                     dbc.CardBody([
-                        dcc.Graph(figure=figs.get("fig_hourly_trend", {}), style={"height":"400px"})
+                        dcc.Graph(id="fig-hourly-trend", figure={}, style={"height":"400px"})
                     ], className="p-0")
                 ], className="shadow-sm border-0")
             ], width=12, className="mb-4")
@@ -959,15 +831,15 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
             dbc.Col([
                 dbc.Card([
                     dbc.CardBody([
-                        dcc.Graph(figure=figs.get("fig_npt_by_reason_bar", {}), style={"height":"400px"})
+                        dcc.Graph(id="fig-npt-by-reason-bar", figure={}, style={"height":"400px"})
                     ], className="p-0")
                 ], className="shadow-sm border-0 h-100")
             ], width=12, className="col-sm-6 col-lg-6 col-md-6 mb-4"),
-            
+        
             dbc.Col([
                 dbc.Card([
                     dbc.CardBody([
-                        dcc.Graph(figure=figs.get("fig_npt_by_reason_pie", {}), style={"height":"400px"})
+                        dcc.Graph(id="fig-npt-by-reason-pie", figure={}, style={"height":"400px"})
                     ], className="p-0")
                 ], className="shadow-sm border-0 h-100")
             ], width=12, className="col-sm-6 col-lg-6 col-md-6 mb-4"),
@@ -978,7 +850,7 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
             dbc.Col([
                 dbc.Card([
                     dbc.CardBody([
-                        dcc.Graph(figure=figs.get("fig_hourly_trend_rotation", {}), style={"height":"400px"})
+                        dcc.Graph(id="fig-hourly-trend-rotation", figure={}, style={"height":"400px"})
                     ], className="p-0")
                 ], className="shadow-sm border-0")
             ], width=12, className="mb-4")
@@ -989,23 +861,23 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
             dbc.Col([
                 dbc.Card([
                     dbc.CardBody([
-                        dcc.Graph(figure=figs.get("fig_shiftwise_trend", {}), style={"height":"400px"})
+                        dcc.Graph(id="fig-shiftwise-trend", figure={}, style={"height":"400px"})
                     ], className="p-0")
                 ], className="shadow-sm border-0 h-100")
             ], width=12, className="col-sm-6 col-lg-6 col-md-6 mb-4"),
-            
+        
             dbc.Col([
                 dbc.Card([
                     dbc.CardBody([
-                        dcc.Graph(figure=figs.get("fig_npt_by_shift", {}), style={"height":"400px"})
+                        dcc.Graph(id="fig-npt-by-shift", figure={}, style={"height":"400px"})
                     ], className="p-0")
                 ], className="shadow-sm border-0 h-100")
             ], width=12, className="col-sm-6 col-lg-3 col-md-6 mb-4"),
-            
+        
             dbc.Col([
                 dbc.Card([
                     dbc.CardBody([
-                        dcc.Graph(figure=figs.get("fig_shiftwise_npt", {}), style={"height":"400px"})
+                        dcc.Graph(id="fig-shiftwise-npt", figure={}, style={"height":"400px"})
                     ], className="p-0")
                 ], className="shadow-sm border-0 h-100")
             ], width=12, className="col-sm-6 col-lg-3 col-md-6 mb-4"),
@@ -1020,11 +892,11 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
                         html.H5("Machinewise Performance Summary", className="mb-0 text-dark fw-bold")
                     ], className="bg-light border-bottom"),
                     dbc.CardBody([
-                        tables["machine_summary_table"]
+                        html.Div(id="machine-summary-table-container")
                     ], className="p-3")
                 ], className="shadow-sm border-0 h-100")
             ], width=12, className="col-sm-6 col-lg-8 col-md-6 mb-4"),
-            
+        
             # Inactive Machines Table
             dbc.Col([
                 dbc.Card([
@@ -1032,7 +904,7 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
                         html.H5("Inactive Machines List", className="mb-0 text-dark fw-bold")
                     ], className="bg-light border-bottom"),
                     dbc.CardBody([
-                        tables["inactive_machines_table"]
+                        html.Div(id="inactive-machines-table-container")
                     ], className="p-3")
                 ], className="shadow-sm border-0 h-100")
             ], width=12, className="col-sm-6 col-lg-4 col-md-6 mb-4"),
@@ -1046,7 +918,7 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
                         html.H5("Shiftwise Performance Summary", className="mb-0 text-dark fw-bold")
                     ], className="bg-light border-bottom"),
                     dbc.CardBody([
-                        tables["shift_summary_table"]
+                        html.Div(id="shift-summary-table-container")
                     ], className="p-3")
                 ], className="shadow-sm border-0")
             ], width=12, className="mb-4")
@@ -1060,9 +932,103 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
                         html.H5("Reasonwise NPT Summary", className="mb-0 text-dark fw-bold")
                     ], className="bg-light border-bottom"),
                     dbc.CardBody([
-                        tables["npt_summary_table"]
+                        html.Div(id="npt-summary-table-container")
                     ], className="p-3")
                 ], className="shadow-sm border-0")
             ], width=12, className="mb-4")
         ])
-    ], fluid=True, className="py-4")
\ No newline at end of file
+    ], fluid=True, className="py-4")
+], fluid=True)
+
+# ---------------------
+# Callback to update dashboard
+# ---------------------
+@app.callback(
+    Output("dashboard-cards", "children"),
+    *[Output(name.replace("_", "-"), "figure") for name in NPT_FIGURES],
+    Output("fig-hourly-trend-rotation", "figure"),
+    *[Output(f"{name.replace('_', '-')}-container", "children") for name in TABLES],
+    Output("dashboard-marker", "data"),
+    Output("dashboard-frames", "data"),
+    [Input("interval-update", "n_intervals")],
+    [State("dashboard-marker", "data"), State("dashboard-frames", "data")]
+)
+def update_dashboard(n_intervals, marker, stored, callback_context=None, request=None, user=None):
+    # If the user isn't automatically inferred, default to AnonymousUser
+    if not user or not user.is_authenticated:
+        user = AnonymousUser()
+
+    # Two aggregate queries decide whether anything has to be fetched
+    machines, npt_qs, rot_qs = get_dashboard_querysets(user)
+    change = get_change_marker(npt_qs, rot_qs, machines)
+    marker = marker or {}
+    if change == marker.get("change"):
+        return (no_update,) * (len(NPT_FIGURES) + len(TABLES) + 4)
+
+    # Only NPT rows changed since the stored frame and rotations past the
+    # drawn ones are fetched; figures the browser has are patched
+    shifts = list(Shift.objects.all())
+    scope = [str(date.today()), sorted(machines.values_list('id', flat=True))]
+    npt_df, stored = update_npt_frame(npt_qs, stored, scope, shifts, latest_open_only=True)
+    data = generate_dashboard_data(machines, npt_df, shifts)
+    npt_figures, drawn = patch_figures(data["figs"], NPT_FIGURES, marker.get("drawn", ()))
+    rotation_figure, rotation = update_rotation_trend(rot_qs, marker.get("rotation"), build_rotation_figure)
+    tables = data["tables"]
+
+    total_npt = data["total_npt"]
+    total_events = data["total_events"]
+    total_avg_event_all_machine = data["total_avg_event_all_machine"]
+    total_avg_npt_all_machine = data["total_avg_npt_all_machine_formatted"]
+    active_machines = data["active_machines"]
+    inactive_machines = data["inactive_machines"]
+    overall_npt_percent = data["overall_npt_percent"]
+    overall_pt_percent = data["overall_pt_percent"]
+    rolls_produced_total = data["rolls_produced_total"]
+
+    cards = html.Div([
+        # Cards Row 1
+        dbc.Row([
+            dbc.Col([
+                info_box(f"{format_seconds(total_npt)}", "Total NPT", "bg-info", "fas fa-clock", '')
+            ], className="col-sm-6 col-md-3 mb-3", width=12),
+        
+            dbc.Col([
+                info_box(str(total_events), "Total Events", "bg-warning", "fas fa-list", '')
+            ], className="col-sm-6 col-md-3 mb-3", width=12),
+        
+            dbc.Col([
+                info_box(str(active_machines), "Active Machines", "bg-primary", "fas fa-cogs", '')
+            ], className="col-sm-6 col-md-3 mb-3", width=12),
+        
+            dbc.Col([
+                info_box(str(inactive_machines), "Inactive Machines", "bg-secondary", "fas fa-power-off", '')
+            ], className="col-sm-6 col-md-3 mb-3", width=12),
+        ], className="g-3 mb-4"),
+    
+        # Cards Row 2
+        dbc.Row([            
+            dbc.Col([
+                info_box(str(total_avg_event_all_machine), "Avg Events for All Machines", "bg-danger", "fas fa-chart-bar", '')
+            ], className="col-sm-6 col-md-3 mb-3", width=12),
+            dbc.Col([
+                info_box(f"{total_avg_npt_all_machine}", "Avg NPT for All Machines", "bg-danger", "fas fa-tachometer-alt", '')
+            ], className="col-sm-6 col-md-3 mb-3", width=12),
+        
+            dbc.Col([
+                info_box(f"{overall_npt_percent}%", "Overall NPT %", "bg-info", "fas fa-exclamation-triangle", '')
+            ], className="col-sm-6 col-md-3 mb-3", width=12),
+        
+            dbc.Col([
+                info_box(f"{rolls_produced_total}", "Rolls Produced", "bg-secondary", "fas fa-industry", '')
+            ], className="col-sm-6 col-md-3 mb-3", width=12),
+        ], className="g-3 mb-4")
+    ])
+
+    return (
+        cards,
+        *npt_figures,
+        rotation_figure,
+        *[tables[name] for name in TABLES],
+        {"change": change, "drawn": drawn, "rotation": rotation},
+        stored,
+    )
@@ -1,21 +1,18 @@
 # frontend/dash_apps/finished_apps/machine_dashboard.py
-from dash import html, dcc
-from dash.dependencies import Input, Output
+from dash import html, dcc, no_update, Patch
+from dash.dependencies import Input, Output, State
 import dash_bootstrap_components as dbc
 from django_plotly_dash import DjangoDash
-from core.models import ProcessedNPT, RotationStatus, Machine, NptReason
-from library.models import Shift
+from core.models import NptReason
 from core.utils.utils import get_user_machines
-from django.contrib.auth.models import AnonymousUser
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 
 
-from frontend.utils.function_chart_helper import process_npt_to_hourly, get_reason_color_map
-from frontend.utils.function_filter import skip_null_on_time_except_last
-from frontend.utils.function_time import get_datetime_range
+from frontend.utils.function_chart_helper import process_npt_to_hourly, get_reason_color_map, downsample_min_max, get_bucket_seconds, ROTATION_CHART_POINTS
+from frontend.utils.function_dashboard_helper import get_dashboard_frames, slice_dashboard_frames, get_frames_marker, get_inactive_machines_frame, patch_figures
 
 app = DjangoDash(
     "MachineDashboard_v3",
@@ -174,121 +171,41 @@ def info_box(value, label, color="bg-info", icon="fas fa-cog", unit=""):
         ]
     )
 
-def get_shift_duration_seconds(shift):
+# ---------------------
+# Generate Data (functions called inside the per-tab callbacks)
+# ---------------------
+# Global labels for consistent axis and legend naming
+COMMON_LABELS = {
+    "machine_label": "Machine",
+    "Machine Number": "Machine",
+    "npt_time": "NPT",
+    "reason": "Reason",
+    "shift_name": "Shift",
+    "total_npt": "Total NPT",
+    "count_time":"Hour of Day",
+    "count":"Count",
+    "avg_npt_per_event": "Avg NPT per Event",
+}
+
+
+def get_viewer_npt(user):
     """
-    Calculate shift duration in seconds, handling overnight shifts
+    The viewer's machines, their slice of the shared NPT frame (see
+    function_dashboard_helper) and its marker. Every section starts here,
+    so each one only adds its own aggregations.
     """
-    from datetime import datetime, timedelta
-    
-    # Create datetime objects for calculation
-    start_dt = datetime.combine(datetime.today(), shift.start_time)
-    end_dt = datetime.combine(datetime.today(), shift.end_time)
-    
-    # Handle overnight shifts (end_time < start_time)
-    if shift.end_time < shift.start_time:
-        end_dt += timedelta(days=1)
-    
-    duration = end_dt - start_dt
-    return duration.total_seconds()
+    machine_ids = get_viewer_machine_ids(user)
+    frames = get_dashboard_frames()
+    npt_df, _ = slice_dashboard_frames(frames, machine_ids)
+    return frames, machine_ids, npt_df, get_frames_marker(frames, machine_ids, npt_df)
 
 
-# ---------------------
-# Generate Data (function called inside callback)
-# ---------------------
-def generate_dashboard_data(request, user=None):
-    # Fetch machines user has access to
-    if user is None or isinstance(user, AnonymousUser) or not user.is_authenticated:
-        machines = Machine.objects.none()
-    else:
-        machines = get_user_machines(user)
-    
-    date_from, date_to, datetime_from_formatted, datetime_to_formatted = get_datetime_range(request)
+def generate_overall_metrics(frames, machine_ids, npt_df):
+    """KPI values of the info boxes shown above the tabs."""
+    date_from, date_to = frames['date_from'], frames['date_to']
 
     duration = date_to - date_from
     time_range_seconds = duration.total_seconds() 
-    # --- RotationStatus queryset filtered by user machines and default datetime range ---
-    rot_qs = RotationStatus.objects.select_related('machine').filter(
-        machine__in=machines,
-        count_time__gte=date_from,
-        count_time__lte=date_to
-    )
-
-    # --- ProcessedNPT queryset filtered by user machines and default datetime range ---
-    npt_qs = ProcessedNPT.objects.select_related('machine', 'reason').filter(
-        machine__in=machines,
-        off_time__gte=date_from,
-        off_time__lte=date_to
-    )
-
-    # removing null values
-    npt_qs = skip_null_on_time_except_last(npt_qs)
-
-    # ---------------------
-    # Prepare DataFrames using the new structure
-    # ---------------------
-    npt_df = pd.DataFrame([{
-        "machine_id": npt.machine.id if npt.machine else None,
-        "machine_label": f"{npt.machine.mc_no}" if npt.machine else "Unknown",
-        "reason": npt.reason.name if npt.reason else "N/A",
-        "off_time": npt.off_time,
-        "on_time": npt.on_time
-    } for npt in npt_qs])
-
-    rot_df = pd.DataFrame([{
-        "machine_id": rot.machine.id if rot.machine else None,
-        "machine_label": f"{rot.machine.mc_no}" if rot.machine else "Unknown",
-        "count": rot.count,
-        "count_time": rot.count_time
-    } for rot in rot_qs])
-
-    # Ensure datetime conversion
-    if not npt_df.empty:
-        npt_df['off_time'] = pd.to_datetime(npt_df['off_time'])
-        npt_df['on_time'] = pd.to_datetime(npt_df['on_time'])
-    if not rot_df.empty:
-        rot_df['count_time'] = pd.to_datetime(rot_df['count_time'])
-
-    # ---------------------
-    # Determine shift
-    # ---------------------
-    shifts = Shift.objects.all()
-
-    # Replace your get_shift function with this simpler version:
-    def get_shift(dt):
-        dt_time = dt.time()
-        
-        for s in shifts:
-            start_time = s.start_time
-            end_time = s.end_time
-            
-            if start_time <= end_time:
-                # Regular shift (same day)
-                if start_time <= dt_time <= end_time:
-                    return s.name
-            else:
-                # Overnight shift
-                if dt_time >= start_time or dt_time <= end_time:
-                    return s.name
-        
-        return "Unknown"
-
-    if not npt_df.empty:
-        npt_df['shift_name'] = npt_df['off_time'].apply(get_shift)
-
-        # ---------------------
-        # Calculate NPT duration in seconds
-        # ---------------------
-        npt_df['npt_time'] = npt_df.apply(
-            lambda row: (row['on_time'] - row['off_time']).total_seconds() 
-            if row['on_time'] is not pd.NaT else (pd.Timestamp.now() - row['off_time']).total_seconds(),
-            axis=1
-        )
-
-        npt_df['npt_time_formatted'] = format_seconds_series(npt_df['npt_time'])
-    else:
-        npt_df['shift_name'] = []
-        npt_df['npt_time'] = []
-        npt_df['npt_time_formatted'] = []
 
     # ---------------------
     # Overall Metrics
@@ -298,48 +215,8 @@ def generate_dashboard_data(request, user=None):
     
     # Get list of inactive machines
     active_machines = set(npt_df['machine_id'].dropna()) if not npt_df.empty else set()
-    all_machine_ids = set(machines.values_list('id', flat=True))
-    inactive_machines = all_machine_ids - active_machines
-    # print(active_machines)
-    # print(all_machine_ids)
-    # print(inactive_machines)
-    # Create inactive machines DataFrame
-    inactive_machines_df = pd.DataFrame()
-    if inactive_machines:
-        inactive_machines_data = []
-        for machine in machines.filter(id__in=inactive_machines):
-            # Find the last activity (most recent on_time) for this machine
-            last_npt = ProcessedNPT.objects.filter(
-                machine=machine,
-                on_time__isnull=False
-            ).order_by('-on_time').first()
-            # print("last Active: ", last_npt, "-->", last_npt.on_time)
-            if last_npt and last_npt.on_time:
-                # Calculate time since last activity
-                time_since_last = pd.Timestamp.now() - pd.Timestamp(last_npt.on_time)
-                days = time_since_last.days
-                hours = time_since_last.seconds // 3600
-                minutes = (time_since_last.seconds % 3600) // 60
-                
-                if days > 0:
-                    last_activity = f"{days}d {hours}h {minutes}m ago"
-                elif hours > 0:
-                    last_activity = f"{hours}h {minutes}m ago"
-                else:
-                    last_activity = f"{minutes}m ago"
-                    
-                last_on_time = last_npt.on_time.strftime('%Y-%m-%d %H:%M:%S')
-            else:
-                last_activity = 'No recorded activity'
-                last_on_time = 'Never'
-            
-            inactive_machines_data.append({
-                'machines': f"{machine.mc_no}",
-                'last_on_time': last_on_time,
-                'last_activity': last_activity
-            })
-        inactive_machines_df = pd.DataFrame(inactive_machines_data)
-    # print(inactive_machines_df)
+    inactive_machines = set(machine_ids) - active_machines
+
     rolls_produced_total = (npt_df['reason'] == "Roll Cutting").sum() if not npt_df.empty else 0
     # now = datetime.now()
     currentTimeInSeconds = time_range_seconds
@@ -348,13 +225,41 @@ def generate_dashboard_data(request, user=None):
     overall_pt_percent = round(100 - overall_npt_percent, 2)
     total_avg_npt_all_machine = 0
     total_avg_event_all_machine = 0
-    # ---------------------
-    # Initialize empty figures and tables
-    # ---------------------
-    figs = {}
+
+    if not npt_df.empty:
+        # ---------------------
+        # Total/Average metrics for all machines
+        # ---------------------
+        machine_totals = npt_df.groupby('machine_label')['npt_time'].agg(['sum', 'count'])
+        total_avg_npt_all_machine = round(machine_totals['sum'].sum() / len(machine_totals), 2)
+        total_avg_event_all_machine = round(machine_totals['count'].sum() / len(machine_totals), 2)
+
+    return {
+        "total_npt": total_npt,
+        "total_events": total_events,
+        "active_machines": len(active_machines),
+        "inactive_machines": len(inactive_machines),
+        "overall_npt_percent": overall_npt_percent,
+        "overall_pt_percent": overall_pt_percent,
+        "rolls_produced_total": rolls_produced_total,
+        "total_avg_npt_all_machine_formatted":format_seconds(total_avg_npt_all_machine),
+        "total_avg_event_all_machine":total_avg_event_all_machine,
+    }
+
+
+def generate_machine_tab_data(frames, machine_ids, npt_df):
+    """Machine charts, hourly trend, machine summary and inactive machines."""
+    currentTimeInSeconds = (frames['date_to'] - frames['date_from']).total_seconds()
+
+    active_machines = set(npt_df['machine_id'].dropna()) if not npt_df.empty else set()
+    inactive_machines = set(machine_ids) - active_machines
+    # Create inactive machines DataFrame
+    inactive_machines_df = get_inactive_machines_frame(frames['machines'], inactive_machines, frames['last_on_times'])
+
+    figs = {k: {} for k in [
+        'fig_npt_by_machine', 'fig_npt_by_machine_reason', 'fig_hourly_trend', 'fig_machine_perf'
+    ]}
     machine_summary_table = html.Div("No data available for machines.", className="text-center")
-    shift_summary_table = html.Div("No data available for shifts.", className="text-center")
-    npt_summary_table = html.Div("No data available for NPT reasons.", className="text-center")
     
     if not inactive_machines_df.empty:
             # print("hello")
@@ -370,9 +275,6 @@ def generate_dashboard_data(request, user=None):
             )
     
     if not npt_df.empty:
-        # ---------------------
-        # Aggregations for figures and tables
-        # ---------------------
         # Machine-level metrics
         machine_summary = npt_df.groupby('machine_label', as_index=False).agg(
             total_npt=('npt_time', 'sum'),
@@ -387,90 +289,14 @@ def generate_dashboard_data(request, user=None):
         machine_summary['total_npt_formatted'] = format_seconds_series(machine_summary['total_npt'])
         machine_summary['avg_npt_per_event_formatted'] = format_seconds_series(machine_summary['avg_npt_per_event'])
 
-        # ---------------------
-        # Total/Average metrics for all machines
-        # ---------------------
-        total_npt_all_machines = machine_summary['total_npt'].sum()
-        total_events_all_machines = machine_summary['events'].sum()
-        
-        total_avg_npt_all_machine = round(total_npt_all_machines / len(machine_summary), 2) if len(machine_summary) > 0 else 0
-        total_avg_event_all_machine = round(total_events_all_machines / len(machine_summary), 2) if len(machine_summary) > 0 else 0
-        
-        # Optionally format to seconds for display
-        # total_avg_npt_all_machine_formatted = format_seconds(total_avg_npt_all_machine)
-
-
-        # Shift-level metrics
-
-        shift_summary = npt_df.groupby('shift_name', as_index=False).agg(
-            total_npt=('npt_time', 'sum'),
-            events=('shift_name', 'count'),
-            avg_npt_per_event=('npt_time', 'mean')
-        )
-        shift_summary['avg_npt_per_event'] = shift_summary['avg_npt_per_event'].round(2)
-        
-        # NEW: Calculate performance using actual shift duration
-        # Create a mapping of shift names to their durations
-        shift_duration_map = {}
-        for shift in shifts:
-            shift_duration_map[shift.name] = get_shift_duration_seconds(shift)
-        
-        # Apply the correct performance calculation
-        def calculate_shift_performance(row):
-            shift_name = row['shift_name']
-            total_npt = row['total_npt']
-            
-            if shift_name in shift_duration_map:
-                shift_duration = shift_duration_map[shift_name]*len(active_machines)
-                # print("shift Duration: ", shift_duration_map[shift_name])
-                # print("Shift Duration for all machines: ", shift_duration)
-                # Performance = (Productive Time / Total Shift Time) * 100
-                # Productive Time = Shift Duration - NPT Time
-                performance = ((shift_duration - total_npt) / shift_duration) * 100
-                return round(performance, 2)
-            else:
-                # Fallback to original calculation if shift not found
-                return round(((currentTimeInSeconds - total_npt)/currentTimeInSeconds) * 100, 2)
-        
-        shift_summary['performance'] = shift_summary.apply(calculate_shift_performance, axis=1)
-        shift_summary['total_npt_formatted'] = format_seconds_series(shift_summary['total_npt'])
-        shift_summary['avg_npt_per_event_formatted'] = format_seconds_series(shift_summary['avg_npt_per_event'])
-
-        # Machine + shift breakdown
-        machine_shift_summary = npt_df.groupby(['machine_label', 'shift_name'], as_index=False)['npt_time'].sum()
-        machine_shift_summary['npt_time_formatted'] = format_seconds_series(machine_shift_summary['npt_time'])
-
         # Average NPT per machine for figures
         machine_avg_summary = npt_df.groupby('machine_label', as_index=False)['npt_time'].mean()
         machine_avg_summary['npt_time'] = machine_avg_summary['npt_time'].round(2)
         machine_avg_summary['npt_time_formatted'] = format_seconds_series(machine_avg_summary['npt_time'])
 
-        # Shift trend over time
-        shift_trend_summary = npt_df.groupby(['shift_name', 'off_time'], as_index=False)['npt_time'].sum()
-        shift_trend_summary['npt_time_formatted'] = format_seconds_series(shift_trend_summary['npt_time'])
-
-        # ---------------------
-        # Figures
-        # ---------------------
-
         # get reason-color mappings
         reason_color_map = get_reason_color_map(NptReason)
 
-
-        # Global labels for consistent axis and legend naming
-        common_labels = {
-            "machine_label": "Machine",
-            "Machine Number": "Machine",
-            "npt_time": "NPT",
-            "reason": "Reason",
-            "shift_name": "Shift",
-            "total_npt": "Total NPT",
-            "count_time":"Hour of Day",
-            "count":"Count",
-            "avg_npt_per_event": "Avg NPT per Event",
-        }
-
-
         # NPT by Machine - with annotations
         fig_npt_by_machine = px.bar(
             machine_summary,
@@ -478,7 +304,7 @@ def generate_dashboard_data(request, user=None):
             title="NPT by Machine",
             hover_data={"total_npt": False},
             custom_data=['total_npt_formatted'],
-            labels=common_labels
+            labels=COMMON_LABELS
 
         )
         fig_npt_by_machine.update_traces(
@@ -505,7 +331,7 @@ def generate_dashboard_data(request, user=None):
             y="npt_time",
             color="reason",
             title="NPT by Machine (Stacked by Reason)",
-            labels=common_labels,
+            labels=COMMON_LABELS,
             custom_data=["npt_time_formatted"],
             color_discrete_map=reason_color_map  # Apply custom colors
         )
@@ -522,56 +348,6 @@ def generate_dashboard_data(request, user=None):
             legend_title="Reason"
         )
 
-        # NPT by Reason - Pie Chart (no annotations needed for pie charts)
-        npt_reason_summary = npt_df.groupby('reason')['npt_time'].sum().reset_index()
-        npt_reason_summary['npt_time_formatted'] = format_seconds_series(npt_reason_summary['npt_time'])
-        
-        fig_npt_by_reason_pie = px.pie(
-            npt_reason_summary,
-            names='reason', 
-            values='npt_time',
-            title="NPT by Reasons",
-            labels=common_labels,
-            color='reason',
-            color_discrete_map=reason_color_map  # Apply custom colors
-        )
-        
-        # Update hover template with formatted time
-        fig_npt_by_reason_pie.update_traces(
-            hovertemplate='<b>%{label}</b><br>NPT Time: %{customdata[0]}<br>Percentage: %{percent}<br><extra></extra>',
-            customdata=npt_reason_summary['npt_time_formatted']
-        )
-
-        # NPT by Reason - Bar Chart - with annotations
-        npt_grouped = npt_df.groupby('reason')['npt_time'].sum().reset_index()
-        npt_grouped["npt_time_formatted"] = format_seconds_series(npt_grouped['npt_time'])
-        
-        fig_npt_by_reason_bar = px.bar(
-            npt_grouped,
-            x='reason', 
-            y='npt_time',
-            title="NPT by Reasons",
-            color='reason',
-            custom_data=[npt_grouped['npt_time_formatted']],
-            labels=common_labels,
-            color_discrete_map=reason_color_map  # Apply custom colors
-        )
-        
-        fig_npt_by_reason_bar.update_traces(
-            hovertemplate='<b>%{label}</b><br>NPT Time: %{customdata[0]}<br><extra></extra>'
-        )
-        # Add annotations for each bar
-        # for i, row in npt_grouped.iterrows():
-        #     fig_npt_by_reason_bar.add_annotation(
-        #         x=row['reason'],
-        #         y=row['npt_time'],
-        #         text=f"{row['npt_time_formatted']}",
-        #         showarrow=False,
-        #         yshift=10,
-        #         font=dict(size=10, color="black")
-        #     )
-
-
         # Use .copy() to prevent a SettingWithCopyWarning from pandas
         hourly_npt_df = process_npt_to_hourly(npt_df.copy())
 
@@ -629,43 +405,6 @@ def generate_dashboard_data(request, user=None):
             )
         )
 
-        # Machine NPT by Shift - with annotations
-        fig_npt_by_shift = px.bar(
-            machine_shift_summary,
-            x='machine_label', y='npt_time', color='shift_name',
-            title="Machine NPT by Shift",
-            barmode='stack',
-            hover_data={"npt_time": False},
-            custom_data=['npt_time_formatted'],
-            labels=common_labels
-        )
-        fig_npt_by_shift.update_traces(
-            hovertemplate='<b>Machine: %{x}</b><br>Shift: %{fullData.name}<br>NPT Time: %{customdata[0]}<br><extra></extra>'
-        )
-        # Calculate total NPT per machine for annotations (for stacked bars)
-        # machine_shift_totals = machine_shift_summary.groupby('machine_label')['npt_time'].sum()
-        # for machine, total in machine_shift_totals.items():
-        #     fig_npt_by_shift.add_annotation(
-        #         x=machine,
-        #         y=total,
-        #         text=f"{format_seconds(total)}",
-        #         showarrow=False,
-        #         yshift=10,
-        #         font=dict(size=10, color="black")
-        #     )
-
-        # Shiftwise NPT Distribution (pie chart, no annotations needed)
-        fig_shiftwise_npt = px.pie(
-            shift_summary,
-            names='shift_name', values='total_npt',
-            title="Shiftwise NPT Distribution",
-            custom_data=['total_npt_formatted'],
-            labels=common_labels
-        )
-        fig_shiftwise_npt.update_traces(
-            hovertemplate='<b>%{label}</b><br>NPT Time: %{customdata[0]}<br>Percentage: %{percent}<br><extra></extra>'
-        )
-
         # Average NPT per Machine - with annotations
         fig_machine_perf = px.bar(
             machine_avg_summary,
@@ -673,7 +412,7 @@ def generate_dashboard_data(request, user=None):
             title="Average NPT per Machine",
             hover_data={"npt_time": False},
             custom_data=['npt_time_formatted'],
-            labels=common_labels
+            labels=COMMON_LABELS
         )
         fig_machine_perf.update_traces(
             hovertemplate='<b>Machine: %{x}</b><br>Avg NPT Time: %{customdata[0]}<br><extra></extra>'
@@ -689,37 +428,13 @@ def generate_dashboard_data(request, user=None):
         #         font=dict(size=10, color="black")
         #     )
 
-        # Shiftwise NPT Trend (line chart, no annotations needed)
-        fig_shiftwise_trend = px.line(
-            shift_trend_summary,
-            x='off_time', y='npt_time', color='shift_name',
-            title="Shiftwise NPT Overview",
-            hover_data={"npt_time": False},
-            custom_data=['npt_time_formatted'],
-            labels=common_labels
-        )
-        fig_shiftwise_trend.update_traces(
-            hovertemplate='<b>Time: %{x}</b><br>Shift: %{fullData.name}<br>NPT Time: %{customdata[0]}<br><extra></extra>'
-        )
-
         figs = {
             "fig_npt_by_machine": fig_npt_by_machine,
             "fig_npt_by_machine_reason": fig_npt_by_machine_reason,
-            "fig_npt_by_reason_pie": fig_npt_by_reason_pie,
-            "fig_npt_by_reason_bar": fig_npt_by_reason_bar,
             "fig_hourly_trend": fig_hourly_trend,
-            "fig_npt_by_shift": fig_npt_by_shift,
-            "fig_shiftwise_npt": fig_shiftwise_npt,
             "fig_machine_perf": fig_machine_perf,
-            "fig_shiftwise_trend": fig_shiftwise_trend,
         }
 
-        # ---------------------
-        # Tables
-        # ---------------------
-
-        # inactive machines table - using dbc.Table
-
         # updating machine_summary for table
         columns_to_show_machine = [
             'machine_label',
@@ -736,21 +451,6 @@ def generate_dashboard_data(request, user=None):
             'avg_npt_per_event_formatted': 'Avg NPT Per Event'
         })
 
-        # Updating shift_summary for table
-        columns_to_show_shift = [
-            'shift_name',
-            'total_npt_formatted',
-            'events',
-            'avg_npt_per_event_formatted',
-            'performance'
-        ]
-
-        shift_summary_display = shift_summary[columns_to_show_shift].rename(columns={
-            'shift_name': 'Shift',
-            'total_npt_formatted': 'Total NPT',
-            'avg_npt_per_event_formatted': 'Avg NPT Per Event'
-        })
-
         # Machine summary table - using dbc.Table
         machine_summary_table = create_styled_table(
             clean_column_names(machine_summary_display),
@@ -758,16 +458,82 @@ def generate_dashboard_data(request, user=None):
             table_id="machine-summary-table"
         )
 
-        # Shift summary table - using dbc.Table
-        shift_summary_table = create_styled_table(
-            clean_column_names(shift_summary_display),
-            header_color="success",
-            table_id="shift-summary-table"
-        )
+    return {
+        "figs": figs,
+        "tables": {
+            "machine_summary_table": machine_summary_table,
+            "inactive_machines_table":inactive_machines_table
+        }
+    }
 
-        # Machine-Reason table
-        # Create summary table with additional statistics
-        npt_summary_stats = npt_df.groupby('reason').agg({
+
+def generate_reason_tab_data(npt_df):
+    """Reason charts and the reasonwise NPT summary."""
+    total_npt = npt_df['npt_time'].sum() if not npt_df.empty else 0
+    figs = {k: {} for k in ['fig_npt_by_reason_pie', 'fig_npt_by_reason_bar']}
+    npt_summary_table = html.Div("No data available for NPT reasons.", className="text-center")
+
+    if not npt_df.empty:
+        # get reason-color mappings
+        reason_color_map = get_reason_color_map(NptReason)
+
+        # NPT by Reason - Pie Chart (no annotations needed for pie charts)
+        npt_reason_summary = npt_df.groupby('reason')['npt_time'].sum().reset_index()
+        npt_reason_summary['npt_time_formatted'] = format_seconds_series(npt_reason_summary['npt_time'])
+        
+        fig_npt_by_reason_pie = px.pie(
+            npt_reason_summary,
+            names='reason', 
+            values='npt_time',
+            title="NPT by Reasons",
+            labels=COMMON_LABELS,
+            color='reason',
+            color_discrete_map=reason_color_map  # Apply custom colors
+        )
+        
+        # Update hover template with formatted time
+        fig_npt_by_reason_pie.update_traces(
+            hovertemplate='<b>%{label}</b><br>NPT Time: %{customdata[0]}<br>Percentage: %{percent}<br><extra></extra>',
+            customdata=npt_reason_summary['npt_time_formatted']
+        )
+
+        # NPT by Reason - Bar Chart - with annotations
+        npt_grouped = npt_df.groupby('reason')['npt_time'].sum().reset_index()
+        npt_grouped["npt_time_formatted"] = format_seconds_series(npt_grouped['npt_time'])
+        
+        fig_npt_by_reason_bar = px.bar(
+            npt_grouped,
+            x='reason', 
+            y='npt_time',
+            title="NPT by Reasons",
+            color='reason',
+            custom_data=[npt_grouped['npt_time_formatted']],
+            labels=COMMON_LABELS,
+            color_discrete_map=reason_color_map  # Apply custom colors
+        )
+        
+        fig_npt_by_reason_bar.update_traces(
+            hovertemplate='<b>%{label}</b><br>NPT Time: %{customdata[0]}<br><extra></extra>'
+        )
+        # Add annotations for each bar
+        # for i, row in npt_grouped.iterrows():
+        #     fig_npt_by_reason_bar.add_annotation(
+        #         x=row['reason'],
+        #         y=row['npt_time'],
+        #         text=f"{row['npt_time_formatted']}",
+        #         showarrow=False,
+        #         yshift=10,
+        #         font=dict(size=10, color="black")
+        #     )
+
+        figs = {
+            "fig_npt_by_reason_pie": fig_npt_by_reason_pie,
+            "fig_npt_by_reason_bar": fig_npt_by_reason_bar,
+        }
+
+        # Machine-Reason table
+        # Create summary table with additional statistics
+        npt_summary_stats = npt_df.groupby('reason').agg({
             'npt_time': ['sum', 'count', 'mean', 'min', 'max']
         }).round(2)
 
@@ -806,120 +572,167 @@ def generate_dashboard_data(request, user=None):
             )
         else:
             npt_summary_table = html.Div("No data available for NPT reasons.", className="text-center")
-    else:
-        # Empty figures when no data
-        figs = {k: {} for k in [
-            'fig_npt_by_machine', 'fig_npt_by_machine_reason', 'fig_npt_by_reason_pie',
-            'fig_npt_by_reason_bar', 'fig_hourly_trend', 'fig_npt_by_shift',
-            'fig_shiftwise_npt', 'fig_machine_perf', 'fig_shiftwise_trend'
-        ]}
-
-    # Hourly Rotation Counter Trend - handle rotation data
-    if not rot_df.empty:
-        figs['fig_hourly_trend_rotation'] = px.line(
-            rot_df,
-            x='count_time', y='count', color='machine_label',
-            title="Hourly Rotation Counter Trend",
-            labels=common_labels
-        )
-    else:
-        figs['fig_hourly_trend_rotation'] = {}
 
-    # ---------------------
-    # Return
-    # ---------------------
     return {
-        "total_npt": total_npt,
-        "total_events": total_events,
-        "active_machines": len(active_machines),
-        "inactive_machines": len(inactive_machines),
-        "overall_npt_percent": overall_npt_percent,
-        "overall_pt_percent": overall_pt_percent,
-        "rolls_produced_total": rolls_produced_total,
-        "total_avg_npt_all_machine_formatted":format_seconds(total_avg_npt_all_machine),
-        "total_avg_event_all_machine":total_avg_event_all_machine,
         "figs": figs,
         "tables": {
-            "machine_summary_table": machine_summary_table,
-            "shift_summary_table": shift_summary_table,
             "npt_summary_table": npt_summary_table,
-            "inactive_machines_table":inactive_machines_table
         }
     }
 
 
-# ---------------------
-# Layout
-# ---------------------
-app.layout = dbc.Container([
-    dcc.Interval(id="interval-update", interval=60*1000),  # update every minute
-    html.Div(id="dashboard-content")
-], fluid=True)
-
-# ---------------------
-# Callback to update dashboard
-# ---------------------
-@app.callback(
-    Output("dashboard-content", "children"),
-    [Input("interval-update", "n_intervals")]
-)
-def update_dashboard(n_intervals, callback_context=None, request=None, user=None):
-    # If the user isn't automatically inferred, default to AnonymousUser
-    if not user or not user.is_authenticated:
-        user = AnonymousUser()
-
-    data = generate_dashboard_data(request, user=user)
-    figs = data["figs"]
-    tables = data["tables"]
+def generate_shift_tab_data(frames, npt_df):
+    """Shift charts and the shiftwise performance summary."""
+    currentTimeInSeconds = (frames['date_to'] - frames['date_from']).total_seconds()
+    active_machines = set(npt_df['machine_id'].dropna()) if not npt_df.empty else set()
+    figs = {k: {} for k in ['fig_npt_by_shift', 'fig_shiftwise_npt', 'fig_shiftwise_trend']}
+    shift_summary_table = html.Div("No data available for shifts.", className="text-center")
 
-    total_npt = data["total_npt"]
-    total_events = data["total_events"]
-    total_avg_event_all_machine = data["total_avg_event_all_machine"]
-    total_avg_npt_all_machine = data["total_avg_npt_all_machine_formatted"]
-    active_machines = data["active_machines"]
-    inactive_machines = data["inactive_machines"]
-    overall_npt_percent = data["overall_npt_percent"]
-    overall_pt_percent = data["overall_pt_percent"]
-    rolls_produced_total = data["rolls_produced_total"]
+    if not npt_df.empty:
+        # Shift-level metrics
 
-    return dbc.Container([
-        # Cards Row 1
-        dbc.Row([
-            dbc.Col([
-                info_box(f"{format_seconds(total_npt)}", "Total NPT", "bg-info", "fas fa-clock", '')
-            ], xs=12, sm=6, md=3, className="mb-3"),
-            
-            dbc.Col([
-                info_box(str(total_events), "Total Events", "bg-warning", "fas fa-list", '')
-            ], xs=12, sm=6, md=3, className="mb-3"),
-            
-            dbc.Col([
-                info_box(str(active_machines), "Active Machines", "bg-primary", "fas fa-cogs", '')
-            ], xs=12, sm=6, md=3, className="mb-3"),
-            
-            dbc.Col([
-                info_box(str(inactive_machines), "Inactive Machines", "bg-secondary", "fas fa-power-off", '')
-            ], xs=12, sm=6, md=3, className="mb-3"),
-        ], className="g-3 mb-4"),
+        shift_summary = npt_df.groupby('shift_name', as_index=False).agg(
+            total_npt=('npt_time', 'sum'),
+            events=('shift_name', 'count'),
+            avg_npt_per_event=('npt_time', 'mean')
+        )
+        shift_summary['avg_npt_per_event'] = shift_summary['avg_npt_per_event'].round(2)
         
-        # Cards Row 2
-        dbc.Row([            
-            dbc.Col([
-                info_box(str(total_avg_event_all_machine), "Avg Events for All Machines", "bg-danger", "fas fa-chart-bar", '')
-            ], xs=12, sm=6, md=3, className="mb-3"),
-            dbc.Col([
-                info_box(f"{total_avg_npt_all_machine}", "Avg NPT for All Machines", "bg-danger", "fas fa-tachometer-alt", '')
-            ], xs=12, sm=6, md=3, className="mb-3"),
-            
-            dbc.Col([
-                info_box(f"{overall_npt_percent}%", "Overall NPT %", "bg-info", "fas fa-exclamation-triangle", '')
-            ], xs=12, sm=6, md=3, className="mb-3"),
+        # NEW: Calculate performance using actual shift duration
+        # Create a mapping of shift names to their durations
+        shift_duration_map = frames['shift_durations']
+        
+        # Apply the correct performance calculation
+        def calculate_shift_performance(row):
+            shift_name = row['shift_name']
+            total_npt = row['total_npt']
             
-            dbc.Col([
-                info_box(f"{rolls_produced_total}", "Rolls Produced", "bg-secondary", "fas fa-industry", '')
-            ], xs=12, sm=6, md=3, className="mb-3"),
-        ], className="g-3 mb-4"),
+            if shift_name in shift_duration_map:
+                shift_duration = shift_duration_map[shift_name]*len(active_machines)
+                # print("shift Duration: ", shift_duration_map[shift_name])
+                # print("Shift Duration for all machines: ", shift_duration)
+                # Performance = (Productive Time / Total Shift Time) * 100
+                # Productive Time = Shift Duration - NPT Time
+                performance = ((shift_duration - total_npt) / shift_duration) * 100
+                return round(performance, 2)
+            else:
+                # Fallback to original calculation if shift not found
+                return round(((currentTimeInSeconds - total_npt)/currentTimeInSeconds) * 100, 2)
+        
+        shift_summary['performance'] = shift_summary.apply(calculate_shift_performance, axis=1)
+        shift_summary['total_npt_formatted'] = format_seconds_series(shift_summary['total_npt'])
+        shift_summary['avg_npt_per_event_formatted'] = format_seconds_series(shift_summary['avg_npt_per_event'])
+
+        # Machine + shift breakdown
+        machine_shift_summary = npt_df.groupby(['machine_label', 'shift_name'], as_index=False)['npt_time'].sum()
+        machine_shift_summary['npt_time_formatted'] = format_seconds_series(machine_shift_summary['npt_time'])
+
+        # Shift trend over time
+        shift_trend_summary = npt_df.groupby(['shift_name', 'off_time'], as_index=False)['npt_time'].sum()
+        shift_trend_summary['npt_time_formatted'] = format_seconds_series(shift_trend_summary['npt_time'])
+
+        # Machine NPT by Shift - with annotations
+        fig_npt_by_shift = px.bar(
+            machine_shift_summary,
+            x='machine_label', y='npt_time', color='shift_name',
+            title="Machine NPT by Shift",
+            barmode='stack',
+            hover_data={"npt_time": False},
+            custom_data=['npt_time_formatted'],
+            labels=COMMON_LABELS
+        )
+        fig_npt_by_shift.update_traces(
+            hovertemplate='<b>Machine: %{x}</b><br>Shift: %{fullData.name}<br>NPT Time: %{customdata[0]}<br><extra></extra>'
+        )
+        # Calculate total NPT per machine for annotations (for stacked bars)
+        # machine_shift_totals = machine_shift_summary.groupby('machine_label')['npt_time'].sum()
+        # for machine, total in machine_shift_totals.items():
+        #     fig_npt_by_shift.add_annotation(
+        #         x=machine,
+        #         y=total,
+        #         text=f"{format_seconds(total)}",
+        #         showarrow=False,
+        #         yshift=10,
+        #         font=dict(size=10, color="black")
+        #     )
+
+        # Shiftwise NPT Distribution (pie chart, no annotations needed)
+        fig_shiftwise_npt = px.pie(
+            shift_summary,
+            names='shift_name', values='total_npt',
+            title="Shiftwise NPT Distribution",
+            custom_data=['total_npt_formatted'],
+            labels=COMMON_LABELS
+        )
+        fig_shiftwise_npt.update_traces(
+            hovertemplate='<b>%{label}</b><br>NPT Time: %{customdata[0]}<br>Percentage: %{percent}<br><extra></extra>'
+        )
+
+        # Shiftwise NPT Trend (line chart, no annotations needed)
+        fig_shiftwise_trend = px.line(
+            shift_trend_summary,
+            x='off_time', y='npt_time', color='shift_name',
+            title="Shiftwise NPT Overview",
+            hover_data={"npt_time": False},
+            custom_data=['npt_time_formatted'],
+            labels=COMMON_LABELS
+        )
+        fig_shiftwise_trend.update_traces(
+            hovertemplate='<b>Time: %{x}</b><br>Shift: %{fullData.name}<br>NPT Time: %{customdata[0]}<br><extra></extra>'
+        )
+
+        figs = {
+            "fig_npt_by_shift": fig_npt_by_shift,
+            "fig_shiftwise_npt": fig_shiftwise_npt,
+            "fig_shiftwise_trend": fig_shiftwise_trend,
+        }
+
+        # Updating shift_summary for table
+        columns_to_show_shift = [
+            'shift_name',
+            'total_npt_formatted',
+            'events',
+            'avg_npt_per_event_formatted',
+            'performance'
+        ]
+
+        shift_summary_display = shift_summary[columns_to_show_shift].rename(columns={
+            'shift_name': 'Shift',
+            'total_npt_formatted': 'Total NPT',
+            'avg_npt_per_event_formatted': 'Avg NPT Per Event'
+        })
+
+        # Shift summary table - using dbc.Table
+        shift_summary_table = create_styled_table(
+            clean_column_names(shift_summary_display),
+            header_color="success",
+            table_id="shift-summary-table"
+        )
 
+    return {
+        "figs": figs,
+        "tables": {
+            "shift_summary_table": shift_summary_table,
+        }
+    }
+
+
+# ---------------------
+# Layout
+# ---------------------
+# Figures and tables of the NPT tabs; each figure is drawn in the graph with
+# its id in dashes, each table in the "<id in dashes>-container" div
+MACHINE_FIGURES = ['fig_npt_by_machine', 'fig_machine_perf', 'fig_npt_by_machine_reason', 'fig_hourly_trend']
+MACHINE_TABLES = ['machine_summary_table', 'inactive_machines_table']
+REASON_FIGURES = ['fig_npt_by_reason_bar', 'fig_npt_by_reason_pie']
+REASON_TABLES = ['npt_summary_table']
+SHIFT_FIGURES = ['fig_shiftwise_trend', 'fig_npt_by_shift', 'fig_shiftwise_npt']
+SHIFT_TABLES = ['shift_summary_table']
+
+
+def machines_tab():
+    """Layout of the machines tab, filled by update_machines_tab."""
+    return dbc.Container([
         # Charts Row 1 - Machine Charts
         dbc.Row([
             dbc.Col([
@@ -927,7 +740,8 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
                     dbc.CardBody([
                         html.Div([
                             dcc.Graph(
-                                figure=figs.get("fig_npt_by_machine", {}), 
+                                id="fig-npt-by-machine",
+                                figure={},
                                 style={"height":"400px"},
                                 config={'responsive': True, 'displayModeBar': False}
                             )
@@ -941,7 +755,8 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
                     dbc.CardBody([
                         html.Div([
                             dcc.Graph(
-                                figure=figs.get("fig_machine_perf", {}), 
+                                id="fig-machine-perf",
+                                figure={},
                                 style={"height":"400px"},
                                 config={'responsive': True, 'displayModeBar': False}
                             )
@@ -955,7 +770,8 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
                     dbc.CardBody([
                         html.Div([
                             dcc.Graph(
-                                figure=figs.get("fig_npt_by_machine_reason", {}), 
+                                id="fig-npt-by-machine-reason",
+                                figure={},
                                 style={"height":"400px"},
                                 config={'responsive': True, 'displayModeBar': False}
                             )
@@ -972,7 +788,8 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
                     dbc.CardBody([
                         html.Div([
                             dcc.Graph(
-                                figure=figs.get("fig_hourly_trend", {}), 
+                                id="fig-hourly-trend",
+                                figure={},
                                 style={"height":"400px"},
                                 config={'responsive': True, 'displayModeBar': False}
                             )
@@ -982,6 +799,50 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
             ], xs=12, className="mb-4")
         ]),
 
+        # Tables Section
+        dbc.Row([
+            # Machine Summary Table
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader([
+                        html.H5("Machinewise Performance Summary", className="mb-0 text-dark fw-bold")
+                    ], className="bg-light border-bottom"),
+                    dbc.CardBody([
+                        html.Div([
+                            html.Div(id="machine-summary-table-container")
+                        ], style={
+                            "overflow-x": "auto",
+                            "overflow-y": "auto",
+                            "max-height": "500px"
+                        }, className="table-responsive")
+                    ], className="p-0")
+                ], className="shadow-sm border-0 h-100")
+            ], xs=12, sm=12, md=12, lg=8, className="mb-4"),
+            
+            # Inactive Machines Table
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardHeader([
+                        html.H5("Inactive Machines List", className="mb-0 text-dark fw-bold")
+                    ], className="bg-light border-bottom"),
+                    dbc.CardBody([
+                        html.Div([
+                            html.Div(id="inactive-machines-table-container")
+                        ], style={
+                            "overflow-x": "auto",
+                            "overflow-y": "auto",
+                            "max-height": "500px"
+                        }, className="table-responsive")
+                    ], className="p-0")
+                ], className="shadow-sm border-0 h-100")
+            ], xs=12, sm=12, md=12, lg=4, className="mb-4"),
+        ], className="g-3"),
+    ], fluid=True, className="pt-4")
+
+
+def reasons_tab():
+    """Layout of the reasons tab, filled by update_reasons_tab."""
+    return dbc.Container([
         # Reason Charts
         dbc.Row([
             dbc.Col([
@@ -989,7 +850,8 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
                     dbc.CardBody([
                         html.Div([
                             dcc.Graph(
-                                figure=figs.get("fig_npt_by_reason_bar", {}), 
+                                id="fig-npt-by-reason-bar",
+                                figure={},
                                 style={"height":"400px"},
                                 config={'responsive': True, 'displayModeBar': False}
                             )
@@ -1003,7 +865,8 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
                     dbc.CardBody([
                         html.Div([
                             dcc.Graph(
-                                figure=figs.get("fig_npt_by_reason_pie", {}), 
+                                id="fig-npt-by-reason-pie",
+                                figure={},
                                 style={"height":"400px"},
                                 config={'responsive': True, 'displayModeBar': False}
                             )
@@ -1013,23 +876,31 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
             ], xs=12, sm=12, md=6, className="mb-4"),
         ], className="g-3"),
 
-        # Rotation Counter Chart
+        # Reason Summary Table
         dbc.Row([
             dbc.Col([
                 dbc.Card([
+                    dbc.CardHeader([
+                        html.H5("Reasonwise NPT Summary", className="mb-0 text-dark fw-bold")
+                    ], className="bg-light border-bottom"),
                     dbc.CardBody([
                         html.Div([
-                            dcc.Graph(
-                                figure=figs.get("fig_hourly_trend_rotation", {}), 
-                                style={"height":"400px"},
-                                config={'responsive': True, 'displayModeBar': False}
-                            )
-                        ], style={"overflow-x": "auto"})
+                            html.Div(id="npt-summary-table-container")
+                        ], style={
+                            "overflow-x": "auto",
+                            "overflow-y": "auto",
+                            "max-height": "500px"
+                        }, className="table-responsive")
                     ], className="p-0")
                 ], className="shadow-sm border-0")
             ], xs=12, className="mb-4")
-        ]),
+        ])
+    ], fluid=True, className="pt-4")
+
 
+def shifts_tab():
+    """Layout of the shifts tab, filled by update_shifts_tab."""
+    return dbc.Container([
         # Shift Charts
         dbc.Row([
             dbc.Col([
@@ -1037,7 +908,8 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
                     dbc.CardBody([
                         html.Div([
                             dcc.Graph(
-                                figure=figs.get("fig_shiftwise_trend", {}), 
+                                id="fig-shiftwise-trend",
+                                figure={},
                                 style={"height":"400px", "min-width": "700px"},
                                 config={'responsive': True, 'displayModeBar': False}
                             )
@@ -1051,7 +923,8 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
                     dbc.CardBody([
                         html.Div([
                             dcc.Graph(
-                                figure=figs.get("fig_npt_by_shift", {}), 
+                                id="fig-npt-by-shift",
+                                figure={},
                                 style={"height":"400px", "min-width": "350px"},
                                 config={'responsive': True, 'displayModeBar': False}
                             )
@@ -1065,7 +938,8 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
                     dbc.CardBody([
                         html.Div([
                             dcc.Graph(
-                                figure=figs.get("fig_shiftwise_npt", {}), 
+                                id="fig-shiftwise-npt",
+                                figure={},
                                 style={"height":"400px", "min-width": "350px"},
                                 config={'responsive': True, 'displayModeBar': False}
                             )
@@ -1075,45 +949,6 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
             ], xs=12, sm=6, md=6, lg=3, className="mb-4"),
         ], className="g-3"),
 
-        # Tables Section
-        dbc.Row([
-            # Machine Summary Table
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardHeader([
-                        html.H5("Machinewise Performance Summary", className="mb-0 text-dark fw-bold")
-                    ], className="bg-light border-bottom"),
-                    dbc.CardBody([
-                        html.Div([
-                            tables["machine_summary_table"]
-                        ], style={
-                            "overflow-x": "auto",
-                            "overflow-y": "auto",
-                            "max-height": "500px"
-                        }, className="table-responsive")
-                    ], className="p-0")
-                ], className="shadow-sm border-0 h-100")
-            ], xs=12, sm=12, md=12, lg=8, className="mb-4"),
-            
-            # Inactive Machines Table
-            dbc.Col([
-                dbc.Card([
-                    dbc.CardHeader([
-                        html.H5("Inactive Machines List", className="mb-0 text-dark fw-bold")
-                    ], className="bg-light border-bottom"),
-                    dbc.CardBody([
-                        html.Div([
-                            tables["inactive_machines_table"]
-                        ], style={
-                            "overflow-x": "auto",
-                            "overflow-y": "auto",
-                            "max-height": "500px"
-                        }, className="table-responsive")
-                    ], className="p-0")
-                ], className="shadow-sm border-0 h-100")
-            ], xs=12, sm=12, md=12, lg=4, className="mb-4"),
-        ], className="g-3"),
-
         # Shift Summary Table
         dbc.Row([
             dbc.Col([
@@ -1123,7 +958,7 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
                     ], className="bg-light border-bottom"),
                     dbc.CardBody([
                         html.Div([
-                            tables["shift_summary_table"]
+                            html.Div(id="shift-summary-table-container")
                         ], style={
                             "overflow-x": "auto",
                             "overflow-y": "auto",
@@ -1133,24 +968,269 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
                 ], className="shadow-sm border-0")
             ], xs=12, className="mb-4")
         ]),
+    ], fluid=True, className="pt-4")
 
-        # Reason Summary Table
+
+app.layout = dbc.Container([
+    dcc.Interval(id="interval-update", interval=60*1000),  # update every minute
+    # What this browser last received per section, so unchanged ticks send nothing
+    dcc.Store(id="dashboard-marker"),
+    dcc.Store(id="machines-marker"),
+    dcc.Store(id="reasons-marker"),
+    dcc.Store(id="shifts-marker"),
+    dcc.Store(id="rotation-marker"),
+    # Rendered width of the rotation chart, sets how far its series are downsampled
+    dcc.Store(id="rotation-width"),
+    html.Div(id="dashboard-kpis"),
+
+    # Each tab has its own callback; only the selected one is computed and sent
+    dcc.Tabs(id="dashboard-tabs", value="machines", children=[
+        dcc.Tab(label="Machines", value="machines", children=machines_tab()),
+        dcc.Tab(label="Reasons", value="reasons", children=reasons_tab()),
+        dcc.Tab(label="Shifts", value="shifts", children=shifts_tab()),
+        dcc.Tab(label="Rotations", value="rotations", children=dbc.Container([
+            # Rotation Counter Chart, extended in place with dash.Patch
+            dbc.Row([
+                dbc.Col([
+                    dbc.Card([
+                        dbc.CardBody([
+                            html.Div([
+                                dcc.Graph(
+                                    id="rotation-trend",
+                                    figure={},
+                                    style={"height":"400px"},
+                                    config={'responsive': True, 'displayModeBar': False}
+                                )
+                            ], style={"overflow-x": "auto"})
+                        ], className="p-0")
+                    ], className="shadow-sm border-0")
+                ], xs=12, className="mb-4")
+            ]),
+        ], fluid=True, className="pt-4")),
+    ]),
+], fluid=True)
+
+
+def get_viewer_machine_ids(user):
+    if not user or not user.is_authenticated:
+        return []
+    return list(get_user_machines(user).values_list('id', flat=True))
+
+
+def tab_outputs(data, figure_names, table_names, marker, frames_marker):
+    """
+    Outputs of an NPT tab callback: the figures the browser already drew
+    are patched (see patch_figures) and the tables sent whole, followed by
+    the tab's new marker.
+    """
+    figures, drawn = patch_figures(data["figs"], figure_names, (marker or {}).get("drawn", ()))
+    tables = [data["tables"][name] for name in table_names]
+    return (*figures, *tables, {"frames": frames_marker, "drawn": drawn})
+
+
+def build_rotation_figure(rot_df, bucket_seconds):
+    """
+    One WebGL line per machine, in label order so traces can be patched by
+    index. Samples are reduced to min/max per bucket.
+    """
+    fig = go.Figure()
+    rot_df = downsample_min_max(rot_df, 'count_time', 'count', bucket_seconds, by='machine_label')
+    for machine_label, df_mc in rot_df.groupby('machine_label'):
+        fig.add_trace(go.Scattergl(
+            x=df_mc['count_time'],
+            y=df_mc['count'],
+            mode="lines",
+            name=machine_label
+        ))
+    fig.update_layout(
+        title_text="Hourly Rotation Counter Trend",
+        xaxis_title="Hour of Day",
+        yaxis_title="Count",
+        legend_title="Machine"
+    )
+    return fig
+
+# ---------------------
+# Callbacks, one per section
+# ---------------------
+@app.callback(
+    Output("dashboard-kpis", "children"),
+    Output("dashboard-marker", "data"),
+    [Input("interval-update", "n_intervals")],
+    [State("dashboard-marker", "data")]
+)
+def update_kpis(n_intervals, marker, callback_context=None, request=None, user=None):
+    # Per-machine frames are built once per tick by the refresh_dashboard
+    # command and shared; each viewer only slices out their machines
+    frames, machine_ids, npt_df, new_marker = get_viewer_npt(user)
+    if new_marker == marker:
+        return no_update, no_update
+
+    data = generate_overall_metrics(frames, machine_ids, npt_df)
+
+    total_npt = data["total_npt"]
+    total_events = data["total_events"]
+    total_avg_event_all_machine = data["total_avg_event_all_machine"]
+    total_avg_npt_all_machine = data["total_avg_npt_all_machine_formatted"]
+    active_machines = data["active_machines"]
+    inactive_machines = data["inactive_machines"]
+    overall_npt_percent = data["overall_npt_percent"]
+    overall_pt_percent = data["overall_pt_percent"]
+    rolls_produced_total = data["rolls_produced_total"]
+
+    return dbc.Container([
+        # Cards Row 1
         dbc.Row([
             dbc.Col([
-                dbc.Card([
-                    dbc.CardHeader([
-                        html.H5("Reasonwise NPT Summary", className="mb-0 text-dark fw-bold")
-                    ], className="bg-light border-bottom"),
-                    dbc.CardBody([
-                        html.Div([
-                            tables["npt_summary_table"]
-                        ], style={
-                            "overflow-x": "auto",
-                            "overflow-y": "auto",
-                            "max-height": "500px"
-                        }, className="table-responsive")
-                    ], className="p-0")
-                ], className="shadow-sm border-0")
-            ], xs=12, className="mb-4")
-        ])
-    ], fluid=True, className="py-4") 
\ No newline at end of file
+                info_box(f"{format_seconds(total_npt)}", "Total NPT", "bg-info", "fas fa-clock", '')
+            ], xs=12, sm=6, md=3, className="mb-3"),
+            
+            dbc.Col([
+                info_box(str(total_events), "Total Events", "bg-warning", "fas fa-list", '')
+            ], xs=12, sm=6, md=3, className="mb-3"),
+            
+            dbc.Col([
+                info_box(str(active_machines), "Active Machines", "bg-primary", "fas fa-cogs", '')
+            ], xs=12, sm=6, md=3, className="mb-3"),
+            
+            dbc.Col([
+                info_box(str(inactive_machines), "Inactive Machines", "bg-secondary", "fas fa-power-off", '')
+            ], xs=12, sm=6, md=3, className="mb-3"),
+        ], className="g-3 mb-4"),
+        
+        # Cards Row 2
+        dbc.Row([            
+            dbc.Col([
+                info_box(str(total_avg_event_all_machine), "Avg Events for All Machines", "bg-danger", "fas fa-chart-bar", '')
+            ], xs=12, sm=6, md=3, className="mb-3"),
+            dbc.Col([
+                info_box(f"{total_avg_npt_all_machine}", "Avg NPT for All Machines", "bg-danger", "fas fa-tachometer-alt", '')
+            ], xs=12, sm=6, md=3, className="mb-3"),
+            
+            dbc.Col([
+                info_box(f"{overall_npt_percent}%", "Overall NPT %", "bg-info", "fas fa-exclamation-triangle", '')
+            ], xs=12, sm=6, md=3, className="mb-3"),
+            
+            dbc.Col([
+                info_box(f"{rolls_produced_total}", "Rolls Produced", "bg-secondary", "fas fa-industry", '')
+            ], xs=12, sm=6, md=3, className="mb-3"),
+        ], className="g-3 mb-4"),
+    ], fluid=True, className="pt-4"), new_marker
+
+
+@app.callback(
+    *[Output(name.replace("_", "-"), "figure") for name in MACHINE_FIGURES],
+    *[Output(f"{name.replace('_', '-')}-container", "children") for name in MACHINE_TABLES],
+    Output("machines-marker", "data"),
+    [Input("interval-update", "n_intervals"), Input("dashboard-tabs", "value")],
+    [State("machines-marker", "data")]
+)
+def update_machines_tab(n_intervals, tab, marker, callback_context=None, request=None, user=None):
+    if tab != "machines":
+        return (no_update,) * (len(MACHINE_FIGURES) + len(MACHINE_TABLES) + 1)
+    frames, machine_ids, npt_df, new_marker = get_viewer_npt(user)
+    if marker and marker["frames"] == new_marker:
+        return (no_update,) * (len(MACHINE_FIGURES) + len(MACHINE_TABLES) + 1)
+
+    data = generate_machine_tab_data(frames, machine_ids, npt_df)
+    return tab_outputs(data, MACHINE_FIGURES, MACHINE_TABLES, marker, new_marker)
+
+
+@app.callback(
+    *[Output(name.replace("_", "-"), "figure") for name in REASON_FIGURES],
+    *[Output(f"{name.replace('_', '-')}-container", "children") for name in REASON_TABLES],
+    Output("reasons-marker", "data"),
+    [Input("interval-update", "n_intervals"), Input("dashboard-tabs", "value")],
+    [State("reasons-marker", "data")]
+)
+def update_reasons_tab(n_intervals, tab, marker, callback_context=None, request=None, user=None):
+    if tab != "reasons":
+        return (no_update,) * (len(REASON_FIGURES) + len(REASON_TABLES) + 1)
+    _, _, npt_df, new_marker = get_viewer_npt(user)
+    if marker and marker["frames"] == new_marker:
+        return (no_update,) * (len(REASON_FIGURES) + len(REASON_TABLES) + 1)
+
+    data = generate_reason_tab_data(npt_df)
+    return tab_outputs(data, REASON_FIGURES, REASON_TABLES, marker, new_marker)
+
+
+@app.callback(
+    *[Output(name.replace("_", "-"), "figure") for name in SHIFT_FIGURES],
+    *[Output(f"{name.replace('_', '-')}-container", "children") for name in SHIFT_TABLES],
+    Output("shifts-marker", "data"),
+    [Input("interval-update", "n_intervals"), Input("dashboard-tabs", "value")],
+    [State("shifts-marker", "data")]
+)
+def update_shifts_tab(n_intervals, tab, marker, callback_context=None, request=None, user=None):
+    if tab != "shifts":
+        return (no_update,) * (len(SHIFT_FIGURES) + len(SHIFT_TABLES) + 1)
+    frames, _, npt_df, new_marker = get_viewer_npt(user)
+    if marker and marker["frames"] == new_marker:
+        return (no_update,) * (len(SHIFT_FIGURES) + len(SHIFT_TABLES) + 1)
+
+    data = generate_shift_tab_data(frames, npt_df)
+    return tab_outputs(data, SHIFT_FIGURES, SHIFT_TABLES, marker, new_marker)
+
+
+app.clientside_callback(
+    """
+    function(n_intervals) {
+        const graph = document.getElementById("rotation-trend");
+        return graph && graph.clientWidth ? graph.clientWidth : window.innerWidth;
+    }
+    """,
+    Output("rotation-width", "data"),
+    [Input("interval-update", "n_intervals")]
+)
+
+
+@app.callback(
+    Output("rotation-trend", "figure"),
+    Output("rotation-marker", "data"),
+    [Input("interval-update", "n_intervals"), Input("rotation-width", "data"), Input("dashboard-tabs", "value")],
+    [State("rotation-marker", "data")]
+)
+def update_rotation_trend(n_intervals, width, tab, marker, callback_context=None, request=None, user=None):
+    if tab != "rotations":
+        return no_update, no_update
+    machine_ids = get_viewer_machine_ids(user)
+    frames = get_dashboard_frames()
+    _, rot_df = slice_dashboard_frames(frames, machine_ids)
+
+    width = width or ROTATION_CHART_POINTS
+    labels = sorted(rot_df['machine_label'].unique())
+    new_marker = {
+        "date_from": str(frames['date_from']),
+        "labels": labels,
+        "last_time": str(rot_df['count_time'].max()) if not rot_df.empty else None,
+        "rows": len(rot_df),
+        "width": width,
+        # About two points per pixel
+        "bucket_seconds": get_bucket_seconds(frames['date_from'], frames['date_to'], width * 2),
+    }
+    resized = marker is not None and abs(marker["width"] - width) > marker["width"] * 0.1
+    if marker is None or marker["date_from"] != new_marker["date_from"] or marker["labels"] != labels or resized:
+        return build_rotation_figure(rot_df, new_marker["bucket_seconds"]), new_marker
+    if marker.get("rows") == new_marker["rows"] and marker.get("last_time") == new_marker["last_time"]:
+        return no_update, no_update
+
+    # Rows can commit out of order; one landing inside the drawn part of
+    # the chart cannot be appended, so redraw
+    later = rot_df['count_time'] > pd.Timestamp(marker["last_time"]) if marker.get("last_time") else rot_df['count_time'].notna()
+    if len(rot_df) - later.sum() != marker.get("rows"):
+        return build_rotation_figure(rot_df, new_marker["bucket_seconds"]), new_marker
+    new_marker.update(width=marker["width"], bucket_seconds=marker["bucket_seconds"])
+
+    # Same traces as the browser has: only append the points it has not seen,
+    # reduced with the same buckets
+    new_rows = downsample_min_max(
+        rot_df[later], 'count_time', 'count', marker["bucket_seconds"], by='machine_label'
+    )
+    patch = Patch()
+    for i, machine_label in enumerate(labels):
+        rows = new_rows[new_rows['machine_label'] == machine_label]
+        if rows.empty:
+            continue
+        patch['data'][i]['x'].extend(rows['count_time'].tolist())
+        patch['data'][i]['y'].extend(rows['count'].tolist())
+    return patch, new_marker
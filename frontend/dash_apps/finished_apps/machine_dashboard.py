@@ -1,6 +1,6 @@
 # frontend/dash_apps/finished_apps/machine_dashboard.py
-from dash import html, dcc
-from dash.dependencies import Input, Output
+from dash import html, dcc, no_update
+from dash.dependencies import Input, Output, State
 from django_plotly_dash import DjangoDash
 from core.models import ProcessedNPT, RotationStatus, Machine
 from library.models import Shift
@@ -10,6 +10,9 @@ from django.contrib.auth.models import AnonymousUser
 import pandas as pd
 import plotly.express as px
 
+from frontend.utils.function_chart_helper import downsample_min_max
+from frontend.utils.function_dashboard_helper import get_change_marker, patch_figures, update_npt_frame, update_rotation_trend
+
 
 app = DjangoDash("MachineDashboard", serve_locally=True)
 
@@ -75,7 +78,8 @@ def info_table(df, title="", color="bg-info", icon="fas fa-cog", unit=""):
 # ---------------------
 # Generate Data
 # ---------------------
-def generate_dashboard_data(user=None):
+def get_dashboard_querysets(user=None):
+    """The user's machines with their NPT and rotation querysets."""
     # Fetch machines user has access to
     if user is None:
         machines = Machine.objects.none()
@@ -83,62 +87,14 @@ def generate_dashboard_data(user=None):
         machines = get_user_machines(user)
 
     # Fetch NPT and Rotation data filtered by user's machines
-    npt_qs = ProcessedNPT.objects.select_related('machine', 'reason')\
-        .filter(machine__in=machines)
-    rot_qs = RotationStatus.objects.select_related('machine')\
-        .filter(machine__in=machines)
-    shifts = Shift.objects.all()
-
-    # ---------------------
-    # Prepare DataFrames
-    # ---------------------
-    npt_df = pd.DataFrame([{
-        "machine_id": npt.machine.id if npt.machine else None,
-        "machine_label": f"{npt.machine.mc_no}" if npt.machine else "Unknown",
-        "reason": npt.reason.name if npt.reason else "N/A",
-        "off_time": npt.off_time,
-        "on_time": npt.on_time
-    } for npt in npt_qs])
-
-    rot_df = pd.DataFrame([{
-        "machine_id": rot.machine.id if rot.machine else None,
-        "machine_label": f"{rot.machine.mc_no}" if rot.machine else "Unknown",
-        "count": rot.count,
-        "count_time": rot.count_time
-    } for rot in rot_qs])
-
-    # Ensure datetime
-    if not npt_df.empty:
-        npt_df['off_time'] = pd.to_datetime(npt_df['off_time'])
-        npt_df['on_time'] = pd.to_datetime(npt_df['on_time'])
-    if not rot_df.empty:
-        rot_df['count_time'] = pd.to_datetime(rot_df['count_time'])
+    npt_qs = ProcessedNPT.objects.filter(machine__in=machines)
+    rot_qs = RotationStatus.objects.filter(machine__in=machines)
+    return machines, npt_qs, rot_qs
 
-    # ---------------------
-    # Determine shift
-    # ---------------------
-    def get_shift(dt):
-        for s in shifts:
-            start = pd.Timestamp(dt.date().strftime('%Y-%m-%d') + ' ' + s.start_time.strftime('%H:%M:%S'))
-            end = pd.Timestamp(dt.date().strftime('%Y-%m-%d') + ' ' + s.end_time.strftime('%H:%M:%S'))
-            if end < start:
-                end += pd.Timedelta(days=1)
-            if start <= dt <= end:
-                return s.name
-        return "Unknown"
 
-    if not npt_df.empty:
-        npt_df['shift_name'] = npt_df['off_time'].apply(get_shift)
-
-        # NPT duration in hours
-        npt_df['npt_hours'] = npt_df.apply(
-            lambda row: (row['on_time'] - row['off_time']).total_seconds()/3600
-            if row['on_time'] is not pd.NaT else (pd.Timestamp.now() - row['off_time']).total_seconds()/3600,
-            axis=1
-        )
-    else:
-        npt_df['shift_name'] = []
-        npt_df['npt_hours'] = []
+def generate_dashboard_data(npt_df):
+    # NPT duration in hours
+    npt_df['npt_hours'] = npt_df['npt_time'] / 3600
 
     # ---------------------
     # Metrics
@@ -190,13 +146,6 @@ def generate_dashboard_data(user=None):
             'fig_shiftwise_npt', 'fig_machine_perf', 'fig_shiftwise_trend'
         ]}
 
-    if not rot_df.empty:
-        figs['fig_hourly_trend'] = px.line(
-            rot_df, x='count_time', y='count', color='machine_label', title="Hourly Rotation Trend"
-        )
-    else:
-        figs['fig_hourly_trend'] = {}
-
     # ---------------------
     # Tables
     # ---------------------
@@ -246,27 +195,99 @@ def generate_dashboard_data(user=None):
         }
     }
 
+
+def build_rotation_figure(rot_df, bucket_seconds):
+    """Rotation trend with one line per machine, in label order (see update_rotation_trend)."""
+    # Min/max per bucket keeps resets visible at a fraction of the points
+    return px.line(
+        downsample_min_max(rot_df, 'count_time', 'count', bucket_seconds, by='machine_label'),
+        x='count_time', y='count', color='machine_label', title="Hourly Rotation Trend",
+        render_mode='webgl'
+    )
+
+
 # ---------------------
 # Layout & Callback
 # ---------------------
+# NPT figures, each drawn in the graph with the same id in dashes
+NPT_FIGURES = [
+    'fig_npt_by_machine', 'fig_npt_by_reason', 'fig_npt_by_shift',
+    'fig_shiftwise_npt', 'fig_machine_perf', 'fig_shiftwise_trend'
+]
+
+
+def graph(graph_id):
+    return dcc.Graph(id=graph_id.replace("_", "-"), figure={}, style={"height":"400px"})
+
+
 app.layout = dbc.Container([
     dcc.Interval(id="interval-update", interval=60*1000),  # update every minute
-    html.Div(id="dashboard-content")
+    # What this browser last received, so unchanged ticks send nothing and
+    # the rest only the changes
+    dcc.Store(id="dashboard-marker"),
+    # NPT rows behind the charts, so a tick only fetches what changed
+    dcc.Store(id="dashboard-frames"),
+    dbc.Container([
+        # Cards
+        html.Div(id="dashboard-cards"),
+
+        # Charts
+        dbc.Row([
+            dbc.Col(graph("fig_npt_by_machine"), width=6),
+            dbc.Col(graph("fig_npt_by_reason"), width=6)
+        ], className="mb-4"),
+        dbc.Row([
+            dbc.Col(graph("fig_hourly_trend"), width=12)
+        ], className="mb-4"),
+        dbc.Row([
+            dbc.Col(graph("fig_npt_by_shift"), width=6),
+            dbc.Col(graph("fig_shiftwise_npt"), width=6)
+        ], className="mb-4"),
+        dbc.Row([
+            dbc.Col(graph("fig_machine_perf"), width=6),
+            dbc.Col(graph("fig_shiftwise_trend"), width=6)
+        ], className="mb-4"),
+
+        # Tables
+        dbc.Row([
+            dbc.Col(html.Div(id="machine-summary-table"), width=6),
+            dbc.Col(html.Div(id="shift-summary-table"), width=6)
+        ], className="mb-4")
+    ], fluid=True)
 ], fluid=True)
 
 
 @app.callback(
-    Output("dashboard-content", "children"),
-    [Input("interval-update", "n_intervals")]
+    Output("dashboard-cards", "children"),
+    *[Output(name.replace("_", "-"), "figure") for name in NPT_FIGURES],
+    Output("fig-hourly-trend", "figure"),
+    Output("machine-summary-table", "children"),
+    Output("shift-summary-table", "children"),
+    Output("dashboard-marker", "data"),
+    Output("dashboard-frames", "data"),
+    [Input("interval-update", "n_intervals")],
+    [State("dashboard-marker", "data"), State("dashboard-frames", "data")]
 )
 
-def update_dashboard(n_intervals, callback_context=None, request=None, user=None):
+def update_dashboard(n_intervals, marker, stored, callback_context=None, request=None, user=None):
     # If the user isn’t automatically inferred, default to AnonymousUser
     if not user or not user.is_authenticated:
         user = AnonymousUser()
 
-    data = generate_dashboard_data(user=user)
-    figs = data["figs"]
+    # Two aggregate queries decide whether anything has to be fetched
+    machines, npt_qs, rot_qs = get_dashboard_querysets(user)
+    change = get_change_marker(npt_qs, rot_qs)
+    marker = marker or {}
+    if change == marker.get("change"):
+        return (no_update,) * (len(NPT_FIGURES) + 6)
+
+    # Only NPT rows changed since the stored frame and rotations past the
+    # drawn ones are fetched; figures the browser has are patched
+    scope = sorted(machines.values_list('id', flat=True))
+    npt_df, stored = update_npt_frame(npt_qs, stored, scope, list(Shift.objects.all()))
+    data = generate_dashboard_data(npt_df)
+    npt_figures, drawn = patch_figures(data["figs"], NPT_FIGURES, marker.get("drawn", ()))
+    rotation_figure, rotation = update_rotation_trend(rot_qs, marker.get("rotation"), build_rotation_figure)
     tables = data["tables"]
 
     total_npt = data["total_npt"]
@@ -278,37 +299,21 @@ def update_dashboard(n_intervals, callback_context=None, request=None, user=None
     overall_pt_percent = data["overall_pt_percent"]
     rolls_produced_total = data["rolls_produced_total"]
 
-    return dbc.Container([
-        # Cards
-        dbc.Row([
-            dbc.Col(info_box(f"{hours}h {minutes}m", "Total NPT", "bg-info", "fas fa-clock"), width=2),
-            dbc.Col(info_box(total_events, "Total Events", "bg-success", "fas fa-list"), width=2),
-            dbc.Col(info_box(machine_count, "Machines", "bg-primary", "fas fa-cogs"), width=2),
-            dbc.Col(info_box(f"{overall_npt_percent}%", "Overall NPT %", "bg-warning", "fas fa-chart-pie"), width=2),
-            dbc.Col(info_box(f"{overall_pt_percent}%", "Overall PT %", "bg-secondary", "fas fa-percent"), width=2),
-            dbc.Col(info_box(rolls_produced_total, "Rolls Produced", "bg-danger", "fas fa-box"), width=2),
-        ], className="mb-4"),
-
-        # Charts
-        dbc.Row([
-            dbc.Col(dcc.Graph(figure=figs["fig_npt_by_machine"], style={"height":"400px"}), width=6),
-            dbc.Col(dcc.Graph(figure=figs["fig_npt_by_reason"], style={"height":"400px"}), width=6)
-        ], className="mb-4"),
-        dbc.Row([
-            dbc.Col(dcc.Graph(figure=figs["fig_hourly_trend"], style={"height":"400px"}), width=12)
-        ], className="mb-4"),
-        dbc.Row([
-            dbc.Col(dcc.Graph(figure=figs["fig_npt_by_shift"], style={"height":"400px"}), width=6),
-            dbc.Col(dcc.Graph(figure=figs["fig_shiftwise_npt"], style={"height":"400px"}), width=6)
-        ], className="mb-4"),
-        dbc.Row([
-            dbc.Col(dcc.Graph(figure=figs["fig_machine_perf"], style={"height":"400px"}), width=6),
-            dbc.Col(dcc.Graph(figure=figs["fig_shiftwise_trend"], style={"height":"400px"}), width=6)
-        ], className="mb-4"),
-
-        # Tables
-        dbc.Row([
-            dbc.Col(tables["machine_summary_table"], width=6),
-            dbc.Col(tables["shift_summary_table"], width=6)
-        ], className="mb-4")
-    ], fluid=True)
+    cards = dbc.Row([
+        dbc.Col(info_box(f"{hours}h {minutes}m", "Total NPT", "bg-info", "fas fa-clock"), width=2),
+        dbc.Col(info_box(total_events, "Total Events", "bg-success", "fas fa-list"), width=2),
+        dbc.Col(info_box(machine_count, "Machines", "bg-primary", "fas fa-cogs"), width=2),
+        dbc.Col(info_box(f"{overall_npt_percent}%", "Overall NPT %", "bg-warning", "fas fa-chart-pie"), width=2),
+        dbc.Col(info_box(f"{overall_pt_percent}%", "Overall PT %", "bg-secondary", "fas fa-percent"), width=2),
+        dbc.Col(info_box(rolls_produced_total, "Rolls Produced", "bg-danger", "fas fa-box"), width=2),
+    ], className="mb-4")
+
+    return (
+        cards,
+        *npt_figures,
+        rotation_figure,
+        tables["machine_summary_table"],
+        tables["shift_summary_table"],
+        {"change": change, "drawn": drawn, "rotation": rotation},
+        stored,
+    )
@@ -1,3 +1,252 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta
+from types import SimpleNamespace
 
-# Create your tests here.
+import pandas as pd
+import plotly.express as px
+from dash import Patch
+from django.test import SimpleTestCase, TestCase
+
+from core.models import Company, RotationStatus
+from frontend.utils.function_chart_helper import downsample_min_max, process_npt_to_hourly
+from frontend.utils.function_dashboard_helper import (
+    NPT_DATETIME_COLUMNS,
+    assign_shift_names,
+    frame_from_store,
+    frame_to_store,
+    merge_npt_rows,
+    patch_figures,
+)
+from frontend.utils.function_filter import filter_by_shift, get_shift_duration_seconds
+from frontend.utils.function_time import get_uncovered_segments, get_whole_days
+from library.models import Shift, ShiftInstance
+
+
+def at(hour, minute=0, second=0, day=1):
+    """Naive datetime on 2025-01-<day>."""
+    return datetime(2025, 1, day, hour, minute, second)
+
+
+def make_shift(name, start, end):
+    return SimpleNamespace(name=name, start_time=start, end_time=end)
+
+
+class AssignShiftNamesTests(SimpleTestCase):
+    def test_overnight_shift(self):
+        shifts = [
+            make_shift('B', time(14), time(22)),
+            make_shift('A', time(6), time(14)),
+            make_shift('C', time(22), time(6)),
+        ]
+        times = pd.Series(pd.to_datetime([
+            at(5, 59), at(6), at(13, 59, 59), at(14), at(22), at(23, 30), at(0),
+        ]))
+        self.assertEqual(list(assign_shift_names(times, shifts)), ['C', 'A', 'A', 'B', 'C', 'C', 'C'])
+
+    def test_gaps_between_shifts_get_default(self):
+        shifts = [make_shift('A', time(6), time(14)), make_shift('B', time(15), time(20))]
+        times = pd.Series(pd.to_datetime([at(5), at(6), at(14, 30), at(15), at(21)]))
+        self.assertEqual(list(assign_shift_names(times, shifts)), ['Unknown', 'A', 'Unknown', 'B', 'Unknown'])
+        self.assertEqual(list(assign_shift_names(times, shifts, default='-'))[0], '-')
+
+    def test_empty_input_keeps_the_index(self):
+        times = pd.Series(pd.to_datetime([at(8)]), index=[5])
+        names = assign_shift_names(times, [])
+        self.assertEqual(list(names.index), [5])
+        self.assertEqual(list(names), ['Unknown'])
+        self.assertTrue(assign_shift_names(pd.Series([], dtype='datetime64[ns]'), []).empty)
+
+
+class ProcessNptToHourlyTests(SimpleTestCase):
+    def frame(self, *events):
+        return pd.DataFrame({
+            'machine_label': [machine for machine, _, _ in events],
+            'off_time': pd.to_datetime([off_time for _, off_time, _ in events]),
+            'on_time': pd.to_datetime([on_time for _, _, on_time in events]),
+        })
+
+    def seconds(self, hourly, **where):
+        rows = hourly
+        for column, value in where.items():
+            rows = rows[rows[column] == value]
+        return rows['npt_seconds'].sum()
+
+    def test_event_is_split_at_hour_boundaries(self):
+        hourly = process_npt_to_hourly(self.frame(('M1', at(10, 30), at(12, 15))))
+        self.assertEqual(len(hourly), 24)
+        self.assertEqual(self.seconds(hourly, hour=10), 1800)
+        self.assertEqual(self.seconds(hourly, hour=11), 3600)
+        self.assertEqual(self.seconds(hourly, hour=12), 900)
+        self.assertEqual(self.seconds(hourly), 6300)
+
+    def test_event_ending_on_the_hour(self):
+        hourly = process_npt_to_hourly(self.frame(('M1', at(10), at(11)), ('M1', at(12), at(12))))
+        self.assertEqual(self.seconds(hourly, hour=10), 3600)
+        self.assertEqual(self.seconds(hourly, hour=11), 0)
+        self.assertEqual(self.seconds(hourly, hour=12), 0)
+
+    def test_bucket_is_capped_at_one_hour(self):
+        hourly = process_npt_to_hourly(self.frame(('M1', at(10), at(11)), ('M1', at(10), at(10, 30))))
+        self.assertEqual(self.seconds(hourly, machine_label='M1', hour=10), 3600)
+
+    def test_by_date_keeps_days_apart(self):
+        npt_df = self.frame(('M1', at(23, 30), at(0, 45, day=2)), ('M2', at(23), at(23, 10, day=2)))
+        hourly = process_npt_to_hourly(npt_df, by_date=True)
+        self.assertEqual(list(hourly.columns), ['machine_label', 'date', 'hour', 'npt_seconds'])
+        self.assertEqual(len(hourly), 2 * 2 * 24)
+        self.assertEqual(self.seconds(hourly, machine_label='M1', date=date(2025, 1, 1), hour=23), 1800)
+        self.assertEqual(self.seconds(hourly, machine_label='M1', date=date(2025, 1, 2), hour=0), 2700)
+        self.assertEqual(self.seconds(hourly, machine_label='M2', date=date(2025, 1, 2), hour=23), 600)
+
+        # Folded into hours of the day, both 23:00 pieces share one capped bucket
+        folded = process_npt_to_hourly(npt_df)
+        self.assertEqual(self.seconds(folded, machine_label='M2', hour=23), 3600)
+
+    def test_open_downtime_counts_until_now(self):
+        off_time = datetime.now() - timedelta(minutes=90)
+        hourly = process_npt_to_hourly(self.frame(('M1', off_time, None)))
+        self.assertAlmostEqual(self.seconds(hourly), 5400, delta=5)
+
+    def test_empty_input(self):
+        empty = pd.DataFrame(columns=['machine_label', 'off_time', 'on_time'])
+        self.assertTrue(process_npt_to_hourly(empty).empty)
+        self.assertEqual(
+            list(process_npt_to_hourly(empty, by_date=True).columns),
+            ['machine_label', 'date', 'hour', 'npt_seconds'],
+        )
+
+
+class DownsampleMinMaxTests(SimpleTestCase):
+    def frame(self, values, machine='M1'):
+        return pd.DataFrame({
+            'machine_label': machine,
+            'count_time': [at(0) + timedelta(seconds=i) for i in range(len(values))],
+            'count': values,
+        })
+
+    def test_keeps_first_last_min_and_max_of_every_bucket(self):
+        df = self.frame([5, 1, 7, 3, 9, 2, 8, 4, 6, 0])
+        kept = downsample_min_max(df, 'count_time', 'count', 5)
+        self.assertEqual(list(kept['count']), [5, 1, 9, 2, 8, 0])
+
+    def test_counter_reset_stays_visible(self):
+        df = self.frame([100, 101, 102, 0, 1])
+        kept = downsample_min_max(df, 'count_time', 'count', 60)
+        self.assertEqual(list(kept['count']), [100, 102, 0, 1])
+
+    def test_groups_are_downsampled_separately(self):
+        df = pd.concat([self.frame([3, 1, 2, 4], 'M2'), self.frame([3, 1, 2, 4], 'M1')])
+        kept = downsample_min_max(df, 'count_time', 'count', 60, by='machine_label')
+        self.assertEqual(list(kept['machine_label']), ['M1', 'M1', 'M1', 'M2', 'M2', 'M2'])
+        self.assertEqual(list(kept['count']), [3, 1, 4, 3, 1, 4])
+
+    def test_empty_input(self):
+        self.assertTrue(downsample_min_max(self.frame([]), 'count_time', 'count', 5).empty)
+
+
+class WholeDaysTests(SimpleTestCase):
+    def test_only_days_wholly_inside_the_range(self):
+        self.assertEqual(get_whole_days(at(6), at(6, day=4)), [date(2025, 1, 2), date(2025, 1, 3)])
+        self.assertEqual(get_whole_days(at(0), datetime(2025, 1, 2, 23, 59, 59, 999999)), [date(2025, 1, 1), date(2025, 1, 2)])
+        self.assertEqual(get_whole_days(at(0), at(23, 59)), [])
+
+    def test_uncovered_segments_around_covered_days(self):
+        last = timedelta(microseconds=1)
+        covered = {date(2025, 1, 2), date(2025, 1, 4)}
+        self.assertEqual(
+            get_uncovered_segments(at(6), at(6, day=5), covered),
+            [(at(6), at(0, day=2) - last), (at(0, day=3), at(0, day=4) - last), (at(0, day=5), at(6, day=5))],
+        )
+
+    def test_fully_covered_and_uncovered_ranges(self):
+        self.assertEqual(get_uncovered_segments(at(0), at(0, day=2) - timedelta(microseconds=1), {date(2025, 1, 1)}), [])
+        self.assertEqual(get_uncovered_segments(at(6), at(18), set()), [(at(6), at(18))])
+
+
+class FilterByShiftTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        company = Company.objects.create(name='Test Company')
+        cls.day = Shift.all_objects.create(name='A', start_time=time(6), end_time=time(14), company=company)
+        cls.night = Shift.all_objects.create(name='C', start_time=time(22), end_time=time(6), company=company)
+        for count, count_time in enumerate([at(5), at(6), at(13, 59), at(14), at(23), at(5, day=2), at(7, day=2)]):
+            RotationStatus.objects.create(machine=None, count=count, count_time=count_time)
+
+    def times(self, shift, date_from=None, date_to=None):
+        rows = RotationStatus.objects.all()
+        if date_from:
+            rows = rows.filter(count_time__gte=date_from, count_time__lte=date_to)
+        rows = filter_by_shift(rows, shift, 'count_time', date_from, date_to)
+        return sorted(rows.values_list('count_time', flat=True))
+
+    def test_windows_in_range(self):
+        self.assertEqual(self.times(self.day, at(0), at(0, day=3)), [at(6), at(13, 59), at(7, day=2)])
+        self.assertEqual(self.times(self.night, at(0), at(0, day=3)), [at(5), at(23), at(5, day=2)])
+
+    def test_overnight_window_of_the_day_before(self):
+        self.assertEqual(self.times(self.night, at(0, day=2), at(12, day=2)), [at(5, day=2)])
+
+    def test_calendar_instances_are_used(self):
+        # An instance generated with other times wins over the shift's times
+        ShiftInstance.objects.create(shift=self.day, date=date(2025, 1, 1), start_dt=at(5), end_dt=at(6))
+        self.assertEqual(self.times(self.day, at(0), at(0, day=3)), [at(5), at(7, day=2)])
+
+    def test_time_of_day_without_range(self):
+        self.assertEqual(self.times(self.day), [at(6), at(13, 59), at(7, day=2)])
+        self.assertEqual(self.times(self.night), [at(5), at(23), at(5, day=2)])
+
+    def test_shift_ending_at_its_start_has_no_duration(self):
+        self.assertEqual(get_shift_duration_seconds(make_shift('X', time(6), time(6))), 0)
+        self.assertEqual(get_shift_duration_seconds(self.night), 8 * 3600)
+
+
+class StoredNptFrameTests(SimpleTestCase):
+    def frame(self, *rows):
+        return pd.DataFrame({
+            'id': [row[0] for row in rows],
+            'machine_id': 1,
+            'off_time': pd.to_datetime([row[1] for row in rows]),
+            'on_time': pd.to_datetime([row[2] for row in rows]),
+            'updated_at': pd.to_datetime([row[1] for row in rows]),
+            'npt_time': [row[3] for row in rows],
+        })
+
+    def test_store_round_trip_keeps_microseconds_and_open_rows(self):
+        npt_df = self.frame((1, datetime(2025, 1, 1, 6, 0, 0, 123456), at(7), 3600.0), (2, at(8), None, 0.0))
+        stored = frame_from_store(frame_to_store(npt_df), NPT_DATETIME_COLUMNS)
+        self.assertEqual(stored['off_time'][0], datetime(2025, 1, 1, 6, 0, 0, 123456))
+        self.assertTrue(pd.isna(stored['on_time'][1]))
+        self.assertEqual(list(stored['id']), [1, 2])
+
+    def test_changed_rows_replace_their_old_copy(self):
+        npt_df = self.frame((1, at(6), at(7), 3600.0), (2, at(8), None, 0.0))
+        merged = merge_npt_rows(npt_df, self.frame((2, at(8), at(8, 30), 1800.0), (3, at(9), at(9, 6), 360.0)))
+        self.assertEqual(list(merged['id']), [1, 2, 3])
+        self.assertEqual(list(merged['npt_time']), [3600.0, 1800.0, 360.0])
+
+    def test_open_rows_are_timed_until_now(self):
+        off_time = datetime.now() - timedelta(minutes=30)
+        merged = merge_npt_rows(self.frame((1, off_time, None, 0.0)), self.frame((2, at(6), at(7), 3600.0)).iloc[:0])
+        self.assertAlmostEqual(merged['npt_time'][0], 1800, delta=5)
+
+
+class PatchFiguresTests(SimpleTestCase):
+    def setUp(self):
+        self.figs = {
+            'bars': px.bar(pd.DataFrame({'x': ['M1'], 'y': [1]}), x='x', y='y', title='Bars'),
+            'empty': {},
+        }
+
+    def test_figures_not_drawn_yet_are_sent_whole(self):
+        updates, drawn = patch_figures(self.figs, ['bars', 'empty'])
+        self.assertIn('template', updates[0]['layout'])
+        self.assertEqual(updates[1], {})
+        self.assertEqual(drawn, ['bars'])
+
+    def test_drawn_figures_are_patched_without_their_template(self):
+        updates, drawn = patch_figures(self.figs, ['bars'], drawn=['bars'])
+        self.assertIsInstance(updates[0], Patch)
+        locations = [operation['location'] for operation in updates[0].to_plotly_json()['operations']]
+        self.assertIn(['data'], locations)
+        self.assertIn(['layout', 'title'], locations)
+        self.assertNotIn(['layout', 'template'], locations)
+        self.assertEqual(drawn, ['bars'])
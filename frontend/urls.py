@@ -6,6 +6,8 @@ urlpatterns = [
     
     ### Mclogs
     path('mclogs/', views.mclogs, name='view_mclog'),
+    path('api/mclogs/events/', views.mclogs_events_api, name='mclogs_events_api'),
+    path('mclogs/export/', views.export_npt_logs, name='export_npt_logs'),
 
     ### Mcgraph
     path('mcgraph/', views.mcgraph, name='view_mcgraph'),
@@ -13,17 +15,24 @@ urlpatterns = [
 
     ### Rotation Counter
     path('rotation_counter/', views.rotaionCounter, name='view_rotationcounter'),
-    # path('download-rotation-excel/', views.download_rotation_excel, name='download_rotation_excel'),
+    path('api/rotation_counter/events/', views.rotation_counter_events_api, name='rotationcounter_events_api'),
+    path('rotation_counter/export/', views.export_rotation_logs, name='export_rotation_logs'),
+    path('download-rotation-excel/', views.download_rotation_excel, name='download_rotation_excel'),
 
     ### Report Daily-Performance
     path('daily_performance/', views.daily_performance, name='view_dailyperformance'),
     # path('api/daily_performance/', views.daily_performance_api, name='dailyperformance_api'),
+    path('api/daily_performance/charts/', views.daily_performance_charts, name='dailyperformance_charts'),
 
     ### Report Overll-Performance
     path('overall_performance/', views.overall_performance, name='view_overallperformance'),
 
     ### Rotation Report
     path('rotation_report/', views.rotation_report, name='view_rotationreport'),
+    path('rotation_report/export/', views.export_rotation_report, name='export_rotation_report'),
+
+    ### Columnar export for analytics clients
+    path('api/analytics/<str:source>/', views.analytics_export, name='analytics_export'),
 
     ### Report Machine-Analysis
     # path('overall_performance/', views.overall_performance, name='view_overallperformance'),
@@ -1,6 +1,8 @@
+import json
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
+from plotly.utils import PlotlyJSONEncoder
 from datetime import datetime, time
 
 
@@ -13,72 +15,212 @@ def get_reason_color_map(NptReason):
 
 
 
+# Points per rotation trace when the chart width is not known
+ROTATION_CHART_POINTS = 1000
+
+
+def get_bucket_seconds(start, end, points=ROTATION_CHART_POINTS):
+    """Bucket width that leaves about `points` points per series over start..end (4 per bucket)."""
+    return max(1, int((end - start).total_seconds() * 4 // max(points, 4)))
+
+
+def downsample_min_max(df: pd.DataFrame, x: str, y: str, bucket_seconds: int, by: str = None) -> pd.DataFrame:
+    """
+    Reduces a time series to the first, last, min and max point of every
+    `bucket_seconds` bucket of `x`, separately for each `by` group.
+
+    Unlike averaging this keeps counter resets and stalls visible, while a
+    chart gets a few points per pixel instead of every sample.
+    """
+    if df.empty:
+        return df
+
+    df = df.sort_values([by, x] if by else x, ignore_index=True)
+    bucket = pd.Series(df[x].to_numpy(dtype='datetime64[s]').astype(np.int64) // bucket_seconds, index=df.index)
+    grouped = df[y].groupby([df[by], bucket] if by else bucket, sort=False)
+
+    keep = np.zeros(len(df), dtype=bool)
+    for picked in (grouped.idxmin(), grouped.idxmax(), grouped.head(1).index, grouped.tail(1).index):
+        keep[np.asarray(picked)] = True
+    return df[keep]
+
+
 # Helper Function to Process NPT into Hourly Buckets
-def process_npt_to_hourly(npt_df: pd.DataFrame) -> pd.DataFrame:
+def process_npt_to_hourly(npt_df: pd.DataFrame, by_date: bool = False) -> pd.DataFrame:
     """
     Processes raw NPT data to calculate total NPT for each hour of the day.
 
-    This function distributes NPT durations across hour boundaries and caps
-    the total NPT for any given hour at 3600 seconds (1 hour).
+    Every event is split at hour boundaries with array arithmetic and the
+    pieces are summed into buckets with np.add.at, so long downtimes cost
+    no more than short ones. The total NPT of a bucket is capped at 3600
+    seconds (1 hour).
 
     Args:
         npt_df: DataFrame containing NPT events with 'machine_label',
                 'off_time', and 'on_time'.
+        by_date: Keep one bucket per date and hour instead of folding all
+                 days into 24 hours of the day.
 
     Returns:
-        A DataFrame with columns ['machine_label', 'hour', 'npt_seconds'].
+        A DataFrame with columns ['machine_label', 'hour', 'npt_seconds'],
+        plus 'date' before 'hour' when by_date is set.
     """
+    columns = ['machine_label', 'date', 'hour', 'npt_seconds'] if by_date else ['machine_label', 'hour', 'npt_seconds']
     if npt_df.empty:
-        return pd.DataFrame(columns=['machine_label', 'hour', 'npt_seconds'])
+        return pd.DataFrame(columns=columns)
 
-    # Use a timezone-aware 'now' for ongoing NPT events to prevent errors
-    if npt_df['off_time'].dt.tz is not None:
-        now = pd.Timestamp.now(tz=npt_df['off_time'].dt.tz)
+    off_time = npt_df['off_time']
+    on_time = npt_df['on_time']
+    # Bucket by wall-clock hours; ongoing NPT events count until now
+    if off_time.dt.tz is not None:
+        on_time = on_time.fillna(pd.Timestamp.now(tz=off_time.dt.tz))
+        off_time = off_time.dt.tz_localize(None)
+        on_time = on_time.dt.tz_localize(None)
     else:
-        # Fallback for timezone-naive datetimes
-        now = pd.Timestamp.now()
-        
-    npt_df['on_time'] = npt_df['on_time'].fillna(now)
-
-    # Initialize a dictionary to hold hourly NPT data for each machine
-    unique_machines = npt_df['machine_label'].unique()
-    hourly_npt_data = {mc: np.zeros(24) for mc in unique_machines}
-
-    # Iterate over each NPT event to distribute its duration
-    for _, row in npt_df.iterrows():
-        machine = row['machine_label']
-        start_time = row['off_time']
-        end_time = row['on_time']
-        
-        current_time = start_time
-        while current_time < end_time:
-            hour_index = current_time.hour
-            
-            # Find the end of the current hour, which is the start of the next one
-            end_of_hour = (current_time + pd.Timedelta(hours=1)).replace(
-                minute=0, second=0, microsecond=0
+        on_time = on_time.fillna(pd.Timestamp.now())
+
+    machine_idx, machines = pd.factorize(npt_df['machine_label'])
+    start = off_time.to_numpy(dtype='datetime64[s]').astype(np.int64)
+    end = on_time.to_numpy(dtype='datetime64[s]').astype(np.int64)
+    valid = end > start
+    machine_idx, start, end = machine_idx[valid], start[valid], end[valid]
+
+    # One piece per hour an event touches, in absolute hours since the epoch
+    first_hour = start // 3600
+    n_hours = (end - 1) // 3600 - first_hour + 1
+    event = np.repeat(np.arange(len(start)), n_hours)
+    offset = np.arange(n_hours.sum()) - np.repeat(np.cumsum(n_hours) - n_hours, n_hours)
+    hour = first_hour[event] + offset
+    seconds = np.minimum(end[event], (hour + 1) * 3600) - np.maximum(start[event], hour * 3600)
+
+    if by_date:
+        first_day = hour.min() // 24 if len(hour) else 0
+        n_days = hour.max() // 24 - first_day + 1 if len(hour) else 0
+        buckets = np.zeros((len(machines), n_days, 24))
+        np.add.at(buckets, (machine_idx[event], hour // 24 - first_day, hour % 24), seconds)
+        dates = pd.to_datetime((first_day + np.arange(n_days)) * 86400, unit='s').date
+        index = pd.MultiIndex.from_product([machines, dates, range(24)], names=columns[:-1])
+    else:
+        buckets = np.zeros((len(machines), 24))
+        np.add.at(buckets, (machine_idx[event], hour % 24), seconds)
+        index = pd.MultiIndex.from_product([machines, range(24)], names=columns[:-1])
+
+    # Cap NPT at 1 hour
+    return pd.DataFrame({'npt_seconds': np.minimum(buckets.ravel(), 3600)}, index=index).reset_index()
+
+
+# Daily performance charts, serialised once per report and fetched by the page
+DAILY_PERFORMANCE_CHART_CONFIG = {
+    'displayModeBar': True,
+    'modeBarButtonsToRemove': ['pan2d', 'lasso2d', 'select2d', 'autoScale2d', 'resetScale2d', 'zoomIn2d', 'zoomOut2d'],
+    'responsive': True
+}
+
+
+def build_daily_performance_charts(report):
+    """
+    JSON payload of the daily performance charts, built from the cached
+    report. The bar and pie charts are full figures; the donut grid is sent
+    as compact machine x reason arrays and laid out by the page.
+
+    Returns:
+        str, JSON with 'bar_chart', 'pie_chart' and 'donut_grid' (each
+        null when there is no data) and 'config'
+    """
+    machines_list = report['machines']
+    reason_durations = {reason['name']: reason['total_duration'] for reason in report['reasons']}
+    charts = {'bar_chart': None, 'pie_chart': None, 'donut_grid': None, 'config': DAILY_PERFORMANCE_CHART_CONFIG}
+
+    # 1. BAR CHART - Machine-wise NPT
+    if machines_list:
+        machine_names = [machine['name'] for machine in machines_list]
+        machine_npt_values = [machine['total_npt'] for machine in machines_list]
+
+        bar_chart = go.Figure(data=[
+            go.Bar(
+                x=machine_names,
+                y=machine_npt_values,
+                text=[f"{val:.1f} min" for val in machine_npt_values],
+                textposition='auto',
+                marker_color='rgba(55, 128, 191, 0.7)',
+                marker_line_color='rgba(55, 128, 191, 1.0)',
+                marker_line_width=2
             )
-            
-            # The NPT chunk for this hour ends at either the event's actual
-            # end time or the end of the hour, whichever comes first.
-            chunk_end_time = min(end_time, end_of_hour)
-            
-            duration_seconds = (chunk_end_time - current_time).total_seconds()
-            
-            # Add the calculated duration to the correct hourly bucket
-            hourly_npt_data[machine][hour_index] += duration_seconds
-            
-            # Move the time cursor forward
-            current_time = chunk_end_time
-            
-    # Convert the dictionary into a long-format DataFrame for easy plotting
-    processed_data = []
-    for machine, hourly_values in hourly_npt_data.items():
-        for hour, npt_seconds in enumerate(hourly_values):
-            processed_data.append({
-                'machine_label': machine,
-                'hour': hour,
-                'npt_seconds': min(npt_seconds, 3600)  # Cap NPT at 1 hour
-            })
-            
-    return pd.DataFrame(processed_data)
+        ])
+
+        bar_chart.update_layout(
+            title={
+                'text': 'Machine-wise NPT (Non-Productive Time)',
+                'x': 0.5,
+                'xanchor': 'center'
+            },
+            yaxis_title='NPT (Minutes)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(size=12),
+            height=350,
+            bargap=0.4  # Make bars thinner by increasing gap
+        )
+        charts['bar_chart'] = bar_chart.to_plotly_json()
+
+    # 2. PIE CHART - Reason-wise NPT (All Machines Combined)
+    if reason_durations:
+        # Calculate total NPT and percentages for each reason
+        total_npt_time = sum(reason_durations.values())
+        reason_names = list(reason_durations.keys())
+        reason_values = list(reason_durations.values())
+        reason_percentages = [(val/total_npt_time)*100 if total_npt_time else 0 for val in reason_values]
+
+        # Create custom labels with NPT time and percentage for legend
+        legend_labels = [
+            f"{name} ({val:.1f} min, {pct:.1f}%)"
+            for name, val, pct in zip(reason_names, reason_values, reason_percentages)
+        ]
+
+        pie_chart = go.Figure(data=[
+            go.Pie(
+                labels=legend_labels,  # Use custom labels with time and percentage for legend
+                values=reason_values,
+                text=reason_names,  # Simple reason names for arc labels
+                textinfo='text+percent',  # Show only text and percent on arcs
+                textposition='inside',
+                textfont=dict(color="#F7F7F7", size=11),  # White text for all arc labels
+                hovertemplate='<b>%{label}</b><br>NPT: %{value:.1f} min<br>Percentage: %{percent}<extra></extra>',
+                marker=dict(line=dict(color='#000000', width=1))
+            )
+        ])
+
+        pie_chart.update_layout(
+            title={
+                'text': 'NPT Distribution by Reason (All Machines)',
+                'x': 0.5,
+                'xanchor': 'center'
+            },
+            font=dict(size=11),
+            height=400,
+            showlegend=True,
+            legend=dict(
+                orientation="v",
+                yanchor="middle",
+                y=0.5,
+                xanchor="left",
+                x=1.02,
+                font=dict(size=10)
+            )
+        )
+        charts['pie_chart'] = pie_chart.to_plotly_json()
+
+    # 3. DONUT CHARTS - one row of minutes per machine, one column per reason
+    machines_with_data = [m for m in machines_list if m['reasons']]
+    if machines_with_data:
+        reason_names = sorted({name for machine in machines_with_data for name in machine['reasons']})
+        charts['donut_grid'] = {
+            'machines': [machine['name'] for machine in machines_with_data],
+            'reasons': reason_names,
+            'minutes': [
+                [round(machine['reasons'].get(name, 0), 2) for name in reason_names]
+                for machine in machines_with_data
+            ],
+        }
+
+    return json.dumps(charts, cls=PlotlyJSONEncoder)
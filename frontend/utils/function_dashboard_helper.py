@@ -0,0 +1,467 @@
+import logging
+from datetime import datetime, timedelta
+from io import StringIO
+import numpy as np
+import pandas as pd
+from dash import Patch, no_update
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+from django.http import HttpRequest
+from core.models import ProcessedNPT, RotationStatus, Machine, MachineCurrentState
+from library.models import Shift
+from frontend.utils.function_chart_helper import downsample_min_max, get_bucket_seconds
+from frontend.utils.function_filter import skip_null_on_time_except_last, get_shift_duration_seconds
+from frontend.utils.function_time import get_datetime_range
+
+LOG = logging.getLogger(__name__)
+
+DASHBOARD_FRAMES_KEY = "dashboard_v3:frames:v2"
+# Matches the dcc.Interval of the dashboard
+DASHBOARD_REFRESH_SECONDS = 60
+# Rows commit out of order (parallel ingest workers, updated_at stamped
+# before process_npt commits), so every delta re-reads this far back
+DELTA_LOOKBACK = timedelta(minutes=10)
+
+NPT_COLUMNS = ["id", "machine_id", "machine_label", "reason", "off_time", "on_time", "updated_at"]
+NPT_DATETIME_COLUMNS = ["off_time", "on_time", "updated_at"]
+ROT_COLUMNS = ["id", "machine_id", "machine_label", "count", "count_time"]
+
+
+def assign_shift_names(times, shifts, default="Unknown"):
+    """
+    Shift name for every timestamp of a datetime Series, by time of day.
+
+    Shift start times are sorted once and each timestamp is placed with a
+    single searchsorted; times in a gap between shifts get `default`.
+    """
+    if times.empty or not shifts:
+        return pd.Series(default, index=times.index, dtype=object)
+
+    shifts = sorted(shifts, key=lambda s: s.start_time)
+    starts = np.array([s.start_time.hour * 3600 + s.start_time.minute * 60 + s.start_time.second for s in shifts])
+    ends = np.array([s.end_time.hour * 3600 + s.end_time.minute * 60 + s.end_time.second for s in shifts])
+    names = np.array([s.name for s in shifts] + [default], dtype=object)
+
+    seconds = (times - times.dt.normalize()).dt.total_seconds().to_numpy()
+    # Times before the first start can only belong to an overnight last shift
+    idx = np.searchsorted(starts, seconds, side='right') - 1
+    idx[idx < 0] = len(shifts) - 1
+
+    start, end = starts[idx], ends[idx]
+    inside = np.where(
+        end > start,
+        (seconds >= start) & (seconds < end),
+        (seconds >= start) | (seconds < end)
+    )
+    idx[~inside] = len(shifts)
+    return pd.Series(names[idx], index=times.index)
+
+
+def load_npt_frame(npt_qs, shifts):
+    """
+    ProcessedNPT rows as a DataFrame, fetched column-wise without model
+    instances, with 'shift_name' and 'npt_time' (seconds) added.
+    Ongoing downtimes count until now.
+    """
+    npt_df = pd.DataFrame.from_records(
+        npt_qs.values_list('id', 'machine_id', 'machine__mc_no', 'reason__name', 'off_time', 'on_time', 'updated_at'),
+        columns=NPT_COLUMNS
+    )
+    npt_df['machine_label'] = npt_df['machine_label'].fillna("Unknown").astype(str)
+    npt_df['reason'] = npt_df['reason'].fillna("N/A")
+    npt_df['off_time'] = pd.to_datetime(npt_df['off_time'])
+    npt_df['on_time'] = pd.to_datetime(npt_df['on_time'])
+    npt_df['updated_at'] = pd.to_datetime(npt_df['updated_at'])
+    npt_df['shift_name'] = assign_shift_names(npt_df['off_time'], shifts)
+    npt_df['npt_time'] = (npt_df['on_time'].fillna(pd.Timestamp.now()) - npt_df['off_time']).dt.total_seconds()
+    return npt_df
+
+
+def load_rotation_frame(rot_qs):
+    """RotationStatus rows as a DataFrame, fetched column-wise."""
+    rot_df = pd.DataFrame.from_records(
+        rot_qs.values_list('id', 'machine_id', 'machine__mc_no', 'count', 'count_time'),
+        columns=ROT_COLUMNS
+    )
+    rot_df['machine_label'] = rot_df['machine_label'].fillna("Unknown").astype(str)
+    rot_df['count_time'] = pd.to_datetime(rot_df['count_time'])
+    return rot_df
+
+
+def build_dashboard_frames(date_from, date_to):
+    """
+    Dashboard base data for every machine, computed once per refresh and
+    shared by all viewers. Callbacks only slice it to their machines.
+
+    Returns:
+        dict with the range, 'npt_df' and 'rot_df' DataFrames, 'machines'
+        (id -> mc_no), 'last_on_times' (id -> datetime) and
+        'shift_durations' (shift name -> seconds)
+    """
+    rot_qs = RotationStatus.objects.filter(
+        machine__isnull=False,
+        count_time__gte=date_from,
+        count_time__lte=date_to
+    )
+
+    npt_qs = ProcessedNPT.objects.filter(
+        machine__isnull=False,
+        off_time__gte=date_from,
+        off_time__lte=date_to
+    )
+    # removing null values
+    npt_qs = skip_null_on_time_except_last(npt_qs)
+
+    shifts = list(Shift.objects.all())
+    npt_df = load_npt_frame(npt_qs, shifts)
+    rot_df = load_rotation_frame(rot_qs)
+
+    frames = {
+        "date_from": date_from,
+        "date_to": date_to,
+        "npt_df": npt_df,
+        "rot_df": rot_df,
+        "shift_durations": {shift.name: get_shift_duration_seconds(shift) for shift in shifts},
+    }
+    return set_frames_meta(frames)
+
+
+def update_dashboard_frames(frames, date_to):
+    """
+    Merge the rows added or changed since `frames` was built, instead of
+    fetching the whole range again. The range start must be unchanged.
+
+    Rows within DELTA_LOOKBACK of the cursors are read again and
+    de-duplicated by id, so rows that committed after a later one was
+    already read are still picked up.
+    """
+    new_rot = RotationStatus.objects.filter(
+        machine__isnull=False,
+        count_time__gte=frames["date_from"],
+        count_time__lte=date_to
+    )
+    if frames["rotation_cursor"] is not None:
+        new_rot = new_rot.filter(count_time__gte=frames["rotation_cursor"] - DELTA_LOOKBACK)
+    new_rot = load_rotation_frame(new_rot)
+    new_rot = new_rot[~new_rot['id'].isin(frames["rot_df"]['id'])]
+
+    changed_npt = ProcessedNPT.objects.filter(
+        machine__isnull=False,
+        off_time__gte=frames["date_from"],
+        off_time__lte=date_to
+    )
+    if frames["npt_cursor"] is not None:
+        changed_npt = changed_npt.filter(updated_at__gte=frames["npt_cursor"] - DELTA_LOOKBACK)
+    changed_npt = load_npt_frame(changed_npt, list(Shift.objects.all()))
+    npt_df = drop_superseded_open_rows(merge_npt_rows(frames["npt_df"], changed_npt))
+
+    frames = {
+        **frames,
+        "date_to": date_to,
+        "npt_df": npt_df.reset_index(drop=True),
+        "rot_df": pd.concat([frames["rot_df"], new_rot], ignore_index=True).sort_values('count_time', ignore_index=True),
+    }
+    LOG.debug("Merged dashboard deltas: npt=%d rotations=%d", len(changed_npt), len(new_rot))
+    return set_frames_meta(frames)
+
+
+def merge_npt_rows(npt_df, changed_npt):
+    """
+    `npt_df` with the rows of `changed_npt` replacing their older copies
+    (matched by id) or added, ordered by off_time. Ongoing downtimes are
+    re-timed until now.
+    """
+    npt_df = pd.concat([npt_df[~npt_df['id'].isin(changed_npt['id'])], changed_npt], ignore_index=True)
+    # Ongoing downtimes keep growing between changes
+    is_open = npt_df['on_time'].isna()
+    npt_df.loc[is_open, 'npt_time'] = (pd.Timestamp.now() - npt_df.loc[is_open, 'off_time']).dt.total_seconds()
+    return npt_df.sort_values('off_time', ignore_index=True)
+
+
+def drop_superseded_open_rows(npt_df):
+    """
+    Same rule as skip_null_on_time_except_last, on a frame: an open
+    downtime is kept only while it is its machine's latest one.
+    """
+    latest = npt_df.groupby('machine_id')['off_time'].transform('max')
+    return npt_df[npt_df['on_time'].notna() | (npt_df['off_time'] == latest)]
+
+
+def get_last_activity(machine_ids):
+    """
+    Last time each machine was switched on, as {machine_id: datetime}.
+
+    A running machine was last switched on at its current state's
+    status_since; for the rest, one grouped query finds the most recent
+    on_time. Machines that never ran are missing from the result.
+    """
+    last_on_times = dict(
+        MachineCurrentState.objects.filter(machine_id__in=machine_ids, status='on', status_since__isnull=False)
+        .values_list('machine_id', 'status_since')
+    )
+    fallback_ids = [machine_id for machine_id in machine_ids if machine_id not in last_on_times]
+    if fallback_ids:
+        last_on_times.update(
+            ProcessedNPT.objects.filter(machine_id__in=fallback_ids, on_time__isnull=False)
+            .values('machine_id')
+            .annotate(last_on=Max('on_time'))
+            .values_list('machine_id', 'last_on')
+        )
+    return last_on_times
+
+
+def format_time_since(times, now=None):
+    """'1d 2h 3m ago' style text for a datetime Series; NaT reads 'No recorded activity'."""
+    delta = (now or pd.Timestamp.now()) - pd.to_datetime(times)
+    days = delta.dt.days.fillna(0).astype(int).astype(str)
+    hours = (delta.dt.seconds // 3600).fillna(0).astype(int).astype(str)
+    minutes = (delta.dt.seconds % 3600 // 60).fillna(0).astype(int).astype(str)
+    text = np.select(
+        [delta.isna(), delta.dt.days > 0, delta.dt.seconds >= 3600],
+        ["No recorded activity", days + "d " + hours + "h " + minutes + "m ago", hours + "h " + minutes + "m ago"],
+        default=minutes + "m ago"
+    )
+    return pd.Series(text, index=times.index)
+
+
+def get_inactive_machines_frame(machines, inactive_ids, last_on_times):
+    """
+    Rows of the inactive machines table.
+
+    Args:
+        machines: {machine_id: mc_no}
+        inactive_ids: ids of the machines to list
+        last_on_times: {machine_id: datetime}, see get_last_activity
+    """
+    inactive_df = pd.DataFrame(
+        [(str(mc_no), last_on_times.get(machine_id)) for machine_id, mc_no in machines.items() if machine_id in inactive_ids],
+        columns=['machines', 'last_on']
+    )
+    if inactive_df.empty:
+        return pd.DataFrame()
+
+    last_on = pd.to_datetime(inactive_df['last_on'])
+    inactive_df['last_on_time'] = last_on.dt.strftime('%Y-%m-%d %H:%M:%S').fillna('Never')
+    inactive_df['last_activity'] = format_time_since(last_on)
+    return inactive_df[['machines', 'last_on_time', 'last_activity']]
+
+
+def set_frames_meta(frames):
+    """Machine labels, last on-times and delta cursors of the frames."""
+    machines = dict(Machine.objects.values_list('id', 'mc_no'))
+
+    npt_df, rot_df = frames["npt_df"], frames["rot_df"]
+    frames["machines"] = machines
+    frames["last_on_times"] = get_last_activity(list(machines))
+    frames["rotation_cursor"] = rot_df['count_time'].max() if not rot_df.empty else None
+    frames["npt_cursor"] = npt_df['updated_at'].max() if npt_df['updated_at'].notna().any() else None
+    frames["built_at"] = datetime.now()
+    return frames
+
+
+def refresh_dashboard_frames(timeout=DASHBOARD_REFRESH_SECONDS):
+    """Rebuild the shared frames for the default dashboard range and cache them."""
+    # The dashboard has no range inputs, so every viewer gets the default one
+    date_from, date_to, _, _ = get_datetime_range(HttpRequest())
+    frames = cache.get(DASHBOARD_FRAMES_KEY)
+    if frames is not None and frames["date_from"] == date_from:
+        frames = update_dashboard_frames(frames, date_to)
+    else:
+        frames = build_dashboard_frames(date_from, date_to)
+    cache.set(DASHBOARD_FRAMES_KEY, frames, timeout)
+    return frames
+
+
+def get_dashboard_frames():
+    """Shared frames from the cache, built inline when the refresher is not running."""
+    frames = cache.get(DASHBOARD_FRAMES_KEY)
+    if frames is None:
+        LOG.debug("Dashboard frames missing from cache, building inline")
+        frames = refresh_dashboard_frames()
+    return frames
+
+
+def slice_dashboard_frames(frames, machine_ids):
+    """Rows of the shared frames that belong to the given machines."""
+    machine_ids = set(machine_ids)
+    npt_df = frames["npt_df"]
+    rot_df = frames["rot_df"]
+    return (
+        npt_df[npt_df['machine_id'].isin(machine_ids)].reset_index(drop=True),
+        rot_df[rot_df['machine_id'].isin(machine_ids)].reset_index(drop=True),
+    )
+
+
+def get_frames_marker(frames, machine_ids, npt_df):
+    """
+    JSON-able marker of the NPT content a viewer's slice shows, so the
+    callback can skip ticks where it did not change. Ongoing downtimes and
+    inactive machines show time-relative values, so while there are any
+    the refresh time is part of it.
+    """
+    time_relative = npt_df['on_time'].isna().any() or bool(set(machine_ids) - set(npt_df['machine_id']))
+    return [
+        str(frames["date_from"]),
+        sorted(machine_ids),
+        len(npt_df),
+        str(npt_df['updated_at'].max()),
+        str(frames["built_at"]) if time_relative else None,
+    ]
+
+
+def get_change_marker(npt_qs, rot_qs, machines=None):
+    """
+    JSON-able marker of the rows behind a dashboard from two aggregate
+    queries. It changes when a rotation is added or a downtime is added or
+    updated. While a downtime is open, or one of `machines` has none (shown
+    as "... ago"), the current minute is part of it.
+    """
+    npt = npt_qs.aggregate(
+        rows=Count('id'),
+        machines=Count('machine_id', distinct=True),
+        last_update=Max('updated_at'),
+        open=Count('id', filter=Q(on_time__isnull=True)),
+    )
+    last_rotation = rot_qs.aggregate(last_id=Max('id'))['last_id']
+    time_relative = npt['open'] or (machines is not None and npt['machines'] < machines.count())
+    return [
+        npt['rows'],
+        str(npt['last_update']),
+        last_rotation,
+        datetime.now().strftime('%Y-%m-%d %H:%M') if time_relative else None,
+    ]
+
+
+def frame_to_store(df):
+    """DataFrame as JSON for a dcc.Store, keeping the microseconds of datetimes."""
+    return df.to_json(orient='split', index=False, date_format='iso', date_unit='us')
+
+
+def frame_from_store(data, datetime_columns=()):
+    """DataFrame back from frame_to_store, with `datetime_columns` parsed again."""
+    df = pd.read_json(StringIO(data), orient='split', dtype=False, convert_dates=False)
+    for column in datetime_columns:
+        df[column] = pd.to_datetime(df[column])
+    return df
+
+
+def update_npt_frame(npt_qs, stored, scope, shifts, latest_open_only=False):
+    """
+    NPT frame of a dashboard whose browser keeps it in a dcc.Store between
+    ticks. Only the rows of `npt_qs` updated since the stored cursor (less
+    DELTA_LOOKBACK) are fetched and merged by id. An empty store or another
+    `scope` (JSON-able range and machines of the frame) loads everything.
+
+    Args:
+        stored: Data of the store, as returned by the previous call
+        latest_open_only: Drop open downtimes that are not their machine's
+            latest, like skip_null_on_time_except_last
+
+    Returns:
+        Tuple (npt_df, data for the store)
+    """
+    if stored and stored["scope"] == scope:
+        changed_npt = npt_qs
+        if stored["cursor"]:
+            changed_npt = changed_npt.filter(
+                updated_at__gte=datetime.fromisoformat(stored["cursor"]) - DELTA_LOOKBACK
+            )
+        npt_df = frame_from_store(stored["npt"], NPT_DATETIME_COLUMNS)
+        npt_df = merge_npt_rows(npt_df, load_npt_frame(changed_npt, shifts))
+        LOG.debug("Merged stored NPT frame: rows=%d", len(npt_df))
+    else:
+        npt_df = load_npt_frame(npt_qs, shifts)
+    if latest_open_only:
+        npt_df = drop_superseded_open_rows(npt_df).reset_index(drop=True)
+
+    cursor = npt_df['updated_at'].max() if npt_df['updated_at'].notna().any() else None
+    return npt_df, {
+        "scope": scope,
+        "cursor": str(cursor) if cursor is not None else None,
+        "npt": frame_to_store(npt_df),
+    }
+
+
+def patch_figures(figs, names, drawn=()):
+    """
+    What to send for the figures `names` of `figs`. Figures the browser
+    already has in full (`drawn`) get a dash.Patch replacing their traces
+    and layout but keeping the template, most of a figure's JSON; the
+    others are sent whole.
+
+    Returns:
+        Tuple (list of figures or patches in `names` order, names now drawn)
+    """
+    updates, now_drawn = [], []
+    for name in names:
+        fig = figs.get(name) or {}
+        fig = fig.to_dict() if hasattr(fig, 'to_dict') else fig
+        if name not in drawn:
+            updates.append(fig)
+            if fig:
+                now_drawn.append(name)
+            continue
+
+        patch = Patch()
+        patch['data'] = fig.get('data', [])
+        for key, value in fig.get('layout', {}).items():
+            if key != 'template':
+                patch['layout'][key] = value
+        updates.append(patch)
+        now_drawn.append(name)
+    return updates, now_drawn
+
+
+def update_rotation_trend(rot_qs, state, build_figure):
+    """
+    Update of a rotation trend chart from the rows of `rot_qs` the browser
+    has not seen, past the last drawn time kept in `state`.
+
+    While the rows up to that time are unchanged and no machine is added,
+    only the new rows, reduced with the same buckets, are appended to
+    their traces with dash.Patch. Otherwise the chart is rebuilt with
+    `build_figure(rot_df, bucket_seconds)`, which must draw one trace per
+    machine label in label order.
+
+    Args:
+        state: JSON-able state returned by the previous call, or None
+
+    Returns:
+        Tuple (figure update, new state); the update is a full figure,
+        a dash.Patch or no_update
+    """
+    if state and state["last_time"]:
+        last_time = datetime.fromisoformat(state["last_time"])
+        # Rows committed out of order behind the drawn part need a redraw
+        if rot_qs.filter(count_time__lte=last_time).count() == state["rows"]:
+            new_rot = load_rotation_frame(rot_qs.filter(count_time__gt=last_time))
+            if new_rot.empty:
+                return no_update, state
+            if set(new_rot['machine_label']) <= set(state["labels"]):
+                new_rows = downsample_min_max(
+                    new_rot, 'count_time', 'count', state["bucket_seconds"], by='machine_label'
+                )
+                patch = Patch()
+                for i, machine_label in enumerate(state["labels"]):
+                    rows = new_rows[new_rows['machine_label'] == machine_label]
+                    if rows.empty:
+                        continue
+                    patch['data'][i]['x'].extend(rows['count_time'].tolist())
+                    patch['data'][i]['y'].extend(rows['count'].tolist())
+                return patch, {
+                    **state,
+                    "last_time": str(new_rot['count_time'].max()),
+                    "rows": state["rows"] + len(new_rot),
+                }
+
+    rot_df = load_rotation_frame(rot_qs)
+    if rot_df.empty:
+        return {}, {"last_time": None, "rows": 0, "labels": [], "bucket_seconds": None}
+    # Min/max per bucket keeps resets visible at a fraction of the points
+    bucket_seconds = get_bucket_seconds(rot_df['count_time'].min(), rot_df['count_time'].max())
+    return build_figure(rot_df, bucket_seconds), {
+        "last_time": str(rot_df['count_time'].max()),
+        "rows": len(rot_df),
+        "labels": sorted(rot_df['machine_label'].unique()),
+        "bucket_seconds": bucket_seconds,
+    }
@@ -0,0 +1,226 @@
+import csv
+import io
+import tempfile
+from datetime import date
+from itertools import islice
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+
+from core.models import ProcessedNPT, RotationStatus
+
+
+# Rows fetched per round trip of a server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+
+# Excel's hard limit of rows per worksheet, header included
+EXCEL_MAX_ROWS = 1048576
+
+# Excel's limit on worksheet title length
+EXCEL_MAX_TITLE = 31
+
+# Rows per Arrow record batch / Parquet row group of a columnar export
+COLUMNAR_BATCH_SIZE = 50000
+
+# name -> (model, time field, archive kind, {column: (queryset field, Arrow type)})
+COLUMNAR_SOURCES = {
+    "rotations": (
+        RotationStatus,
+        "count_time",
+        "rotation",
+        {
+            "id": ("id", pa.int64()),
+            "machine_id": ("machine_id", pa.int64()),
+            "mc_no": ("machine__mc_no", pa.string()),
+            "count": ("count", pa.int64()),
+            "count_time": ("count_time", pa.timestamp("us")),
+        },
+    ),
+    "npt": (
+        ProcessedNPT,
+        "off_time",
+        "npt",
+        {
+            "id": ("id", pa.int64()),
+            "machine_id": ("machine_id", pa.int64()),
+            "mc_no": ("machine__mc_no", pa.string()),
+            "reason_id": ("reason_id", pa.int64()),
+            "reason": ("reason__name", pa.string()),
+            "off_time": ("off_time", pa.timestamp("us")),
+            "on_time": ("on_time", pa.timestamp("us")),
+            "duration_seconds": ("duration_seconds", pa.float64()),
+        },
+    ),
+}
+
+COLUMNAR_CONTENT_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+class Echo:
+    """Pseudo file whose write() returns the line, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def export_filename(name):
+    """Download name with today's date, e.g. npt_logs_2025-01-31."""
+    return f"{name}_{date.today():%Y-%m-%d}"
+
+
+def iter_chunks(rows, size=EXPORT_CHUNK_SIZE):
+    """Lists of up to `size` rows from any iterable, consumed lazily."""
+    rows = iter(rows)
+    return iter(lambda: list(islice(rows, size)), [])
+
+
+def stream_csv(header, rows):
+    """CSV lines of the header and rows, one at a time."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def sheet_title(title, part):
+    """Title of the `part`-th worksheet of a sheet, e.g. 'NPT Logs (2)'."""
+    if part == 1:
+        return title[:EXCEL_MAX_TITLE]
+    suffix = f" ({part})"
+    return title[:EXCEL_MAX_TITLE - len(suffix)] + suffix
+
+
+def write_xlsx(sheets):
+    """
+    Write (title, header, rows) sheets with openpyxl's write-only mode, which
+    flushes every appended row to disk instead of keeping the cells in memory.
+
+    A sheet with more rows than Excel opens continues on 'Title (2)',
+    'Title (3)', ... each repeating the header.
+
+    Returns:
+        Temporary file holding the workbook, rewound
+    """
+    workbook = Workbook(write_only=True)
+    for title, header, rows in sheets:
+        # Start the first worksheet with the first row, so it still streams
+        part, written = 0, EXCEL_MAX_ROWS
+        for row in rows:
+            if written == EXCEL_MAX_ROWS:
+                part += 1
+                sheet = workbook.create_sheet(title=sheet_title(title, part))
+                sheet.append(header)
+                written = 1
+            sheet.append(row)
+            written += 1
+        if part == 0:
+            # No rows: still write the header
+            workbook.create_sheet(title=sheet_title(title, 1)).append(header)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def export_response(export_format, filename, sheets):
+    """
+    Download response for a table export.
+
+    Args:
+        export_format: 'xlsx' for a workbook of every sheet, anything else
+                       streams the first sheet as CSV
+        filename: download name without extension
+        sheets: list of (title, header, rows); rows may be a lazy iterator,
+                e.g. over QuerySet.iterator()
+    """
+    if export_format == 'xlsx':
+        return FileResponse(write_xlsx(sheets), as_attachment=True, filename=f"{filename}.xlsx")
+
+    _, header, rows = sheets[0]
+    response = StreamingHttpResponse(stream_csv(header, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+class ChunkSink(io.RawIOBase):
+    """Write-only stream that keeps what was written until drain() hands it out."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def get_columnar_schema(source, columns):
+    """Arrow schema of the chosen columns of a COLUMNAR_SOURCES entry."""
+    fields = COLUMNAR_SOURCES[source][3]
+    return pa.schema([(name, fields[name][1]) for name in columns])
+
+
+def iter_columnar_batches(source, columns, queryset, archived=None, batch_size=COLUMNAR_BATCH_SIZE):
+    """
+    Record batches of the chosen columns: archived rows first, then the
+    queryset read through a server-side cursor, so only one batch of rows
+    is held at a time.
+
+    Args:
+        queryset: filtered queryset of the source model, already ordered
+        archived: DataFrame of archived rows as returned by read_archive
+    """
+    fields = COLUMNAR_SOURCES[source][3]
+    schema = get_columnar_schema(source, columns)
+
+    if archived is not None and not archived.empty:
+        for start in range(0, len(archived), batch_size):
+            part = archived.iloc[start:start + batch_size]
+            yield pa.RecordBatch.from_arrays(
+                [pa.array(part[fields[name][0]], type=fields[name][1], from_pandas=True) for name in columns],
+                schema=schema,
+            )
+
+    rows = queryset.values_list(*[fields[name][0] for name in columns]).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for chunk in iter_chunks(rows, batch_size):
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(values, type=fields[name][1]) for name, values in zip(columns, zip(*chunk))],
+            schema=schema,
+        )
+
+
+def stream_columnar(batches, schema, export_format):
+    """
+    Bytes of an Arrow IPC stream (or a Parquet file with 'parquet'), handed
+    out as every record batch is written.
+    """
+    sink = ChunkSink()
+    if export_format == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    for batch in batches:
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
@@ -1,7 +1,9 @@
+import pandas as pd
 from django.db.models import Q
 from datetime import datetime, date, time, timedelta
 from core.models import ProcessedNPT, RotationStatus, Machine
-from library.models import Shift
+from library.models import Shift, ShiftInstance
+from core.utils.archive import archived_npt_records, get_archive_boundary, read_archive
 
 def is_time_in_shift(time_obj, shift):
     """
@@ -31,32 +33,80 @@ def is_time_in_shift(time_obj, shift):
         return check_time >= start_time or check_time < end_time
 
 
-def filter_by_shift(queryset, shift, datetime_field='off_time'):
+def shift_time_q(shift, datetime_field):
     """
-    Filter queryset by shift times.
+    Q matching datetimes whose time of day falls inside the shift.
     Handles overnight shifts.
-    
-    `datetime_field` should be the name of the datetime field on the model
-    (e.g., 'count_time' for RotationStatus, 'off_time' for ProcessedNPT).
     """
     start_time = shift.start_time
     end_time = shift.end_time
 
     if start_time < end_time:
         # Normal shift (e.g., 08:00 - 16:00)
-        filter_kwargs = {
+        return Q(**{
             f"{datetime_field}__time__gte": start_time,
             f"{datetime_field}__time__lt": end_time
-        }
-        return queryset.filter(**filter_kwargs)
+        })
     else:
         # Overnight shift (e.g., 22:00 - 06:00)
-        return queryset.filter(
+        return (
             Q(**{f"{datetime_field}__time__gte": start_time}) |
             Q(**{f"{datetime_field}__time__lt": end_time})
         )
 
 
+def get_shift_windows(shift, date_from, date_to):
+    """
+    (start, end) datetimes of every instance of the shift overlapping the
+    range, oldest first. Read from the ShiftInstance calendar; days it does
+    not hold are computed from the shift.
+
+    Args:
+        date_from, date_to: dates (whole days) or datetimes
+    """
+    range_start = date_from if isinstance(date_from, datetime) else datetime.combine(date_from, time.min)
+    range_end = date_to if isinstance(date_to, datetime) else datetime.combine(date_to, time.min) + timedelta(days=1)
+
+    windows = {
+        day: (start_dt, end_dt)
+        for day, start_dt, end_dt in ShiftInstance.objects.filter(
+            shift=shift, start_dt__lte=range_end, end_dt__gt=range_start
+        ).values_list('date', 'start_dt', 'end_dt')
+    }
+    # The day before may hold an overnight instance running into the range
+    day = range_start.date() - timedelta(days=1)
+    while day <= range_end.date():
+        if day not in windows:
+            start_dt, end_dt = shift.get_window(day)
+            if start_dt <= range_end and end_dt > range_start:
+                windows[day] = (start_dt, end_dt)
+        day += timedelta(days=1)
+    return [windows[day] for day in sorted(windows)]
+
+
+def filter_by_shift(queryset, shift, datetime_field='off_time', date_from=None, date_to=None):
+    """
+    Filter queryset by shift times.
+    Handles overnight shifts.
+    
+    `datetime_field` should be the name of the datetime field on the model
+    (e.g., 'count_time' for RotationStatus, 'off_time' for ProcessedNPT).
+
+    With a date range, the shift windows overlapping it become plain
+    `field >= start AND field < end` conditions, so the datetime indexes
+    apply. Without one, datetimes are matched by time of day.
+    """
+    if date_from is None or date_to is None:
+        return queryset.filter(shift_time_q(shift, datetime_field))
+
+    condition = Q()
+    for start_dt, end_dt in get_shift_windows(shift, date_from, date_to):
+        condition |= Q(**{f"{datetime_field}__gte": start_dt, f"{datetime_field}__lt": end_dt})
+    if not condition:
+        return queryset.none()
+    return queryset.filter(condition)
+
+
 def get_shift_for_time(time_obj, shifts):
     """
     Find the shift that contains a given time.
@@ -101,18 +151,14 @@ def get_shift_duration_seconds(shift):
     """
     Calculate shift duration in seconds, handling overnight shifts
     """
-    from datetime import datetime, timedelta
-    
-    # Create datetime objects for calculation
     start_dt = datetime.combine(datetime.today(), shift.start_time)
     end_dt = datetime.combine(datetime.today(), shift.end_time)
-    
+
     # Handle overnight shifts (end_time < start_time)
     if shift.end_time < shift.start_time:
         end_dt += timedelta(days=1)
-    
-    duration = end_dt - start_dt
-    return duration.total_seconds()
+
+    return (end_dt - start_dt).total_seconds()
 
 
 
@@ -122,25 +168,77 @@ def skip_null_on_time_except_last(npt_qs):
     """
     Skip NPT records with null on_time except for the latest record of each machine.
     """
-    # Group by machine
-    machines = npt_qs.values_list('machine', flat=True).distinct()
-    filtered_qs = ProcessedNPT.objects.none()  # start empty queryset
+    return npt_qs.skip_null_on_time_except_last()
+
+
+def get_archived_npt_records(machines, machine=None, reason=None, shift=None,
+                             date_from=None, date_to=None):
+    """
+    Archived ProcessedNPT records matching the same filters as the live
+    queryset, for reports whose range reaches before the archive boundary.
 
-    for machine_id in machines:
-        machine_records = npt_qs.filter(machine_id=machine_id).order_by('off_time')
-        if not machine_records.exists():
-            continue
-        last_record = machine_records.last()  # keep last record even if on_time is null
-        # Filter records: exclude null on_time except last
-        non_null_records = machine_records.exclude(on_time__isnull=True)
-        # Combine with last record (avoid duplication if last_record already non-null)
-        if last_record.on_time is None:
-            non_null_records = non_null_records | ProcessedNPT.objects.filter(pk=last_record.pk)
-        filtered_qs = filtered_qs | non_null_records
+    Args:
+        machines: Machine queryset the user has access to
+        machine: Machine id or mc_no filter value
+        reason: Reason id filter value
+        shift: Shift id filter value
+        date_from, date_to: Range on off_time (date or datetime)
+
+    Returns:
+        List of unsaved ProcessedNPT instances, oldest first
+    """
+    if get_archive_boundary() is None:
+        return []
 
-    return filtered_qs.distinct()
+    machine_rows = machines.values_list('id', 'mc_no')
+    if machine:
+        machine_rows = [(pk, mc_no) for pk, mc_no in machine_rows if str(pk) == str(machine) or mc_no == machine]
+    records = archived_npt_records([pk for pk, _ in machine_rows], date_from, date_to)
 
+    if reason:
+        records = [r for r in records if str(r.reason_id) == str(reason)]
 
+    if shift:
+        try:
+            shift_obj = Shift.objects.get(id=shift)
+            records = [r for r in records if is_time_in_shift(r.off_time, shift_obj)]
+        except (Shift.DoesNotExist, ValueError, TypeError):
+            pass
+
+    return records
+
+
+def get_archived_rotations(machines, machine=None, shift=None, date_from=None, date_to=None):
+    """
+    Archived RotationStatus rows matching the same filters as the live
+    queryset, for reports whose range reaches before the archive boundary.
+
+    Args:
+        machines: Machine queryset the user has access to
+        machine: Machine mc_no (or id) filter value
+        shift: Shift object to keep the counts of, by time of day
+        date_from, date_to: Range on count_time (date or datetime)
+
+    Returns:
+        DataFrame with the columns of RotationStatus.values('id', 'machine_id',
+        'machine__mc_no', 'count', 'count_time'), oldest first
+    """
+    columns = ['id', 'machine_id', 'machine__mc_no', 'count', 'count_time']
+    if get_archive_boundary() is None:
+        return pd.DataFrame(columns=columns)
+
+    machine_rows = machines.values_list('id', 'mc_no')
+    if machine:
+        machine_rows = [(pk, mc_no) for pk, mc_no in machine_rows if str(pk) == str(machine) or mc_no == machine]
+    mc_nos = dict(machine_rows)
+
+    df = read_archive('rotation', list(mc_nos), date_from, date_to)
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    df = df.assign(machine__mc_no=df['machine_id'].map(mc_nos))
+    if shift:
+        df = df[df['count_time'].map(lambda t: is_time_in_shift(t, shift))]
+    return df[columns].reset_index(drop=True)
 
 
 def parse_filters_and_dates(request=None, **kwargs):
@@ -273,7 +371,8 @@ def apply_npt_filters(queryset=None, machine=None, reason=None, shift=None,
     if shift:
         try:
             shift_obj = Shift.objects.get(id=shift)
-            queryset = filter_by_shift(queryset, shift_obj)
+            shift_range = (single_date, single_date) if single_date else (date_from, date_to)
+            queryset = filter_by_shift(queryset, shift_obj, 'off_time', *shift_range)
         except Shift.DoesNotExist:
             pass
     
@@ -1,9 +1,111 @@
 import pandas as pd
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from frontend.utils.function_filter import get_shift_identifier
 # from io import BytesIO
 # from openpyxl import Workbook
 # from openpyxl.styles import Font, Alignment, Border, Side
 from django.http import JsonResponse, HttpResponse
 
+# --- Helper function to split downtimes at day and shift boundaries ---
+def get_shift_windows(shift, date_range):
+    """Concrete (start, end) datetimes of a shift for every date in the range."""
+    windows = [shift.get_window(d) for d in date_range]
+    return [start for start, _ in windows], [end for _, end in windows]
+
+
+def split_npt_by_windows(npt_index, machines, date_range, shifts, all_shifts, selected_shift=None):
+    """
+    NPT minutes per machine, per calendar day and per shift instance.
+
+    Every downtime is clipped to the windows it actually overlaps, so one
+    crossing midnight or a shift change is booked to both sides. Each cell
+    is one vectorised overlap query against the interval index.
+
+    Args:
+        npt_index: NptIntervalIndex keyed by machine mc_no
+        machines: mc_no values to compute
+        date_range: list of dates
+        shifts: shifts that get their own table
+        all_shifts: every shift, for stable identifiers
+        selected_shift: when filtering by shift, day totals cover only it
+
+    Returns:
+        Nested dict data[machine][date] = {'total_npt', 'shifts': {shift_id: {'npt'}}}
+    """
+    data = defaultdict(lambda: defaultdict(lambda: {
+        'total_npt': 0, 'shifts': defaultdict(lambda: {'npt': 0})
+    }))
+
+    if selected_shift:
+        day_starts, day_ends = get_shift_windows(selected_shift, date_range)
+    else:
+        day_starts = [datetime.combine(d, time.min) for d in date_range]
+        day_ends = [start + timedelta(days=1) for start in day_starts]
+
+    shift_windows = {
+        get_shift_identifier(shift, all_shifts): get_shift_windows(shift, date_range)
+        for shift in shifts
+    }
+
+    for machine in machines:
+        day_npt = npt_index.overlap_many(day_starts, day_ends, machine) / 60
+        for date_obj, npt in zip(date_range, day_npt):
+            data[machine][date_obj]['total_npt'] = npt
+
+        for shift_id, (starts, ends) in shift_windows.items():
+            shift_npt = npt_index.overlap_many(starts, ends, machine) / 60
+            for date_obj, npt in zip(date_range, shift_npt):
+                data[machine][date_obj]['shifts'][shift_id]['npt'] = npt
+
+    return data
+
+
+def get_snapshot_npt(snapshot_qs, machines, date_range, shifts, all_shifts, selected_shift=None):
+    """
+    NPT minutes of closed days from ReportSnapshot rows, in the layout of
+    split_npt_by_windows.
+
+    Args:
+        snapshot_qs: ReportSnapshot queryset already scoped to the machines
+        machines: mc_no values in scope
+        date_range, shifts, all_shifts, selected_shift: as split_npt_by_windows
+
+    Returns:
+        (data, covered, with_npt): covered is the set of (mc_no, date) fully
+        answered by snapshots, with_npt the mc_no values that had downtime
+    """
+    data = defaultdict(lambda: defaultdict(lambda: {
+        'total_npt': 0, 'shifts': defaultdict(lambda: {'npt': 0})
+    }))
+    day_key = selected_shift.id if selected_shift else None
+    shift_ids = {shift.id: get_shift_identifier(shift, all_shifts) for shift in shifts}
+    needed = set(shift_ids) | {day_key}
+
+    rows = defaultdict(dict)
+    with_npt = set()
+    snapshots = snapshot_qs.filter(date__in=date_range).values_list(
+        'machine__mc_no', 'date', 'shift_id', 'npt_seconds', 'npt_events'
+    )
+    for machine, date_obj, shift_id, npt_seconds, npt_events in snapshots:
+        rows[(machine, date_obj)][shift_id] = npt_seconds
+        if npt_seconds or npt_events:
+            with_npt.add(machine)
+
+    covered = set()
+    for machine in machines:
+        for date_obj in date_range:
+            cell = rows.get((machine, date_obj))
+            if cell is None or not needed <= cell.keys():
+                continue
+            covered.add((machine, date_obj))
+            data[machine][date_obj]['total_npt'] = cell[day_key] / 60
+            for shift_id, identifier in shift_ids.items():
+                data[machine][date_obj]['shifts'][identifier]['npt'] = cell[shift_id] / 60
+
+    return data, covered, with_npt
+
+
 # --- Helper function to generate Overall Summary Table ---
 def generate_summary_table(machines, date_range, date_headers, data):
     table_data = {
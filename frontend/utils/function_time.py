@@ -103,6 +103,31 @@ def get_date_range(start_date, end_date):
         current += timedelta(days=1)
     return dates
 
+
+def get_whole_days(from_datetime, to_datetime):
+    """Dates whose whole day lies inside the inclusive range [from_datetime, to_datetime]."""
+    first = from_datetime.date() if from_datetime.time() == time.min else from_datetime.date() + timedelta(days=1)
+    # A day ends just before the next midnight
+    last = (to_datetime + timedelta(microseconds=1)).date() - timedelta(days=1)
+    return get_date_range(first, last)
+
+
+def get_uncovered_segments(from_datetime, to_datetime, covered_dates):
+    """
+    Parts of the inclusive range [from_datetime, to_datetime] outside the
+    whole days in covered_dates, as inclusive (start, end) pairs.
+    """
+    segments = []
+    cursor = from_datetime
+    for day in sorted(covered_dates):
+        day_start = datetime.combine(day, time.min)
+        if day_start > cursor:
+            segments.append((cursor, day_start - timedelta(microseconds=1)))
+        cursor = max(cursor, day_start + timedelta(days=1))
+    if cursor <= to_datetime:
+        segments.append((cursor, to_datetime))
+    return segments
+
 def format_duration_hms(seconds):
     """
     Format a duration (given in minutes, may include fractions) as Hh Mm Ss.
@@ -1,28 +1,33 @@
 from django.shortcuts import render
 from core.middleware import skip_permission
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from datetime import datetime, date, time, timedelta
 from django.db.models import Q
 from django.utils.timezone import make_aware
-from core.models import ProcessedNPT, RotationStatus, Machine, NptReason
+from core.models import ProcessedNPT, RotationStatus, Machine, NptReason, Roll, ReportSnapshot
 from library.models import Shift
 import pandas as pd
 from core.utils.utils import get_user_machines
 from django.contrib.auth.models import AnonymousUser
-from itertools import groupby
 from operator import itemgetter
 from collections import defaultdict
+import heapq
 from pprint import pprint
 import plotly.graph_objects as go
 import plotly.express as px
-from plotly.subplots import make_subplots
-import math
 
-from core.utils.utils import paginate_queryset
-from frontend.utils.function_filter import get_current_shift_display, filter_by_shift,get_shift_for_time,get_shift_identifier,parse_filters_and_dates,apply_npt_filters,skip_null_on_time_except_last,get_shift_duration_seconds
-from frontend.utils.function_time import calculate_minutes_between,get_date_range,format_duration_hms,calculate_seconds_between,get_datetime_range
-from frontend.utils.function_overall_performance_helper import generate_shift_table,generate_summary_table
-from frontend.utils.function_rotation_helper import split_records_by_blocks_multi_day,calculate_npt_minutes
+from core.utils.utils import get_keyset_params, keyset_page, keyset_frame_page, encode_cursor
+from frontend.utils.function_filter import get_current_shift_display, filter_by_shift,get_shift_for_time,get_shift_identifier,parse_filters_and_dates,apply_npt_filters,skip_null_on_time_except_last,get_shift_duration_seconds,get_archived_npt_records,get_archived_rotations
+from frontend.utils.function_time import calculate_minutes_between,get_date_range,format_duration_hms,calculate_seconds_between,get_datetime_range,get_whole_days,get_uncovered_segments
+from frontend.utils.function_overall_performance_helper import generate_shift_table,generate_summary_table,split_npt_by_windows,get_snapshot_npt
+from frontend.utils.function_rotation_helper import split_records_by_blocks_multi_day,calculate_npt_minutes,get_snapshot_shift_instances
+from core.utils.rolls import clip_roll_to_window, load_rotation_arrays
+from core.utils.sweep import NptIntervalIndex
+from frontend.utils.function_chart_helper import build_daily_performance_charts
+from frontend.utils.function_export import EXPORT_CHUNK_SIZE, export_filename, export_response, iter_chunks
+from frontend.utils.function_export import COLUMNAR_SOURCES, COLUMNAR_CONTENT_TYPES, get_columnar_schema, iter_columnar_batches, stream_columnar
+from core.utils.archive import read_archive
+from core.utils.report_cache import cached_report
 
 
 # Create your views here.
@@ -34,10 +39,13 @@ def dashboard(request):
 
 
 ### McLogs
-@skip_permission
-def mclogs(request):
+def get_mclogs_npt_records(request):
     """
-    View to display ProcessedNPT records with filtering capabilities
+    Filtered ProcessedNPT queryset of the machine logs, shared by the page
+    and its events endpoint.
+
+    Returns:
+        (npt_records, machines, cache filters, time_range_seconds, datetime_from_formatted, datetime_to_formatted)
     """
     # Fetch machines user has access to
     # print(request.user.is_authenticated)
@@ -99,39 +107,54 @@ def mclogs(request):
         try:
             shift = Shift.objects.get(id=int(shift_filter))
             time_range_seconds = get_shift_duration_seconds(shift)
-            npt_records = filter_by_shift(npt_records, shift)
+            npt_records = filter_by_shift(npt_records, shift, 'off_time', date_from, date_to)
         except (Shift.DoesNotExist, ValueError, TypeError):
             pass
     
-    # Order by most recent first
     npt_records = skip_null_on_time_except_last(npt_records)
-    npt_qs = npt_records.order_by('-off_time')
 
-    
+    filters = {'machine': machine_filter, 'reason': reason_filter, 'shift': shift_filter, 'from': date_from, 'to': date_to}
+    return npt_records, machines, filters, time_range_seconds, datetime_from_formatted, datetime_to_formatted
+
 
-    npt_qs, paginator = paginate_queryset(request, npt_qs, 50)
+@skip_permission
+def mclogs(request):
+    """
+    View to display ProcessedNPT records with filtering capabilities.
+    The log rows are fetched page by page from mclogs_events_api.
+    """
+    npt_records, machines, filters, time_range_seconds, datetime_from_formatted, datetime_to_formatted = get_mclogs_npt_records(request)
+    shift_filter = filters['shift']
 
     # Calculate time range in seconds
     # time_range_seconds = calculate_seconds_between(date_from, date_to)
     
-    # Process data in single loop for efficiency
+    # One grouped aggregate instead of materialising every record
     reason_counts = {}
     machine_data = {}
 
-    
-    for record in npt_records:
-        reason_name = record.reason.name if record.reason else 'N/A'
-        machine_name = record.machine.mc_no
-        duration = record.get_duration().total_seconds()
-        
+    totals = cached_report(
+        'mclogs',
+        machines,
+        filters,
+        filters['to'],
+        lambda: list(
+            npt_records.duration_totals('machine__mc_no', 'reason__name').order_by('machine__mc_no', 'reason__name')
+        ),
+        range_start=filters['from'],
+    )
+    for row in totals:
+        reason_name = row['reason__name'] or 'N/A'
+        machine_name = row['machine__mc_no']
+
         # Count reasons
-        reason_counts[reason_name] = reason_counts.get(reason_name, 0) + 1
-        
+        reason_counts[reason_name] = reason_counts.get(reason_name, 0) + row['events']
+
         # Accumulate machine data
         if machine_name not in machine_data:
             machine_data[machine_name] = {}
-        machine_data[machine_name][reason_name] = machine_data[machine_name].get(reason_name, 0) + duration
-        
+        machine_data[machine_name][reason_name] = machine_data[machine_name].get(reason_name, 0) + (row['total_seconds'] or 0)
+
 
     # Format reasons data
     reasons = [
@@ -186,7 +209,6 @@ def mclogs(request):
         'reasons': reasons,
         'shifts': shifts,
         'machines': machines_list,
-        'page_obj': npt_qs,
         'total_npt_all': format_duration_hms(round(total_npt_all, 2)),
         'total_npt_percentage': round(total_npt_percentage*100, 2),
         'total_reason_counts': total_reason_counts,
@@ -205,6 +227,46 @@ def mclogs(request):
     return render(request, 'frontend/mclogs.html', context)
 
 
+@skip_permission
+def mclogs_events_api(request):
+    """
+    Keyset-paginated NPT log of the machine logs page, with the same filters.
+
+    Query params, besides the page filters:
+        cursor: next_cursor of the previous response, omitted for the first page
+        order: 'desc' (newest first, default) or 'asc' on off_time
+        per_page: rows per response, at most 500
+    """
+    npt_records = get_mclogs_npt_records(request)[0]
+    try:
+        after, per_page, descending = get_keyset_params(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    keys = ('off_time', 'id')
+    rows, has_more = keyset_page(
+        npt_records.with_effective_duration().values(
+            'id', 'machine__mc_no', 'reason__name', 'off_time', 'on_time', 'effective_duration'
+        ),
+        keys,
+        after,
+        per_page,
+        descending,
+    )
+    return JsonResponse({
+        'success': True,
+        'events': [{
+            'id': row['id'],
+            'machine': row['machine__mc_no'],
+            'reason': row['reason__name'] or 'N/A',
+            'off_time': row['off_time'],
+            'on_time': row['on_time'],
+            'duration': round(row['effective_duration'] or 0),
+        } for row in rows],
+        'next_cursor': encode_cursor(rows[-1], keys) if has_more else None,
+    })
+
+
 @skip_permission
 def mcgraph(request):
     """Render the NPT chart page"""
@@ -236,7 +298,6 @@ def mcgraph_api(request):
             'on_time': row['on_time'].isoformat() if row['on_time'] else None,
         } for row in rows]
 
-        print(npt)
         return JsonResponse({
             'success': True,
             'npt': npt,
@@ -252,8 +313,15 @@ def mcgraph_api(request):
     
 
 ### Rotation Counter
-@skip_permission
-def rotaionCounter(request):
+def get_rotation_counter_querysets(request):
+    """
+    Filtered RotationStatus and ProcessedNPT querysets of the rotation
+    counter, shared by the page and its log endpoint.
+
+    Returns:
+        (rotation_qs, npt_qs, machines, cache filters, selected_shift, total_duration_minutes,
+         datetime_from_formatted, datetime_to_formatted)
+    """
     # Fetch machines user has access to
     if request.user is None or isinstance(request.user, AnonymousUser) or not request.user.is_authenticated:
         machines = Machine.objects.none()
@@ -303,18 +371,16 @@ def rotaionCounter(request):
             pass
 
     # Apply shift filter
-    shifts = Shift.objects.all().order_by('start_time')
-    current_shift_display = ''
+    selected_shift = None
     
     if shift_filter:
         try:
             selected_shift = Shift.objects.get(id=int(shift_filter))
-            current_shift_display = str(selected_shift)
             # print("Shift Selected: ", selected_shift)
             total_duration_minutes = get_shift_duration_seconds(selected_shift)/60
             # Filter by shift time using the utility function
-            rotation_qs = filter_by_shift(rotation_qs, selected_shift, "count_time")
-            npt_qs = filter_by_shift(npt_qs, selected_shift)
+            rotation_qs = filter_by_shift(rotation_qs, selected_shift, "count_time", from_datetime, to_datetime)
+            npt_qs = filter_by_shift(npt_qs, selected_shift, "off_time", from_datetime - timedelta(days=1), to_datetime)
             
         except (Shift.DoesNotExist, ValueError, TypeError):
             pass
@@ -322,216 +388,189 @@ def rotaionCounter(request):
     # Skipping Null on_Times from npt_qs
     npt_qs = skip_null_on_time_except_last(npt_qs)
 
-    # Build Q object for all NPT intervals
-    exclude_q = Q()
-    for npt in npt_qs:
-        start = npt.off_time
-        end = npt.on_time or to_datetime  # Ongoing NPT
-        if start.tzinfo is None:
-            start = make_aware(start)
-        if end.tzinfo is None:
-            end = make_aware(end)
-        exclude_q |= Q(count_time__gte=start, count_time__lt=end)
-
-    # Exclude rotations during NPT
-    rotation_qs = rotation_qs.exclude(exclude_q)
-
-    # Fetch records ordered for processing rolls (chronologically per machine)
-    page_obj = rotation_qs.order_by('machine__mc_no', '-count_time')
-
-    rotation_records, paginator = paginate_queryset(request, page_obj, 50)
-    #print(rotation_qs.query)
-    #print(len(rotation_records))
-    # print(len(page_obj))
-    # exit()
-
-    # Calculate total duration of the selected window
-    # duration = to_datetime - from_datetime
-    # total_duration_minutes = duration.total_seconds() / 60
-    
-    
-   # --- Roll Processing Logic (Improved) ---
-    all_rolls = []
-    # Group records by machine object to process each machine's rolls separately
-    for machine, machine_records_iter in groupby(rotation_qs, key=lambda r: r.machine):
-        if not machine:  # Skip records with no machine
-            continue
-            
-        machine_records = list(machine_records_iter)
-        mc_no = machine.mc_no
-        
-        current_roll_records = []
-        roll_no_counter = 1
-        previous_count = None
-        
-        for record in machine_records:
-            # A new roll starts when count decreases from the previous count
-            # or when we have no previous count (first record)
-            
-            if previous_count is not None and record.count < previous_count and current_roll_records:
-                # Process the completed roll before starting the new one
-                start_record = current_roll_records[0]
-                end_record = current_roll_records[-1]
-                
-                start_time = start_record.count_time
-                end_time = end_record.count_time
-                # Calculate actual rotations during this roll period
-                
-                total_count = end_record.count - start_record.count + 1
-                duration = end_time - start_time
-                duration_minutes = duration.total_seconds() / 60 if duration.total_seconds() > 0 else 0
-                
-                # Calculate NPT in minutes for the roll
-                roll_npt = npt_qs.filter(
-                    machine=machine,
-                    off_time__gte=start_time,
-                    off_time__lt=end_time
+    filters = {'machine': machine_filter, 'shift': shift_filter, 'from': from_datetime, 'to': to_datetime}
+    return (rotation_qs, npt_qs, machines, filters, selected_shift, total_duration_minutes,
+            datetime_from_formatted, datetime_to_formatted)
+
+
+def get_rotation_counter_report(request, with_rolls=False):
+    """
+    Cached roll tables of the rotation counter, shared by the page and its
+    workbook download. The per-roll rows are only built with_rolls, as only
+    superusers see them.
+
+    Returns:
+        (report, machines, cache filters, selected_shift, datetime_from_formatted, datetime_to_formatted)
+    """
+    (rotation_qs, npt_qs, machines, filters, selected_shift, total_duration_minutes,
+     datetime_from_formatted, datetime_to_formatted) = get_rotation_counter_querysets(request)
+    machine_filter = filters['machine']
+    from_datetime, to_datetime = filters['from'], filters['to']
+
+    # --- Rolls (maintained incrementally by the process_rolls command) ---
+    roll_qs = Roll.objects.select_related('machine').filter(
+        machine__in=machines,
+        start_time__lte=to_datetime,
+        end_time__gte=from_datetime,
+    )
+    if machine_filter:
+        roll_qs = roll_qs.filter(machine__mc_no=machine_filter)
+    if selected_shift:
+        roll_qs = filter_by_shift(roll_qs, selected_shift, "start_time")
+
+    # Shared across users with the same machines and filters
+    def build():
+        # Whole days come from the nightly snapshots, which are not split by shift
+        scope = machines.filter(mc_no=machine_filter) if machine_filter else machines
+        snapshot_qs = ReportSnapshot.objects.none() if selected_shift else ReportSnapshot.objects.filter(
+            machine__in=scope, shift__isnull=True, date__in=get_whole_days(from_datetime, to_datetime)
+        )
+        totals = defaultdict(lambda: defaultdict(float))
+        covered = defaultdict(set)
+        for row in snapshot_qs.values(
+            'machine__mc_no', 'date', 'rolls', 'rotations', 'roll_minutes', 'roll_npt_minutes', 'productive_minutes'
+        ):
+            covered[row['machine__mc_no']].add(row['date'])
+            machine = totals[row['machine__mc_no']]
+            machine['rolls'] += row['rolls']
+            machine['counts'] += row['rotations']
+            machine['duration'] += row['roll_minutes']
+            machine['npt'] += row['roll_npt_minutes']
+            machine['productive'] += row['productive_minutes']
+
+        # The rest of the range (normally today) is clipped live, fetching
+        # only the rolls and downtimes touching it
+        segments = {
+            mc_no: get_uncovered_segments(from_datetime, to_datetime, covered[mc_no])
+            for mc_no in scope.values_list('mc_no', flat=True)
+        }
+        by_segments = defaultdict(list)
+        for mc_no, machine_segments in segments.items():
+            if machine_segments:
+                by_segments[tuple(machine_segments)].append(mc_no)
+        # Rolls already running at the start are counted even if only their
+        # snapshotted part is inside the range
+        live_rolls = Q(start_time__lt=from_datetime)
+        live_npt = None
+        for machine_segments, mc_nos in by_segments.items():
+            for segment_from, segment_to in machine_segments:
+                live_rolls |= Q(machine__mc_no__in=mc_nos, start_time__lte=segment_to, end_time__gte=segment_from)
+                segment_npt = Q(machine__mc_no__in=mc_nos, off_time__lte=segment_to) & (
+                    Q(on_time__gte=segment_from) | Q(on_time__isnull=True)
                 )
-                npt_minutes = sum(npt.get_duration().total_seconds() / 60 for npt in roll_npt)
-                # print("npt Min: ", npt_minutes)
-                # Productive duration
-                productive_minutes = duration_minutes - npt_minutes
-                # print(productive_minutes)
-                if productive_minutes < 0:
-                    productive_minutes = 0  # avoid negative time
-
-                # Calculate avg_rpm using productive time
-                avg_rpm = 0
-                if productive_minutes > 0 and total_count > 0:
-                    revolutions = total_count 
-                    avg_rpm = revolutions / productive_minutes
-
-                all_rolls.append({
-                    'mc_no': mc_no,
-                    'roll_no': f"Roll-{roll_no_counter}",
-                    'start_time': start_time,
-                    'end_time': end_time,
-                    'total_count': total_count,
-                    'duration_minutes': duration_minutes,
-                    'productive_minutes': productive_minutes,
-                    'npt_minutes': round(npt_minutes, 2),
-                    'avg_rpm': round(avg_rpm, 2)
-                })
-                roll_no_counter += 1
-
-                # Start new roll with the current record
-                current_roll_records = [record]
-            else:
-                # Continue adding to current roll
-                current_roll_records.append(record)
-            
-            # Update previous count for next iteration
-            previous_count = record.count
-        
-        
-        # After the loop, process the last remaining roll for the machine
-        if current_roll_records:
-            start_record = current_roll_records[0]
-            end_record = current_roll_records[-1]
-            
-            start_time = start_record.count_time
-            end_time = end_record.count_time
-            total_count = end_record.count - start_record.count + 1
-
-            duration = end_time - start_time
-            duration_minutes = duration.total_seconds() / 60 if duration.total_seconds() > 0 else 0
-
-            # Calculate NPT in minutes for the roll
-            roll_npt = npt_qs.filter(
-                machine=machine,
-                off_time__gte=start_time,
-                off_time__lt=end_time
-            )
-            npt_minutes = 0
-            for npt in roll_npt:
-                if hasattr(npt, 'get_duration') and callable(npt.get_duration):
-                    # Use the model's get_duration method if available
-                    npt_minutes += npt.get_duration().total_seconds() / 60
-                else:
-                    # Manual calculation: handle null on_time
-                    if npt.on_time:
-                        duration = npt.on_time - npt.off_time
-                        npt_minutes += duration.total_seconds() / 60
-                    else:
-                        # For ongoing NPT (null on_time), calculate till roll end
-                        duration = end_time - npt.off_time
-                        npt_minutes += duration.total_seconds() / 60
-
-            # Productive duration
-            productive_minutes = duration_minutes - npt_minutes
-            if productive_minutes < 0:
-                productive_minutes = 0  # avoid negative time
-
-            # Calculate avg_rpm using productive time
+                live_npt = segment_npt if live_npt is None else live_npt | segment_npt
+        npt_index = NptIntervalIndex.from_queryset(
+            npt_qs.filter(live_npt) if live_npt is not None else npt_qs.none(), to_datetime
+        )
+
+        for roll in roll_qs.filter(live_rolls):
+            mc_no = roll.machine.mc_no
+            counted = roll.start_time.date() not in covered[mc_no]
+            for segment_from, segment_to in segments[mc_no]:
+                if roll.start_time > segment_to or roll.end_time < segment_from:
+                    continue
+                clipped = clip_roll_to_window(roll, rotation_qs, npt_index, segment_from, segment_to)
+                if clipped is None:
+                    continue
+                machine = totals[mc_no]
+                machine['counts'] += clipped['total_count']
+                machine['duration'] += clipped['duration_minutes']
+                machine['npt'] += clipped['npt_minutes']
+                machine['productive'] += clipped['productive_minutes']
+                if counted:
+                    machine['rolls'] += 1
+                    counted = False
+            if counted and roll.start_time < from_datetime:
+                totals[mc_no]['rolls'] += 1
+
+        # Machine Wise Summary with Total Counts
+        machine_wise_summary = []
+        for mc_no, machine in totals.items():
+            if not machine['rolls'] and not machine['counts']:
+                continue
+            total_counts = int(machine['counts'])
+            total_productive = machine['productive']
+            # Time of the window not covered by any roll counts as NPT
+            total_npt = machine['npt'] + max(0, total_duration_minutes - machine['duration'])
+            # Calculate overall average RPM based on total counts and total productive time
+            overall_avg_rpm = 0
+            if total_productive > 0 and total_counts > 0:
+                overall_avg_rpm = total_counts / total_productive
+
+            machine_wise_summary.append({
+                'mc_no': mc_no,
+                'total_counts': total_counts,
+                'avg_rpm': round(overall_avg_rpm, 2),
+                'total_productive': total_productive,
+                'npt_minutes': round(total_npt, 2),
+                'total_duration':round(total_duration_minutes,2),
+                'total_rolls': int(machine['rolls'])
+            })
+
+        machine_wise_summary.sort(key=itemgetter('mc_no'))
+        return machine_wise_summary
+
+    def build_rolls():
+        # Only needed for the rolls crossing the window edges
+        npt_index = NptIntervalIndex.from_queryset(npt_qs, to_datetime)
+
+        all_rolls = []
+        roll_no_counter = defaultdict(int)
+        for roll in roll_qs.order_by('machine__mc_no', 'start_time'):
+            clipped = clip_roll_to_window(roll, rotation_qs, npt_index, from_datetime, to_datetime)
+            if clipped is None:
+                continue
+
+            roll_no_counter[roll.machine_id] += 1
             avg_rpm = 0
-            if productive_minutes > 0 and total_count > 1:
-                revolutions = total_count 
-                avg_rpm = revolutions / productive_minutes
-            
+            if clipped['productive_minutes'] > 0 and clipped['total_count'] > 0:
+                avg_rpm = clipped['total_count'] / clipped['productive_minutes']
             all_rolls.append({
-                'mc_no': mc_no,
-                'roll_no': f"Roll-{roll_no_counter}",
-                'start_time': start_time,
-                'end_time': end_time,
-                'total_count': total_count,
-                'duration_minutes': duration_minutes,
-                'productive_minutes': productive_minutes,
-                'npt_minutes': round(npt_minutes, 2),
+                'mc_no': roll.machine.mc_no,
+                'roll_no': f"Roll-{roll_no_counter[roll.machine_id]}",
+                'start_time': clipped['start_time'],
+                'end_time': clipped['end_time'],
+                'total_count': clipped['total_count'],
+                'duration_minutes': clipped['duration_minutes'],
+                'productive_minutes': clipped['productive_minutes'],
+                'npt_minutes': round(clipped['npt_minutes'], 2),
                 'avg_rpm': round(avg_rpm, 2)
             })
 
+        # Intermediary Roll Data (sorted by start time, descending)
+        intermediary_data = sorted(all_rolls, key=itemgetter('start_time'), reverse=True)
+        for i, roll in enumerate(intermediary_data, 1):
+            roll['serial_no'] = i
+        return intermediary_data
+
+    sources = ("machine_status", "rotation_status")
+    report = {
+        'machine_wise_summary': cached_report(
+            'rotation_counter', machines, filters, to_datetime, build, sources=sources, range_start=from_datetime
+        ),
+        'intermediary_data': [],
+    }
+    if with_rolls:
+        report['intermediary_data'] = cached_report(
+            'rotation_counter_rolls', machines, filters, to_datetime, build_rolls, sources=sources, range_start=from_datetime
+        )
+    return report, machines, filters, selected_shift, datetime_from_formatted, datetime_to_formatted
 
-    # print(all_rolls)
-    # 1. Intermediary Roll Data (sorted by start time, descending)
-    intermediary_data = sorted(all_rolls, key=itemgetter('start_time'), reverse=True)
-    for i, roll in enumerate(intermediary_data, 1):
-        roll['serial_no'] = i
-
-    # 2. Machine Wise Summary with Total Counts
-    machine_wise_summary = []
-    machine_data = defaultdict(list)
-    for roll in all_rolls:
-        machine_data[roll['mc_no']].append(roll)
-
-    for mc_no, rolls in machine_data.items():
-        total_rolls = len(rolls)
-        total_counts = sum(r['total_count'] for r in rolls)
-        total_duration = sum(r['duration_minutes'] for r in rolls)
-        total_productive = sum(r['productive_minutes'] for r in rolls)
-        total_npt = sum(r['npt_minutes'] for r in rolls) + (total_duration_minutes-total_duration)
-        #print("Total Npt: ", total_npt)
-        #print("total_counts: ", total_counts)
-        #print("total_duration_minutes: ", total_duration_minutes)
-        #print("total_duration: ",total_duration)
-        # Calculate overall average RPM based on total counts and total productive time
-        overall_avg_rpm = 0
-        if total_productive > 0 and total_counts > 0:
-            overall_avg_rpm = total_counts / total_productive
-        
-        machine_wise_summary.append({
-            'mc_no': mc_no,
-            'total_counts': total_counts,
-            'avg_rpm': round(overall_avg_rpm, 2),
-            'total_productive': total_productive,
-            'npt_minutes': round(total_npt, 2),
-            'total_duration':round(total_duration_minutes,2),
-            'total_rolls': total_rolls
-        })
 
-    machine_wise_summary.sort(key=itemgetter('mc_no'))
-
-    # 3. Rotation Counter Log (Raw Data, descending by time)
-    rotation_log_records = rotation_qs.order_by('-count_time')
-    rotation_log = []
-    for i, record in enumerate(rotation_log_records, 1):
-        rotation_log.append({
-            'serial_no': i,
-            'mc_no': record.machine.mc_no if record.machine else 'N/A',
-            'count_time': record.count_time,
-            'count_no': record.count
-        })
-    # sorting raw rotation data by count time in decending order
-    rotation_log.sort(key=lambda x: x["count_time"], reverse=True)
+@skip_permission
+def rotaionCounter(request):
+    """
+    Roll summaries of the rotation counter. The rotation log rows are
+    fetched page by page from rotation_counter_events_api.
+    """
+    report, machines, filters, selected_shift, datetime_from_formatted, datetime_to_formatted = get_rotation_counter_report(
+        request, with_rolls=request.user.is_superuser
+    )
+    shifts = Shift.objects.all().order_by('start_time')
+    current_shift_display = str(selected_shift) if selected_shift else ''
+
+    intermediary_data = report['intermediary_data']
+    machine_wise_summary = report['machine_wise_summary']
 
     # Get filter options for the dropdown - only machines user has access to
     if hasattr(machines, 'filter'):
@@ -549,7 +588,7 @@ def rotaionCounter(request):
     total_productive_all = 0
 
     if machine_wise_summary:
-        total_productive_all = sum(roll['productive_minutes'] for roll in all_rolls)
+        total_productive_all = sum(data['total_productive'] for data in machine_wise_summary)
         if total_productive_all > 0 and total_counts_summary > 0:
             overall_avg_rpm = total_counts_summary / total_productive_all
 
@@ -559,11 +598,10 @@ def rotaionCounter(request):
     context = {
         'machine_wise_summary': machine_wise_summary,
         'intermediary_data': intermediary_data,
-        'page_obj': rotation_records,
         'filter_machines': machine_choices,
         'filter_shifts': shifts,
-        'selected_machine': machine_filter,
-        'selected_shift': shift_filter,
+        'selected_machine': filters['machine'],
+        'selected_shift': filters['shift'],
         'current_shift_display': current_shift_display,
         'datetime_from': datetime_from_formatted,
         'datetime_to': datetime_to_formatted,
@@ -580,11 +618,92 @@ def rotaionCounter(request):
     return render(request, 'frontend/rotation_counter.html', context)
 
 
-### Report - daily performance
+def get_rotation_counter_log_sources(machines, filters, selected_shift):
+    """
+    Archived rotations of the rotation counter filters, and the downtime
+    index their log is checked against, including archived downtimes.
+
+    Returns:
+        (archived rotations DataFrame, NptIntervalIndex)
+    """
+    archived = get_archived_rotations(
+        machines, machine=filters['machine'], shift=selected_shift, date_from=filters['from'], date_to=filters['to']
+    )
+    archived_npt = get_archived_npt_records(
+        machines,
+        machine=filters['machine'],
+        # Leave room for downtimes running into the range
+        date_from=filters['from'] - timedelta(days=1),
+        date_to=filters['to'],
+    )
+    return archived, [(r.machine_id, r.off_time, r.on_time) for r in archived_npt]
+
+
 @skip_permission
-def daily_performance(request, user=None):
+def rotation_counter_events_api(request):
     """
-    View to display ProcessedNPT records with filtering capabilities
+    Keyset-paginated rotation log of the rotation counter page, with the same
+    filters. Counts taken during a downtime are left out, so a response may
+    hold fewer than per_page rows while next_cursor is still set.
+
+    Query params, besides the page filters:
+        cursor: next_cursor of the previous response, omitted for the first page
+        order: 'desc' (newest first, default) or 'asc' on count_time
+        per_page: rows per response, at most 500
+    """
+    rotation_qs, npt_qs, machines, filters, selected_shift, *_ = get_rotation_counter_querysets(request)
+    try:
+        after, per_page, descending = get_keyset_params(request)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    # Check each batch against the merged NPT intervals of the range instead
+    # of excluding every interval with its own OR clause
+    archived, archived_npt = get_rotation_counter_log_sources(machines, filters, selected_shift)
+    npt_index = NptIntervalIndex.from_queryset(npt_qs, filters['to'], extra=archived_npt)
+    rotation_rows = rotation_qs.values('id', 'machine_id', 'machine__mc_no', 'count_time', 'count')
+    keys = ('count_time', 'id')
+
+    rows = []
+    has_more = True
+    while has_more and len(rows) < per_page:
+        # Older counts may have been moved to the Parquet archive
+        live, live_more = keyset_page(rotation_rows, keys, after, per_page, descending)
+        old, old_more = keyset_frame_page(archived, keys, after, per_page, descending)
+        batch = sorted(live + old, key=itemgetter('count_time', 'id'), reverse=descending)
+        has_more = live_more or old_more or len(batch) > per_page
+        batch = batch[:per_page]
+        if not batch:
+            break
+        after = (batch[-1]['count_time'], batch[-1]['id'])
+        rows.extend(npt_index.outside(batch, 'machine_id', 'count_time'))
+
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1], keys)
+    else:
+        next_cursor = encode_cursor({'count_time': after[0], 'id': after[1]}, keys) if has_more else None
+
+    return JsonResponse({
+        'success': True,
+        'events': [{
+            'id': row['id'],
+            'machine': row['machine__mc_no'],
+            'count_time': row['count_time'],
+            'count': row['count'],
+        } for row in rows],
+        'next_cursor': next_cursor,
+    })
+
+
+### Report - daily performance
+def get_daily_performance_report(request):
+    """
+    Filtered, cached data of the daily performance report, shared by the
+    page and its charts endpoint.
+
+    Returns:
+        (report, machines, cache filters, date_to, datetime_from_formatted, datetime_to_formatted)
     """
     # Fetch machines user has access to
     if request.user is None or isinstance(request.user, AnonymousUser) or not request.user.is_authenticated:
@@ -634,60 +753,115 @@ def daily_performance(request, user=None):
     if shift_filter:
         try:
             shift = Shift.objects.get(id=int(shift_filter))
-            npt_records = filter_by_shift(npt_records, shift)
+            npt_records = filter_by_shift(npt_records, shift, 'off_time', date_from, date_to)
         except (Shift.DoesNotExist, ValueError, TypeError):
             pass
     
     # Order by most recent first
     npt_records = npt_records.order_by('-off_time')
     npt_records = skip_null_on_time_except_last(npt_records)
-    # Calculate time range in minutes
-    time_range_minutes = calculate_seconds_between(date_from, date_to)
 
-    # Process data in single loop for efficiency
-    reason_counts = {}
-    reason_durations = {}  # For total NPT time per reason
-    machine_data = {}
-    npt_data = []
-    
-    for record in npt_records:
-        reason_name = record.reason.name if record.reason else 'N/A'
-        machine_name = record.machine.mc_no
-        duration_minutes = record.get_duration().total_seconds()/60
-        duration_timedelta = record.get_duration().total_seconds()
+    # Everything below is shared across users with the same machines and filters
+    def build():
+        # Older downtimes may have been moved to the Parquet archive
+        records = list(npt_records) + get_archived_npt_records(
+            machines, machine_filter, reason_filter, shift_filter, date_from, date_to
+        )[::-1]
+        # Calculate time range in minutes
+        time_range_minutes = calculate_seconds_between(date_from, date_to)
+
+        # Process data in single loop for efficiency
+        reason_counts = {}
+        reason_durations = {}  # For total NPT time per reason
+        machine_data = {}
+
+        for record in records:
+            reason_name = record.reason.name if record.reason else 'N/A'
+            machine_name = record.machine.mc_no
+            duration_minutes = record.get_duration().total_seconds()/60
+            duration_timedelta = record.get_duration().total_seconds()
         
-        # Count reasons and accumulate durations
-        reason_counts[reason_name] = reason_counts.get(reason_name, 0) + 1
-        reason_durations[reason_name] = reason_durations.get(reason_name, 0) + duration_timedelta
+            # Count reasons and accumulate durations
+            reason_counts[reason_name] = reason_counts.get(reason_name, 0) + 1
+            reason_durations[reason_name] = reason_durations.get(reason_name, 0) + duration_timedelta
         
-        # Accumulate machine data
-        if machine_name not in machine_data:
-            machine_data[machine_name] = {
-                "reasons": {},  # Store reason durations
-                "count": 0      # Initialize count
-            }
+            # Accumulate machine data
+            if machine_name not in machine_data:
+                machine_data[machine_name] = {
+                    "reasons": {},  # Store reason durations
+                    "count": 0      # Initialize count
+                }
         
-        # Add duration for the reason
-        machine_data[machine_name]["reasons"][reason_name] = machine_data[machine_name]["reasons"].get(reason_name, 0) + duration_minutes
+            # Add duration for the reason
+            machine_data[machine_name]["reasons"][reason_name] = machine_data[machine_name]["reasons"].get(reason_name, 0) + duration_minutes
         
-        # Increment total count for this machine
-        machine_data[machine_name]["count"] += 1
+            # Increment total count for this machine
+            machine_data[machine_name]["count"] += 1
+    
+        # Format reasons data
+        reasons = [
+            {"name": reason_name, "count": count, "total_duration": reason_durations.get(reason_name, 0)}
+            for reason_name, count in reason_counts.items()
+        ]
+    
+        # Format machines data
+        machines_list = []
+        total_npt_all = 0
+    
+        for machine_name, data in machine_data.items():
+            reason_durations_dict = data["reasons"]
+            events = data["count"]
+            machine_reasons = [
+                {"name": reason_name, "duration": round(duration, 2)}
+                for reason_name, duration in reason_durations_dict.items()
+            ]
+            machine_reasons.sort(key=lambda x: x["duration"], reverse=True)
+            total_machine_npt = sum(reason_durations_dict.values())
+            total_npt_all += total_machine_npt
         
-        # Collect NPT data
-        npt_data.append({
-            "machine": machine_name,
-            "reason": reason_name,
-            "offTime": record.off_time,
-            "onTime": record.on_time,
-            "duration": duration_minutes
-        })
+            # Calculate NPT percentage
+            npt_percentage = round((total_machine_npt / time_range_minutes) * 100, 2) if time_range_minutes > 0 else 0
+        
+            machines_list.append({
+                "name": machine_name,
+                "most_npt_reason": machine_reasons[0] if machine_reasons else {"name": "N/A", "duration": 0},
+                "total_events": events,
+                "total_npt": round(total_machine_npt, 2),
+                "avg_npt_per_event": round(total_machine_npt/events, 1) if events else 0,
+                "reasons": reason_durations_dict,
+                "npt_percentage": npt_percentage
+            })
     
-    # Format reasons data
-    reasons = [
-        {"name": reason_name, "count": count, "total_duration": reason_durations.get(reason_name, 0)}
-        for reason_name, count in reason_counts.items()
-    ]
+        # Sort machines by name
+        machines_list.sort(key=lambda x: x["name"], reverse=False)
     
+        # Calculate totals
+        total_reason_counts = sum(reason['count'] for reason in reasons)
+        total_avg_npt_per_events = round(total_npt_all / total_reason_counts, 2) if total_reason_counts else 0
+
+        return {
+            'reasons': reasons,
+            'machines': machines_list,
+            'total_npt_all': total_npt_all,
+            'total_reason_counts': total_reason_counts,
+            'total_avg_npt_per_events': total_avg_npt_per_events,
+            'time_range_minutes': time_range_minutes,
+        }
+
+    filters = {'machine': machine_filter, 'reason': reason_filter, 'shift': shift_filter, 'from': date_from, 'to': date_to}
+    report = cached_report('daily_performance', machines, filters, date_to, build, range_start=date_from)
+    return report, machines, filters, date_to, datetime_from_formatted, datetime_to_formatted
+
+
+@skip_permission
+def daily_performance(request, user=None):
+    """
+    View to display ProcessedNPT records with filtering capabilities.
+    The charts are fetched from daily_performance_charts once the page renders.
+    """
+    report, machines, filters, _, datetime_from_formatted, datetime_to_formatted = get_daily_performance_report(request)
+    shift_filter = filters['shift']
+
     # Format shifts data
     all_shifts = Shift.objects.all().order_by('start_time')
     shifts = [
@@ -695,41 +869,6 @@ def daily_performance(request, user=None):
         for shift in all_shifts
     ]
     
-    # Format machines data
-    machines_list = []
-    total_npt_all = 0
-    
-    for machine_name, data in machine_data.items():
-        reason_durations_dict = data["reasons"]
-        events = data["count"]
-        machine_reasons = [
-            {"name": reason_name, "duration": round(duration, 2)}
-            for reason_name, duration in reason_durations_dict.items()
-        ]
-        machine_reasons.sort(key=lambda x: x["duration"], reverse=True)
-        total_machine_npt = sum(reason_durations_dict.values())
-        total_npt_all += total_machine_npt
-        
-        # Calculate NPT percentage
-        npt_percentage = round((total_machine_npt / time_range_minutes) * 100, 2) if time_range_minutes > 0 else 0
-        
-        machines_list.append({
-            "name": machine_name,
-            "most_npt_reason": machine_reasons[0] if machine_reasons else {"name": "N/A", "duration": 0},
-            "total_events": events,
-            "total_npt": round(total_machine_npt, 2),
-            "avg_npt_per_event": round(total_machine_npt/events, 1) if events else 0,
-            "reasons": reason_durations_dict,
-            "npt_percentage": npt_percentage
-        })
-    
-    # Sort machines by name
-    machines_list.sort(key=lambda x: x["name"], reverse=False)
-    
-    # Calculate totals
-    total_reason_counts = sum(reason['count'] for reason in reasons)
-    total_avg_npt_per_events = round(total_npt_all / total_reason_counts, 2) if total_reason_counts else 0
-
     # Get dropdown options for filters - only machines user has access to
     if hasattr(machines, 'filter'):
         # machines is a QuerySet
@@ -740,210 +879,14 @@ def daily_performance(request, user=None):
     
     all_reasons = NptReason.objects.filter(is_deleted=False).order_by('name')
 
-    # ========== PLOTLY CHARTS ==========
-    
-    # 1. BAR CHART - Machine-wise NPT
-    if machines_list:
-        machine_names = [machine['name'] for machine in machines_list]
-        machine_npt_values = [machine['total_npt'] for machine in machines_list]
-        
-        bar_chart = go.Figure(data=[
-            go.Bar(
-                x=machine_names,
-                y=machine_npt_values,
-                text=[f"{val:.1f} min" for val in machine_npt_values],
-                textposition='auto',
-                marker_color='rgba(55, 128, 191, 0.7)',
-                marker_line_color='rgba(55, 128, 191, 1.0)',
-                marker_line_width=2
-            )
-        ])
-        
-        bar_chart.update_layout(
-            title={
-                'text': 'Machine-wise NPT (Non-Productive Time)',
-                'x': 0.5,
-                'xanchor': 'center'
-            },
-            # xaxis_title='Machine Number',
-            yaxis_title='NPT (Minutes)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(size=12),
-            height=350,
-            bargap=0.4  # Make bars thinner by increasing gap
-        )
-        
-        bar_chart_html = bar_chart.to_html(
-            include_plotlyjs='cdn', 
-            div_id="bar-chart",
-            config={
-                'displayModeBar': True, 
-                'modeBarButtonsToRemove': ['pan2d', 'lasso2d', 'select2d', 'autoScale2d', 'zoomIn2d', 'zoomOut2d'],
-                'responsive': True
-            }
-        )
-    else:
-        bar_chart_html = '<div style="text-align: center; padding: 50px; color: #666;">No data available for bar chart</div>'
-
-    # 2. PIE CHART - Reason-wise NPT (All Machines Combined)
-    if reason_durations:
-        # Calculate total NPT and percentages for each reason
-        total_npt_time = sum(reason_durations.values())
-        reason_names = list(reason_durations.keys())
-        reason_values = list(reason_durations.values())
-        reason_percentages = [(val/total_npt_time)*100 for val in reason_values]
-        
-        # Create custom labels with NPT time and percentage for legend
-        legend_labels = [
-            f"{name} ({val:.1f} min, {pct:.1f}%)"
-            for name, val, pct in zip(reason_names, reason_values, reason_percentages)
-        ]
-        
-        pie_chart = go.Figure(data=[
-            go.Pie(
-                labels=legend_labels,  # Use custom labels with time and percentage for legend
-                values=reason_values,
-                text=reason_names,  # Simple reason names for arc labels
-                textinfo='text+percent',  # Show only text and percent on arcs
-                textposition='inside',
-                textfont=dict(color="#F7F7F7", size=11),  # White text for all arc labels
-                hovertemplate='<b>%{label}</b><br>NPT: %{value:.1f} min<br>Percentage: %{percent}<extra></extra>',
-                marker=dict(line=dict(color='#000000', width=1))
-            )
-        ])
-        
-        pie_chart.update_layout(
-            title={
-                'text': 'NPT Distribution by Reason (All Machines)',
-                'x': 0.5,
-                'xanchor': 'center'
-            },
-            font=dict(size=11),
-            height=400,
-            showlegend=True,
-            legend=dict(
-                orientation="v",
-                yanchor="middle",
-                y=0.5,
-                xanchor="left",
-                x=1.02,
-                font=dict(size=10)
-            )
-        )
-        
-        pie_chart_html = pie_chart.to_html(
-            include_plotlyjs=False, 
-            div_id="pie-chart",
-            config={
-                'displayModeBar': True, 
-                'modeBarButtonsToRemove': ['pan2d', 'lasso2d', 'select2d', 'autoScale2d', 'resetScale2d', 'zoomIn2d', 'zoomOut2d'],
-                'responsive': True
-            }
-        )
-    else:
-        pie_chart_html = '<div style="text-align: center; padding: 50px; color: #666;">No data available for pie chart</div>'
-
-    # 3. DONUT CHARTS - Multiple machines in a subplot grid (5 per row)
-    if machines_list and any(machine['reasons'] for machine in machines_list):
-        # Calculate grid dimensions (5 columns, as many rows as needed)
-        machines_with_data = [m for m in machines_list if m['reasons']]
-        total_machines = len(machines_with_data)
-        cols = 5
-        rows = math.ceil(total_machines / cols)
-
-        # Create specs for subplots - all domain type for pie charts
-        specs = [[{'type': 'domain'} for _ in range(cols)] for _ in range(rows)]
-
-        # Create subplots
-        donut_subplots = make_subplots(
-            rows=rows, 
-            cols=cols, 
-            specs=specs,
-            subplot_titles=[f"{machine['name']}" for machine in machines_with_data],
-            horizontal_spacing=0.05,
-            vertical_spacing=0.1
-        )
-
-        # Add each machine's donut chart to the subplot
-        for idx, machine in enumerate(machines_with_data):
-            row = (idx // cols) + 1
-            col = (idx % cols) + 1
-
-            machine_reason_names = list(machine['reasons'].keys())
-            machine_reason_values = list(machine['reasons'].values())
-            machine_total_npt = sum(machine_reason_values)
-            
-            # Calculate percentages for each reason
-            machine_reason_percentages = [(val/machine_total_npt)*100 for val in machine_reason_values]
-            
-            # Create custom text with format "reason (npt, xx%)"
-            custom_text = [
-                f"{name}<br>({val:.1f}min, {pct:.1f}%)"
-                for name, val, pct in zip(machine_reason_names, machine_reason_values, machine_reason_percentages)
-            ]
-
-            donut_subplots.add_trace(
-                go.Pie(
-                    labels=machine_reason_names,
-                    values=machine_reason_values,
-                    text=custom_text,  # Custom formatted text
-                    hole=0.3,  # Donut effect
-                    name=f"{machine['name']}",
-                    textinfo='text',  # Show only the custom text
-                    textfont=dict(color="#2E2D2D", size=8),
-                    textposition='auto',
-                    hovertemplate='<b>%{label}</b><br>NPT: %{value:.1f} min<br>Percentage: %{percent}<extra></extra>',
-                    marker=dict(line=dict(color='#000000', width=1)),
-                    showlegend=True
-                ),
-                row=row, col=col
-            )
-
-        # Update layout for the subplot
-        donut_subplots.update_layout(
-            title={
-                'text': 'Machine-wise NPT Breakdown by Reason',
-                'x': 0.5,
-                'y': 0.95,
-                'xanchor': 'center',
-                'font': {'size': 16}
-            },
-            font=dict(size=10),
-            height=425 * rows,  # Adjust height based on number of rows
-            showlegend=True,
-            legend=dict(
-                orientation="h",
-                yanchor="top",
-                y=-0.2,
-                xanchor="center",
-                x=0.5,
-                font=dict(size=10)
-            )
-        )
-
-        # Update subplot titles
-        donut_subplots.update_annotations(font_size=12)
-
-        donut_charts_html = donut_subplots.to_html(
-            include_plotlyjs=False,
-            div_id="donut-charts-grid",
-            config={'displayModeBar': True,
-                    'modeBarButtonsToRemove': ['pan2d', 'lasso2d', 'select2d', 'autoScale2d', 'resetScale2d', 'zoomIn2d', 'zoomOut2d'],
-                    'responsive': True}
-        )
-    else:
-        donut_charts_html = '<div style="text-align: center; padding: 50px; color: #666;">No machine data available for donut charts</div>'
-        
     context = {
-        'reasons': reasons,
+        'reasons': report['reasons'],
         'shifts': shifts,
-        'machines': machines_list,
-        'npt_data': npt_data,
-        'total_npt_all': round(total_npt_all, 2),
-        'total_reason_counts': total_reason_counts,
-        'total_avg_npt_per_events': total_avg_npt_per_events,
-        'time_range_minutes': time_range_minutes,
+        'machines': report['machines'],
+        'total_npt_all': round(report['total_npt_all'], 2),
+        'total_reason_counts': report['total_reason_counts'],
+        'total_avg_npt_per_events': report['total_avg_npt_per_events'],
+        'time_range_minutes': report['time_range_minutes'],
         # Original filter options
         'filter_machines': machine_choices,
         'filter_reasons': all_reasons,
@@ -952,14 +895,28 @@ def daily_performance(request, user=None):
         'datetime_to': datetime_to_formatted,
         'current_shift': get_current_shift_display(shift_filter),
         'footer_colspan': 2,
-        # Plotly charts as HTML
-        'bar_chart_html': bar_chart_html,
-        'pie_chart_html': pie_chart_html,
-        'donut_charts_html': donut_charts_html,
         'title' : 'Daily Performance',
     }
     
-    return render(request, 'frontend/daily_performance.html', context)### Overall Performance
+    return render(request, 'frontend/daily_performance.html', context)
+
+
+@skip_permission
+def daily_performance_charts(request, user=None):
+    """Serialised chart figures of the daily performance report, cached with the same key parts."""
+    report, machines, filters, date_to, _, _ = get_daily_performance_report(request)
+    charts = cached_report(
+        'daily_performance_charts',
+        machines,
+        filters,
+        date_to,
+        lambda: build_daily_performance_charts(report),
+        range_start=filters['from'],
+    )
+    return HttpResponse(charts, content_type='application/json')
+
+
+### Overall Performance
 
 @skip_permission
 def overall_performance(request, user=None):
@@ -988,117 +945,166 @@ def overall_performance(request, user=None):
     filters = parsed_data['filters']
     dates = parsed_data['dates']
     
-    # Apply all filters at once
+    # Dates and shifts are applied as windows below, not on off_time
     npt_records = apply_npt_filters(
         queryset=npt_records,
         machine=filters['machine'],
         reason=filters['reason'],
-        shift=filters['shift'],
-        date_from=dates['date_from'],
-        date_to=dates['date_to']
     )
 
     all_shifts = Shift.objects.all().order_by('start_time')
     
-    # Get machines to display from filtered records
-    machines_to_display = npt_records.values_list('machine__mc_no', flat=True).distinct().order_by('machine__mc_no')
-    
     date_range = get_date_range(dates['date_from'], dates['date_to'])
     date_headers = [{'date': d, 'display': d.strftime('%d %a'), 'full_display': d.strftime('%d %b, %Y')} for d in date_range]
 
-    machine_date_data = defaultdict(lambda: defaultdict(lambda: {
-        'total_npt': 0, 'shifts': defaultdict(lambda: {'npt': 0})
-    }))
-
-    chart_data = [] # For Plotly charts
+    # Downtimes overlapping the range, not only those starting in it
+    range_start = datetime.combine(dates['date_from'], time.min)
+    range_end = datetime.combine(dates['date_to'], time.min) + timedelta(days=1)
+    npt_records = npt_records.filter(off_time__lt=range_end).filter(
+        Q(on_time__gt=range_start) | Q(on_time__isnull=True)
+    )
     # removing null values
     npt_records = skip_null_on_time_except_last(npt_records)
+    # Everything below is shared across users with the same machines and filters
+    def build():
+        # Shift-wise Tables
+        shifts_for_tables = Shift.objects.filter(id=filters['shift']) if filters['shift'] else all_shifts
+        selected_shift = shifts_for_tables.first() if filters['shift'] else None
+
+        # Closed days come from the nightly snapshots, which are not split by reason
+        scope = machines.filter(mc_no=filters['machine']) if filters['machine'] else machines
+        scope_machines = list(scope.values_list('mc_no', flat=True))
+        snapshot_qs = ReportSnapshot.objects.none() if filters['reason'] else ReportSnapshot.objects.filter(machine__in=scope)
+        machine_date_data, covered, machines_to_display = get_snapshot_npt(
+            snapshot_qs, scope_machines, date_range, shifts_for_tables, all_shifts, selected_shift
+        )
 
-    for record in npt_records:
-        machine = record.machine.mc_no
-        record_date = record.off_time.date()
-        duration_min = record.get_duration().total_seconds()/60
-        
-        shift_obj = get_shift_for_time(record.off_time, all_shifts)
-        shift_id = get_shift_identifier(shift_obj, all_shifts) if shift_obj else 'N/A'
-        
-        machine_date_data[machine][record_date]['total_npt'] += duration_min
-        machine_date_data[machine][record_date]['shifts'][shift_id]['npt'] += duration_min
-        
-        # Append data for charts
-        chart_data.append({
-            "Date": record_date,
-            "Machine": machine,
-            "NPT": duration_min 
-        })
+        # Only (machine, day) pairs without a snapshot (normally just today) are computed live
+        uncovered = defaultdict(list)
+        for machine in scope_machines:
+            for date_obj in date_range:
+                if (machine, date_obj) not in covered:
+                    uncovered[machine].append(date_obj)
+        if uncovered:
+            live_start = datetime.combine(min(dates[0] for dates in uncovered.values()), time.min)
+            live_machines = machines.filter(mc_no__in=list(uncovered))
+            # Older downtimes may have been moved to the Parquet archive
+            archived = get_archived_npt_records(
+                live_machines,
+                machine=filters['machine'],
+                reason=filters['reason'],
+                # Leave room for downtimes running into the first day
+                date_from=live_start - timedelta(days=1),
+                date_to=range_end
+            )
+            npt_index = NptIntervalIndex.from_queryset(
+                npt_records.filter(machine__mc_no__in=list(uncovered)).filter(
+                    Q(on_time__gt=live_start) | Q(on_time__isnull=True)
+                ),
+                min(range_end, datetime.now()),
+                key='machine__mc_no',
+                extra=[(r.machine.mc_no, r.off_time, r.on_time) for r in archived],
+            )
+            for machine in npt_index.machine_ids:
+                live_dates = uncovered.get(machine, [])
+                live_data = split_npt_by_windows(
+                    npt_index, [machine], live_dates, shifts_for_tables, all_shifts, selected_shift
+                )
+                for date_obj in live_dates:
+                    machine_date_data[machine][date_obj] = live_data[machine][date_obj]
+            machines_to_display |= set(npt_index.machine_ids)
+
+        machines_to_display = sorted(machines_to_display)
+
+        # For Plotly charts
+        chart_data = [
+            {"Date": date_obj, "Machine": machine, "NPT": machine_date_data[machine][date_obj]['total_npt']}
+            for machine in machines_to_display
+            for date_obj in date_range
+            if machine_date_data[machine][date_obj]['total_npt'] > 0
+        ]
 
-    # Overall NPT Summary Table
-    table1_data = generate_summary_table(machines_to_display, date_range, date_headers, machine_date_data)
+        # Overall NPT Summary Table
+        table1_data = generate_summary_table(machines_to_display, date_range, date_headers, machine_date_data)
 
-    # Shift-wise Tables
-    shifts_for_tables = Shift.objects.filter(id=filters['shift']) if filters['shift'] else all_shifts
-    shift_tables = {}
-    for shift in shifts_for_tables:
-        shift_id = get_shift_identifier(shift, all_shifts)
-        shift_tables[shift_id] = generate_shift_table(
-            shift, shift_id, machines_to_display, date_range, date_headers, machine_date_data
-        )
+        shift_tables = {}
+        for shift in shifts_for_tables:
+            shift_id = get_shift_identifier(shift, all_shifts)
+            shift_tables[shift_id] = generate_shift_table(
+                shift, shift_id, machines_to_display, date_range, date_headers, machine_date_data
+            )
 
-    bar_chart_html = None
-    line_chart_html = None
-    plotly_config = {
-                'displayModeBar': True, 
-                'modeBarButtonsToRemove': ['pan2d', 'lasso2d', 'select2d', 'autoScale2d', 'zoomIn2d', 'zoomOut2d'],
-                'responsive': True
-            }
+        bar_chart_html = None
+        line_chart_html = None
+        plotly_config = {
+                    'displayModeBar': True, 
+                    'modeBarButtonsToRemove': ['pan2d', 'lasso2d', 'select2d', 'autoScale2d', 'zoomIn2d', 'zoomOut2d'],
+                    'responsive': True
+                }
+
+        if chart_data:
+            df = pd.DataFrame(chart_data)
+            daily_npt = df.groupby(['Date', 'Machine'])['NPT'].sum().reset_index()
+
+            fig_bar = px.bar(
+                daily_npt,
+                x='Date',
+                y='NPT',
+                color='Machine',
+                title='Daily NPT by Machine (Stacked)',
+                labels={'NPT': 'NPT (Min)', 'Date': 'Date'},
+                height=400
+            )
+            fig_bar.update_layout(
+                barmode='stack',
+                plot_bgcolor='white',
+                paper_bgcolor='white'
+            )
 
-    if chart_data:
-        df = pd.DataFrame(chart_data)
-        daily_npt = df.groupby(['Date', 'Machine'])['NPT'].sum().reset_index()
-
-        fig_bar = px.bar(
-            daily_npt,
-            x='Date',
-            y='NPT',
-            color='Machine',
-            title='Daily NPT by Machine (Stacked)',
-            labels={'NPT': 'NPT (Min)', 'Date': 'Date'},
-            height=400
-        )
-        fig_bar.update_layout(
-            barmode='stack',
-            plot_bgcolor='white',
-            paper_bgcolor='white'
-        )
+            # --- Area Chart (smoothed) ---
+            fig_area = px.area(
+                daily_npt,
+                x='Date',
+                y='NPT',
+                color='Machine',
+                title='Daily NPT by Machine (Trend)',
+                labels={'NPT': 'NPT (Min)', 'Date': 'Date'},
+                height=400
+            )
+            fig_area.update_traces(
+                line_shape='spline',  # smooth curves
+                opacity=0.3            # light area fill
+            )
+            fig_area.update_layout(
+                plot_bgcolor='white',
+                paper_bgcolor='white'
+            )
 
-        # --- Area Chart (smoothed) ---
-        fig_area = px.area(
-            daily_npt,
-            x='Date',
-            y='NPT',
-            color='Machine',
-            title='Daily NPT by Machine (Trend)',
-            labels={'NPT': 'NPT (Min)', 'Date': 'Date'},
-            height=400
-        )
-        fig_area.update_traces(
-            line_shape='spline',  # smooth curves
-            opacity=0.3            # light area fill
-        )
-        fig_area.update_layout(
-            plot_bgcolor='white',
-            paper_bgcolor='white'
-        )
+            # --- Plotly config for modebar and zoom ---
+            plotly_config = {
+                'displayModeBar': True,
+                'displaylogo': False,
+                'scrollZoom': True
+            }
 
-        # --- Plotly config for modebar and zoom ---
-        plotly_config = {
-            'displayModeBar': True,
-            'displaylogo': False,
-            'scrollZoom': True
+            bar_chart_html = fig_bar.to_html(full_html=False, include_plotlyjs='cdn', config=plotly_config)
+            line_chart_html = fig_area.to_html(full_html=False, include_plotlyjs='cdn', config=plotly_config)
+
+        return {
+            'table1_data': table1_data,
+            'shift_tables': shift_tables,
+            'bar_chart_html': bar_chart_html,
+            'line_chart_html': line_chart_html,
         }
 
-        bar_chart_html = fig_bar.to_html(full_html=False, include_plotlyjs='cdn', config=plotly_config)
-        line_chart_html = fig_area.to_html(full_html=False, include_plotlyjs='cdn', config=plotly_config)
+    report = cached_report(
+        'overall_performance',
+        machines,
+        {**filters, 'from': dates['date_from'], 'to': dates['date_to']},
+        range_end,
+        build,
+        range_start=range_start,
+    )
 
     # Get dropdown options for filters - only machines user has access to
     if hasattr(machines, 'filter'):
@@ -1111,28 +1117,33 @@ def overall_performance(request, user=None):
     context = {
         "date_from": dates['date_from'],
         "date_to": dates['date_to'],
-        "table1_data": table1_data,
-        "shift_tables": shift_tables,
+        "table1_data": report['table1_data'],
+        "shift_tables": report['shift_tables'],
         'filter_machines': machine_choices,
         'filter_reasons': NptReason.objects.filter(is_deleted=False).order_by('name'),
         'filter_shifts': all_shifts,
         'current_machine': filters['machine'],
         'current_reason': int(filters['reason']) if filters['reason'] else None,
         'current_shift_id': int(filters['shift']) if filters['shift'] else None,
-        'bar_chart_html': bar_chart_html,
-        'line_chart_html': line_chart_html,
+        'bar_chart_html': report['bar_chart_html'],
+        'line_chart_html': report['line_chart_html'],
         'title' : 'Overall Performance',
     }
     return render(request, 'frontend/overall_performance.html', context)
 
 
 
-def rotation_report(request):
+def get_rotation_report_rows(request):
+    """
+    Cached shift-wise roll counter rows, shared by the page and its export.
+
+    Returns:
+        (table_rows, block_headers, machines, cache filters, datetime_from_formatted, datetime_to_formatted)
+    """
     if request.user is None or not request.user.is_authenticated:
         machines = Machine.objects.none()
     else:
         machines = get_user_machines(request.user)
-    print("user Machine Access: ", machines)
 
     # Get filters
     machine_filter = request.GET.get('machine', 29)
@@ -1145,11 +1156,11 @@ def rotation_report(request):
         count_time__range=(from_datetime, to_datetime),
         # count_time__lte=to_datetime
     )
+    # Downtimes overlapping the range, like the snapshots count them
     npt_qs = ProcessedNPT.objects.select_related('machine', 'reason').filter(
         machine__in=machines,
-        off_time__range=(from_datetime, to_datetime), 
-        # on_time__gt=from_datetime
-    )
+        off_time__lte=to_datetime,
+    ).filter(Q(on_time__gt=from_datetime) | Q(on_time__isnull=True))
 
     # Apply machine filter
     if machine_filter:
@@ -1188,48 +1199,115 @@ def rotation_report(request):
         suffix = ordinal_suffixes[i-1] if i <= 3 else "th"
         block_headers.append(f"{i}{suffix} 2h")
 
-    # --- Process data for each shift instance ---
-    all_shift_data = []
-    for shift in selected_shifts:
-        shift_instances = split_records_by_blocks_multi_day(
-            rotation_qs, shift, from_datetime, to_datetime, num_blocks
-        )
-        all_shift_data.extend(shift_instances)
+    # Shared across users with the same machines and filters
+    def build():
+        # Shift instances of closed days come from the nightly snapshots
+        scope = machines.filter(mc_no=machine_filter) if machine_filter else machines
+        machine_ids = list(scope.values_list('id', flat=True))
+        snapshot_qs = ReportSnapshot.objects.filter(machine__in=scope)
+        from_snapshots = {
+            shift.id: get_snapshot_shift_instances(snapshot_qs, machine_ids, shift, from_datetime, to_datetime, num_blocks)
+            if machine_ids else {}
+            for shift in selected_shifts
+        }
 
-    # --- Aggregate table rows per shift ---
-    table_rows = []
-    for shift_instance in all_shift_data:
-        shift_blocks = [block['total_count'] for block in shift_instance['blocks']]
-        shift_total = sum(shift_blocks)
+        # Only the instances without a snapshot (normally today's) are computed live
+        live_start = None
+        for shift in selected_shifts:
+            current_date = from_datetime.date()
+            while current_date <= to_datetime.date():
+                shift_start_dt, shift_end_dt = shift.get_window(current_date)
+                if (current_date not in from_snapshots[shift.id]
+                        and shift_start_dt < to_datetime and shift_end_dt > from_datetime):
+                    start = max(shift_start_dt, from_datetime)
+                    live_start = start if live_start is None else min(live_start, start)
+                    break
+                current_date += timedelta(days=1)
+
+        npt_index = None
+        rotations = None
+        if live_start is not None:
+            # Older rows may have been moved to the Parquet archive
+            archived_npt = get_archived_npt_records(
+                machines, machine=machine_filter, date_from=live_start - timedelta(days=1), date_to=to_datetime
+            )
+            archived_rotations = get_archived_rotations(machines, machine=machine_filter, date_from=live_start, date_to=to_datetime)
+
+            # One query for every live shift instance's NPT overlap below
+            npt_index = NptIntervalIndex.from_queryset(
+                npt_qs.filter(Q(on_time__gt=live_start) | Q(on_time__isnull=True)),
+                to_datetime,
+                extra=[(r.machine_id, r.off_time, r.on_time) for r in archived_npt],
+            )
+            rotations = load_rotation_arrays(rotation_qs.filter(count_time__gte=live_start), archived_rotations)
+
+        # --- Process data for each shift instance ---
+        all_shift_data = []
+        for shift in selected_shifts:
+            shift_instances = [instance for instance in from_snapshots[shift.id].values() if instance]
+            if rotations is not None:
+                shift_instances += split_records_by_blocks_multi_day(
+                    rotations, shift, from_datetime, to_datetime, num_blocks, skip_dates=from_snapshots[shift.id]
+                )
+            shift_instances.sort(key=itemgetter('shift_date'))
+            all_shift_data.extend(shift_instances)
+
+        # --- Aggregate table rows per shift ---
+        table_rows = []
+        for shift_instance in all_shift_data:
+            shift_blocks = [block['total_count'] for block in shift_instance['blocks']]
+            shift_total = sum(shift_blocks)
         
-        # Get the effective start and end times for this specific shift instance
-        shift_start_dt = shift_instance['effective_start']
-        shift_end_dt = shift_instance['effective_end']
+            # Get the effective start and end times for this specific shift instance
+            shift_start_dt = shift_instance['effective_start']
+            shift_end_dt = shift_instance['effective_end']
         
-        # Calculate the total duration of the shift instance in minutes
-        total_duration_minutes = (shift_end_dt - shift_start_dt).total_seconds() / 60.0
+            # Calculate the total duration of the shift instance in minutes
+            total_duration_minutes = (shift_end_dt - shift_start_dt).total_seconds() / 60.0
         
-        # Calculate NPT that falls within this specific shift instance
-        npt_minutes_for_shift = calculate_npt_minutes(shift_start_dt, shift_end_dt, npt_qs)
+            # Calculate NPT that falls within this specific shift instance
+            npt_minutes_for_shift = shift_instance.get('npt_minutes')
+            if npt_minutes_for_shift is None:
+                npt_minutes_for_shift = calculate_npt_minutes(shift_start_dt, shift_end_dt, npt_index)
         
-        # Calculate productive minutes
-        productive_minutes = total_duration_minutes - npt_minutes_for_shift
-        productive_minutes = max(0, productive_minutes)  # Ensure it's not negative
+            # Calculate productive minutes
+            productive_minutes = total_duration_minutes - npt_minutes_for_shift
+            productive_minutes = max(0, productive_minutes)  # Ensure it's not negative
         
-        # Calculate average RPM
-        avg_rpm = 0
-        if productive_minutes > 0:
-            avg_rpm = shift_total / productive_minutes
+            # Calculate average RPM
+            avg_rpm = 0
+            if productive_minutes > 0:
+                avg_rpm = shift_total / productive_minutes
         
-        table_rows.append({
-            'shift': shift_instance['shift_key'],
-            'mc_no': '',  
-            'blocks': shift_blocks,
-            'avg_rpm': round(avg_rpm, 2),  
-            'duration_minutes': round(total_duration_minutes, 2),
-            'npt_minutes': round(npt_minutes_for_shift, 2),  
-            'total': shift_total
-        })
+            table_rows.append({
+                'shift': shift_instance['shift_key'],
+                'mc_no': '',  
+                'blocks': shift_blocks,
+                'avg_rpm': round(avg_rpm, 2),  
+                'duration_minutes': round(total_duration_minutes, 2),
+                'npt_minutes': round(npt_minutes_for_shift, 2),  
+                'total': shift_total
+            })
+
+        return table_rows
+
+    filters = {'machine': machine_filter, 'shift': shift_filter, 'from': from_datetime, 'to': to_datetime}
+    table_rows = cached_report(
+        'rotation_report',
+        machines,
+        filters,
+        to_datetime,
+        build,
+        sources=("machine_status", "rotation_status"),
+        range_start=from_datetime,
+    )
+    return table_rows, block_headers, machines, filters, datetime_from_formatted, datetime_to_formatted
+
+
+def rotation_report(request):
+    table_rows, block_headers, machines, filters, datetime_from_formatted, datetime_to_formatted = get_rotation_report_rows(request)
+    machine_filter = filters['machine']
+    shifts = Shift.objects.all().order_by('start_time')
 
     # Get machine choices for filter
     if hasattr(machines, 'filter'):
@@ -1247,7 +1325,7 @@ def rotation_report(request):
         'filter_machines': machine_choices,
         'filter_shifts': shifts,
         'selected_machine': machine_filter,
-        'selected_shift': shift_filter,
+        'selected_shift': filters['shift'],
         'datetime_from': datetime_from_formatted,
         'datetime_to': datetime_to_formatted,
         'machine_display': machine_filter or "All Machines",
@@ -1256,3 +1334,163 @@ def rotation_report(request):
     }
 
     return render(request, 'frontend/rotation_report.html', context)
+
+
+### Exports
+@skip_permission
+def export_npt_logs(request):
+    """
+    NPT log of the machine logs page, with its filters, as CSV or as XLSX
+    with ?format=xlsx. Rows come from a server-side cursor a chunk at a time.
+    """
+    npt_records = get_mclogs_npt_records(request)[0]
+    rows = (
+        npt_records.with_effective_duration()
+        .order_by('-off_time', '-id')
+        .values_list('machine__mc_no', 'reason__name', 'off_time', 'on_time', 'effective_duration')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    header = ['Machine', 'Reason', 'Off Time', 'On Time', 'Duration (s)']
+    rows = (
+        (mc_no, reason or 'N/A', off_time, on_time, round(duration or 0))
+        for mc_no, reason, off_time, on_time, duration in rows
+    )
+    return export_response(request.GET.get('format'), export_filename('npt_logs'), [('NPT_Logs', header, rows)])
+
+
+@skip_permission
+def export_rotation_logs(request):
+    """
+    Rotation log of the rotation counter page, with its filters and without
+    the counts taken during a downtime, as CSV or XLSX (?format=xlsx).
+    """
+    rotation_qs, npt_qs, machines, filters, selected_shift, *_ = get_rotation_counter_querysets(request)
+    archived, archived_npt = get_rotation_counter_log_sources(machines, filters, selected_shift)
+    npt_index = NptIntervalIndex.from_queryset(npt_qs, filters['to'], extra=archived_npt)
+    live = (
+        rotation_qs.order_by('-count_time', '-id')
+        .values_list('machine_id', 'machine__mc_no', 'count_time', 'count', 'id')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    # Older counts may have been moved to the Parquet archive
+    old = (
+        archived.sort_values(['count_time', 'id'], ascending=False)
+        [['machine_id', 'machine__mc_no', 'count_time', 'count', 'id']]
+        .itertuples(index=False, name=None)
+    )
+    rows = heapq.merge(live, old, key=itemgetter(2, 4), reverse=True)
+    header = ['Machine No', 'Count Time', 'Count No']
+    rows = (
+        row[1:4]
+        for chunk in iter_chunks(rows)
+        for row in npt_index.outside(chunk, 0, 2)
+    )
+    return export_response(request.GET.get('format'), export_filename('rotation_logs'), [('Rotation_Logs', header, rows)])
+
+
+@skip_permission
+def download_rotation_excel(request):
+    """
+    Roll tables of the rotation counter page as one workbook: the machine
+    summary, plus the per-roll data for superusers like on the page.
+    """
+    report = get_rotation_counter_report(request, with_rolls=request.user.is_superuser)[0]
+    sheets = [(
+        'Machine_Summary',
+        ['Machine No', 'Total Counts', 'Avg RPM', 'Total Duration (min)', 'NPT (min)', 'Total Rolls'],
+        (
+            [m['mc_no'], m['total_counts'], m['avg_rpm'], m['total_duration'], m['npt_minutes'], m['total_rolls']]
+            for m in report['machine_wise_summary']
+        ),
+    )]
+    if request.user.is_superuser:
+        sheets.append((
+            'Roll_Data',
+            ['Serial No', 'Machine No', 'Roll No', 'Start Time', 'End Time', 'Total Count',
+             'Total Duration (min)', 'NPT (min)', 'Avg RPM'],
+            (
+                [r['serial_no'], r['mc_no'], r['roll_no'], r['start_time'], r['end_time'], r['total_count'],
+                 r['duration_minutes'], r['npt_minutes'], r['avg_rpm']]
+                for r in report['intermediary_data']
+            ),
+        ))
+    return export_response('xlsx', export_filename('rotation_rolls'), sheets)
+
+
+def export_rotation_report(request):
+    """Shift-wise roll counter table, with the page filters, as CSV or XLSX (?format=xlsx)."""
+    table_rows, block_headers, *_ = get_rotation_report_rows(request)
+    header = ['Shift', *block_headers, 'Total', 'Duration (min)', 'NPT (min)', 'Avg RPM']
+    rows = (
+        [row['shift'], *row['blocks'], row['total'], row['duration_minutes'], row['npt_minutes'], row['avg_rpm']]
+        for row in table_rows
+    )
+    return export_response(request.GET.get('format'), export_filename('shiftwise_roll_counter'), [('Shiftwise_Rolls', header, rows)])
+
+
+def analytics_export(request, source):
+    """
+    RotationStatus ('rotations') or ProcessedNPT ('npt') rows of the user's
+    machines as typed columnar batches for notebooks: an Arrow IPC stream, or
+    Parquet with ?format=parquet. Archived months are included, and rows are
+    streamed one record batch at a time, oldest first.
+
+    Query params:
+        columns: comma-separated subset of the source columns, all by default
+        machine: comma-separated machine ids, all of the user's by default
+        from, to: ISO datetimes on count_time / off_time, from inclusive, to exclusive
+    """
+    if source not in COLUMNAR_SOURCES:
+        return JsonResponse({'success': False, 'error': f"Unknown source: {source}"}, status=404)
+    model, time_field, archive_kind, fields = COLUMNAR_SOURCES[source]
+
+    export_format = request.GET.get('format', 'arrow')
+    if export_format not in COLUMNAR_CONTENT_TYPES:
+        return JsonResponse({'success': False, 'error': f"Unknown format: {export_format}"}, status=400)
+
+    columns = [c.strip() for c in request.GET.get('columns', '').split(',') if c.strip()] or list(fields)
+    unknown = [c for c in columns if c not in fields]
+    if unknown:
+        return JsonResponse({
+            'success': False,
+            'error': f"Unknown columns: {', '.join(unknown)}. Available: {', '.join(fields)}",
+        }, status=400)
+
+    # Same machine scoping as the report pages
+    machines = get_user_machines(request.user)
+    try:
+        machine_ids = [int(m) for m in request.GET.get('machine', '').split(',') if m.strip()]
+        date_from = datetime.fromisoformat(request.GET['from']) if request.GET.get('from') else None
+        date_to = datetime.fromisoformat(request.GET['to']) if request.GET.get('to') else None
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    if machine_ids:
+        machines = machines.filter(id__in=machine_ids)
+
+    queryset = model.objects.filter(machine__in=machines)
+    if date_from:
+        queryset = queryset.filter(**{f'{time_field}__gte': date_from})
+    if date_to:
+        queryset = queryset.filter(**{f'{time_field}__lt': date_to})
+    queryset = queryset.order_by(time_field, 'id')
+
+    # Older rows may have been moved to the Parquet archive
+    mc_nos = dict(machines.values_list('id', 'mc_no'))
+    archived = read_archive(archive_kind, list(mc_nos), date_from, date_to)
+    if not archived.empty:
+        if date_to:
+            archived = archived[archived[time_field] < date_to]
+        if 'machine__mc_no' not in archived:
+            archived = archived.assign(machine__mc_no=archived['machine_id'].map(mc_nos))
+
+    response = StreamingHttpResponse(
+        stream_columnar(
+            iter_columnar_batches(source, columns, queryset, archived),
+            get_columnar_schema(source, columns),
+            export_format,
+        ),
+        content_type=COLUMNAR_CONTENT_TYPES[export_format],
+    )
+    extension = 'parquet' if export_format == 'parquet' else 'arrows'
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(source)}.{extension}"'
+    return response
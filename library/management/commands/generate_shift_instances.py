@@ -0,0 +1,39 @@
+import logging
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.models import Shift, ShiftInstance
+
+LOG = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Generate ShiftInstance rows (concrete shift windows) for a date range"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", help="First date (YYYY-MM-DD). Defaults to yesterday.")
+        parser.add_argument("--to", dest="date_to", help="Last date (YYYY-MM-DD). Defaults to a month ahead.")
+        parser.add_argument("--shift", type=int, help="Generate only one shift.")
+
+    def handle(self, *args, **options):
+        date_from, date_to = ShiftInstance.default_range()
+        try:
+            if options.get("date_from"):
+                date_from = datetime.strptime(options["date_from"], "%Y-%m-%d").date()
+            if options.get("date_to"):
+                date_to = datetime.strptime(options["date_to"], "%Y-%m-%d").date()
+        except ValueError:
+            raise CommandError("Dates must be in YYYY-MM-DD format.")
+
+        # No request here, so skip the company-scoped manager
+        shifts = Shift.all_objects.filter(is_deleted=False)
+        if options.get("shift"):
+            shifts = shifts.filter(id=options["shift"])
+        if not shifts.exists():
+            self.stdout.write(self.style.ERROR("No shifts found."))
+            return
+
+        count = ShiftInstance.generate(shifts, date_from, date_to)
+        LOG.info("Generated shift instances: rows=%s from=%s to=%s", count, date_from, date_to)
+        self.stdout.write(self.style.SUCCESS(f"Generated {count} shift instances from {date_from} to {date_to}."))
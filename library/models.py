@@ -1,3 +1,4 @@
+from datetime import date, datetime, timedelta
 from django.db import models
 from core.mixins import CompanyScopedModel, CreatedInfoModel, UpdatedInfoModel, SoftDeleteModel
     
@@ -15,4 +16,79 @@ class Shift(CompanyScopedModel, CreatedInfoModel, UpdatedInfoModel, SoftDeleteMo
         ]
 
     def __str__(self):
-        return f"{self.name}"
\ No newline at end of file
+        return f"{self.name}"
+
+    def get_window(self, day):
+        """
+        Concrete (start, end) datetimes of this shift starting on `day`.
+        A shift ending at its start time lasts 24 hours, as in the
+        time-of-day filter and the roll counter blocks.
+        """
+        start_dt = datetime.combine(day, self.start_time)
+        end_dt = datetime.combine(day, self.end_time)
+        # Handle overnight shifts
+        if end_dt <= start_dt:
+            end_dt += timedelta(days=1)
+        return start_dt, end_dt
+
+
+class ShiftInstance(models.Model):
+    """
+    A concrete occurrence of a Shift on a date, so shift filters can be
+    ranges on indexed datetimes instead of time-of-day extraction.
+    Kept in sync by library.signals and the generate_shift_instances
+    command, run daily from the system crontab to keep DAYS_AHEAD days
+    generated, e.g.
+
+        0 0 * * * python manage.py generate_shift_instances
+    """
+    DAYS_BACK = 1
+    DAYS_AHEAD = 31
+
+    shift = models.ForeignKey(Shift, on_delete=models.CASCADE, related_name="instances")
+    date = models.DateField()
+    start_dt = models.DateTimeField()
+    end_dt = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Shift Instance"
+        verbose_name_plural = "Shift Instances"
+        constraints = [
+            models.UniqueConstraint(fields=["shift", "date"], name="unique_shift_instance_date")
+        ]
+        indexes = [
+            models.Index(fields=["shift", "start_dt", "end_dt"]),
+        ]
+        ordering = ["start_dt"]
+
+    def __str__(self):
+        return f"{self.shift} @ {self.date}"
+
+    @classmethod
+    def default_range(cls):
+        """
+        From DAYS_BACK before today until DAYS_AHEAD after it. Older days
+        are kept as generated; filters compute the ones missing.
+        """
+        today = date.today()
+        return today - timedelta(days=cls.DAYS_BACK), today + timedelta(days=cls.DAYS_AHEAD)
+
+    @classmethod
+    def generate(cls, shifts, date_from, date_to):
+        """Create or update the instances of `shifts` for every date in the range."""
+        rows = []
+        for shift in shifts:
+            day = date_from
+            while day <= date_to:
+                start_dt, end_dt = shift.get_window(day)
+                rows.append(cls(shift=shift, date=day, start_dt=start_dt, end_dt=end_dt))
+                day += timedelta(days=1)
+
+        cls.objects.bulk_create(
+            rows,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=["shift", "date"],
+            update_fields=["start_dt", "end_dt"],
+        )
+        return len(rows)
\ No newline at end of file
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from library.models import Shift, ShiftInstance
+
+
+@receiver(post_save, sender=Shift)
+def regenerate_shift_instances(sender, instance, **kwargs):
+    """
+    Keep the ShiftInstance calendar in step with the shift's times. Only
+    the recent range is regenerated; older instances with other times are
+    dropped, so filters compute those days from the new times.
+    """
+    if instance.is_deleted:
+        ShiftInstance.objects.filter(shift=instance).delete()
+        return
+    date_from, date_to = ShiftInstance.default_range()
+    ShiftInstance.generate([instance], date_from, date_to)
+    ShiftInstance.objects.filter(shift=instance, date__lt=date_from).exclude(
+        start_dt__time=instance.start_time, end_dt__time=instance.end_time
+    ).delete()
@@ -172,6 +172,24 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = '/media/'# Path where media is stored
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Shared cache for report results; Redis when configured, per-process memory otherwise
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Where archive_telemetry writes per-machine monthly Parquet files
+TELEMETRY_ARCHIVE_DIR = Path(os.getenv('TELEMETRY_ARCHIVE_DIR', BASE_DIR / 'archive'))
+
 # List of paths that are allowed without authentication
 PUBLIC_PATHS = [
     '/login/', 
@@ -383,6 +401,24 @@ PLOTLY_DASH = {
 # Channels setup (only needed if you want async/live updates)
 ASGI_APPLICATION = "npt.asgi.application"
 
+# Live update events; the ingestor and processors publish from their own
+# processes, so pushing to browsers needs Redis. The in-memory layer only
+# reaches sockets of the same process; the socket then tells pages to keep
+# polling.
+if os.getenv('REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [os.getenv('REDIS_URL')]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
+
 STATICFILES_FINDERS = [
     "django.contrib.staticfiles.finders.FileSystemFinder",
     "django.contrib.staticfiles.finders.AppDirectoriesFinder",
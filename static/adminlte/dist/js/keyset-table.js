@@ -0,0 +1,60 @@
+// Keyset Table
+// Fills a table body page by page from a JSON endpoint answering
+// {events: [...], next_cursor}, passing on the filters of the current page.
+// renderRow(row, serialNo) returns the <tr> markup of one row; the "load
+// more" button asks for the next page and hides once the last one arrived.
+function escapeHtml(value) {
+    return String(value === null || value === undefined ? '' : value)
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
+function loadKeysetTable(options) {
+    const tbody = document.querySelector(options.tbody);
+    const button = document.querySelector(options.button);
+    let cursor = null;
+    let loaded = 0;
+    let loading = false;
+
+    function showMessage(message) {
+        tbody.innerHTML = '<tr><td colspan="' + options.colspan + '" class="text-center text-muted py-4">' +
+            '<i class="fas fa-info-circle"></i> ' + message + '</td></tr>';
+    }
+
+    async function loadPage() {
+        if (loading) return;
+        loading = true;
+        button.disabled = true;
+
+        const params = new URLSearchParams(window.location.search);
+        if (cursor) params.set('cursor', cursor);
+        try {
+            const response = await fetch(options.url + '?' + params.toString());
+            if (!response.ok) throw new Error('Network response was not ok');
+            const data = await response.json();
+
+            const html = data.events.map(function (row) {
+                loaded += 1;
+                return options.renderRow(row, loaded);
+            }).join('');
+            if (!cursor) tbody.innerHTML = '';
+            tbody.insertAdjacentHTML('beforeend', html);
+            if (loaded === 0) showMessage(options.emptyText || 'No data available');
+
+            cursor = data.next_cursor;
+            button.style.display = cursor ? '' : 'none';
+        } catch (error) {
+            console.error('Error loading table rows:', error);
+            if (loaded === 0) showMessage('Error loading data. Please try again.');
+        } finally {
+            loading = false;
+            button.disabled = false;
+        }
+    }
+
+    button.addEventListener('click', loadPage);
+    loadPage();
+}
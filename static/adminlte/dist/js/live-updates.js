@@ -0,0 +1,53 @@
+// Live Updates
+// Opens the /ws/live/ socket and calls onEvent(payload) for every pushed
+// machine event ("state", "downtime_opened", "downtime_updated",
+// "downtime_closed") and with {event: "reconnected"} after a dropped
+// connection, since events may have been missed meanwhile. The returned
+// handle tells pages whether they still have to poll: only once the
+// server's "hello" says events can reach this socket (a channel layer
+// shared across processes) does isConnected() return true.
+function connectLiveUpdates(onEvent) {
+    const handle = {
+        connected: false,
+        isConnected: function () { return this.connected; }
+    };
+    if (!('WebSocket' in window)) {
+        return handle;
+    }
+
+    const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    const url = scheme + '://' + window.location.host + '/ws/live/';
+    let retryDelay = 1000;
+    let wasConnected = false;
+
+    function open() {
+        const socket = new WebSocket(url);
+        socket.onopen = function () {
+            retryDelay = 1000;
+        };
+        socket.onmessage = function (e) {
+            try {
+                const payload = JSON.parse(e.data);
+                if (payload.event === 'hello') {
+                    handle.connected = Boolean(payload.push);
+                    if (handle.connected && wasConnected) {
+                        onEvent({ event: 'reconnected' });
+                    }
+                    wasConnected = wasConnected || handle.connected;
+                    return;
+                }
+                onEvent(payload);
+            } catch (error) {
+                console.error('Error handling live update:', error);
+            }
+        };
+        socket.onclose = function () {
+            handle.connected = false;
+            setTimeout(open, retryDelay);
+            retryDelay = Math.min(retryDelay * 2, 60000);
+        };
+    }
+
+    open();
+    return handle;
+}